@@ -0,0 +1,67 @@
+"""Memory and load time of the GridGraph backends on a synthetic venue.
+
+Usage: python -m benchmarks.grid_memory [side] [networkx_side]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from plugins.grids.GridGraph import GridGraph
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def write_venue(file_name, side):
+    """Write a side x side venue: corridors on every 4th row and column, stores next to them."""
+    with open(file_name, 'w', encoding='utf-8') as file:
+        file.write("{} {}\n".format(side, side))
+        road, store = 0, 0
+        for x in range(side):
+            for y in range(side):
+                if x % 4 == 0 or y % 4 == 0:
+                    file.write("{} {} ROAD R{}\n".format(x, y, road))
+                    road += 1
+                elif x % 4 == 1 and y % 4 == 1:
+                    file.write("{} {} STORE S{}\n".format(x, y, store))
+                    store += 1
+
+
+def measure(backend, file_name, side):
+    start = time.perf_counter()
+    grid = backend.load(file_name)
+    load_time = time.perf_counter() - start
+
+    # Load again under tracemalloc, which would distort the timing above
+    del grid
+    tracemalloc.start()
+    grid = backend.load(file_name)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    last = (side - 1) // 4 * 4
+    start = time.perf_counter()
+    path = grid.get_shortest_path("R0", grid.node_attributes[(last, last)][1])
+    query_time = time.perf_counter() - start
+
+    print("{:<16} {:>5}x{:<5} load {:7.2f}s  resident {:8.1f} MB  peak {:8.1f} MB  "
+          "{:6.1f} B/cell  route({} cells) {:.3f}s".format(
+              backend.__name__, side, side, load_time, current / 2 ** 20, peak / 2 ** 20,
+              current / side ** 2, len(path), query_time))
+    return grid
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    networkx_side = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, n in [(GridGraph, networkx_side), (CompactGridGraph, networkx_side), (CompactGridGraph, side)]:
+            file_name = os.path.join(tmp, "venue_{}.txt".format(n))
+            if not os.path.exists(file_name):
+                write_venue(file_name, n)
+            measure(backend, file_name, n)
+
+
+if __name__ == '__main__':
+    main()
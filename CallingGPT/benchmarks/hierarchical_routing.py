@@ -0,0 +1,43 @@
+"""Build and query time of hierarchical routing against a flat search on a synthetic venue.
+
+Usage: python -m benchmarks.hierarchical_routing [side] [cluster_size]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.grid_memory import write_venue
+from plugins.grids import hierarchy, search
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cluster_size = int(sys.argv[2]) if len(sys.argv) > 2 else hierarchy.CLUSTER_SIZE
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_name = os.path.join(tmp, "venue.txt")
+        write_venue(file_name, side)
+        grid = CompactGridGraph.load(file_name)
+    roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+    pairs = [(random.choice(roads), random.choice(roads)) for _ in range(20)]
+
+    start = time.perf_counter()
+    router = hierarchy.HierarchicalRouter([grid], cluster_size=cluster_size)
+    print("venue {0}x{0}: abstract graph of {1} portals built in {2:.2f}s".format(
+        side, len(router.edges), time.perf_counter() - start))
+
+    for name, function in [("hierarchical", lambda s, t: router.route((0, s), (0, t))),
+                           ("bidirectional", lambda s, t: search.bidirectional(grid, s, t)),
+                           ("astar", lambda s, t: search.astar(grid, s, t))]:
+        start = time.perf_counter()
+        for source, target in pairs:
+            function(source, target)
+        print("{:<14} {:10.1f} ms/query".format(name, (time.perf_counter() - start) / len(pairs) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
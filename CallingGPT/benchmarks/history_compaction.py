@@ -0,0 +1,57 @@
+"""Request size of a long conversation with and without the history budget.
+
+Every turn asks for a route between two random stores of the bundled map and
+answers with the route, as the assistant would. Only the requests are built
+and serialized, nothing is sent.
+
+Usage: python -m benchmarks.history_compaction [turns] [budget]
+"""
+import json
+import random
+import sys
+import time
+
+from plugins.grids import registry
+from plugins.shortest_path_calculation import shortest_path_calculation
+from src.CallingGPT.session.history import History
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else History.budget
+    random.seed(0)
+    stores = registry.get_grid().get_labels_by_type('STORE')
+
+    unbounded = History(budget=float('inf'))
+    bounded = History(budget=budget)
+    histories = {"unbounded": [], "budget {}".format(budget): []}
+    sizes = {name: [] for name in histories}
+    times = {name: 0.0 for name in histories}
+
+    for i in range(turns):
+        start_store, end_store = random.sample(stores, 2)
+        route = shortest_path_calculation(start_store, end_store)
+        turn = [
+            {"role": "user", "content": "从{}怎么去{}?".format(start_store, end_store)},
+            {"role": "assistant", "content": None, "function_call": {
+                "name": "plugins-shortest_path_calculation-shortest_path_calculation",
+                "arguments": json.dumps({"Cu": start_store, "De": end_store}, ensure_ascii=False)}},
+            {"role": "function", "name": "plugins-shortest_path_calculation-shortest_path_calculation", "content": route},
+        ]
+        for (name, messages), history in zip(histories.items(), (unbounded, bounded)):
+            messages += turn
+            start = time.perf_counter()
+            payload = json.dumps(history.compact(messages), ensure_ascii=False)
+            times[name] += time.perf_counter() - start
+            sizes[name].append((history.tokens(json.loads(payload)), len(payload.encode('utf-8'))))
+            messages.append({"role": "assistant", "content": "路线是 " + route})
+            histories[name] = history.compact(messages)
+
+    for name in histories:
+        tokens, size = sizes[name][-1]
+        print("{:<14} last request {:6d} tokens {:8d} bytes, {:.3f} ms per request".format(
+            name, tokens, size, times[name] / turns * 1e3))
+
+
+if __name__ == '__main__':
+    main()
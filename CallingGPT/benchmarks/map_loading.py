@@ -0,0 +1,42 @@
+"""Start-up time of a venue loaded from its text file and from its compiled map.
+
+Usage: python -m benchmarks.map_loading [side]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.grid_memory import write_venue
+from plugins.grids import compiled
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_name = os.path.join(tmp, "venue.txt")
+        write_venue(file_name, side)
+
+        start = time.perf_counter()
+        CompactGridGraph.load(file_name)
+        print("text file      {:8.1f} ms".format((time.perf_counter() - start) * 1e3))
+
+        start = time.perf_counter()
+        output = compiled.compile_map(file_name)
+        print("compile-map    {:8.1f} ms  {:.1f} MB".format(
+            (time.perf_counter() - start) * 1e3, os.path.getsize(output) / 2 ** 20))
+
+        start = time.perf_counter()
+        grid = compiled.load_compiled(output)
+        print("compiled map   {:8.1f} ms".format((time.perf_counter() - start) * 1e3))
+
+        start = time.perf_counter()
+        last = (side - 1) // 4 * 4
+        path = grid.get_shortest_path("R0", grid.node_attributes[(last, last)][1], engine='astar')
+        print("first route    {:8.1f} ms  ({} cells)".format((time.perf_counter() - start) * 1e3, len(path)))
+
+
+if __name__ == '__main__':
+    main()
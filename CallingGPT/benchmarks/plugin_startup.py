@@ -0,0 +1,57 @@
+"""Time from interpreter start to a ready Namespace of the bundled plugins.
+
+Every mode runs in a fresh interpreter, like a CLI start.
+
+Usage: python -m benchmarks.plugin_startup [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+PLUGINS = [
+    'plugins.closest_road_node',
+    'plugins.goodbye',
+    'plugins.itinerary_planning',
+    'plugins.nearest_store',
+    'plugins.shortest_path_calculation',
+    'plugins.special_calculation',
+]
+
+EAGER = """
+import importlib
+from src.CallingGPT.entities.namespace import Namespace
+Namespace([importlib.import_module(name) for name in {plugins!r}])
+"""
+
+LAZY = """
+from src.CallingGPT.entities.namespace import Namespace, PluginManifest
+Namespace({plugins!r}, manifest=PluginManifest({manifest!r}))
+"""
+
+
+def measure(code, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("{:<24} {:8.1f} ms".format("bare interpreter", measure("pass", runs) * 1e3))
+    print("{:<24} {:8.1f} ms".format("eager imports", measure(EAGER.format(plugins=PLUGINS), runs) * 1e3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, 'plugins.json')
+        code = LAZY.format(plugins=PLUGINS, manifest=manifest)
+        print("{:<24} {:8.1f} ms".format("manifest, first start", measure(code, 1) * 1e3))
+        print("{:<24} {:8.1f} ms".format("manifest", measure(code, runs) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Query time of the search engines on the bundled grids and a synthetic venue.
+
+Usage: python -m benchmarks.route_search [side]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.grid_memory import write_venue
+from plugins.grids import registry, search
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def run(name, grid, pairs):
+    for engine, function in search.ENGINES.items():
+        # Engines that build a structure per grid do it on their first query
+        function(grid, *pairs[0])
+        start = time.perf_counter()
+        for source, target in pairs:
+            function(grid, source, target)
+        elapsed = (time.perf_counter() - start) / len(pairs)
+        print("{:<24} {:<14} {:10.1f} us/query".format(name, engine, elapsed * 1e6))
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    random.seed(0)
+
+    grid = registry.get_grid()
+    roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+    run("HCH2.txt", grid, [(random.choice(roads), random.choice(roads)) for _ in range(2000)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_name = os.path.join(tmp, "venue.txt")
+        write_venue(file_name, side)
+        grid = CompactGridGraph.load(file_name)
+    roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+    run("venue {0}x{0}".format(side), grid, [(random.choice(roads), random.choice(roads)) for _ in range(5)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Query time of weighted routing against the plain search on a synthetic venue.
+
+Usage: python -m benchmarks.weighted_routing [side] [landmarks]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.grid_memory import write_venue
+from plugins.grids import search, weighted
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    landmarks = int(sys.argv[2]) if len(sys.argv) > 2 else weighted.LANDMARKS
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_name = os.path.join(tmp, "venue.txt")
+        write_venue(file_name, side)
+        grid = CompactGridGraph.load(file_name)
+    roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+    pairs = [(random.choice(roads), random.choice(roads)) for _ in range(50)]
+
+    # A food court every 60 nodes, a 30 x 30 square where every step costs 5, between moving walkways costing 0.5
+    costs = np.ones((grid.width, grid.height))
+    for x in range(0, side, 60):
+        for y in range(0, side, 60):
+            costs[x + 15:x + 45, y + 15:y + 45] = 5
+    costs[::60, :] = costs[:, ::60] = 0.5
+    costs = costs.reshape(-1)
+
+    start = time.perf_counter()
+    router = weighted.WeightedRouter(grid, costs, landmarks)
+    print("venue {0}x{0}: {1} landmarks searched in {2:.2f}s".format(
+        side, len(router.landmarks), time.perf_counter() - start))
+
+    for name, function in [("bidirectional", lambda s, t: search.bidirectional(grid, s, t)),
+                           ("astar", lambda s, t: search.astar(grid, s, t)),
+                           ("dijkstra", lambda s, t: router.route(s, t, None)),
+                           ("weighted astar", lambda s, t: router.route(s, t, 'manhattan')),
+                           ("alt", lambda s, t: router.route(s, t, 'alt'))]:
+        start = time.perf_counter()
+        for source, target in pairs:
+            function(source, target)
+        print("{:<16} {:10.2f} ms/query".format(name, (time.perf_counter() - start) / len(pairs) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
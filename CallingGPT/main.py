@@ -26,13 +26,36 @@ def main():
 
     # read modules from os.argv
     modules = []
+    args = sys.argv[1:]
 
-    for module_name in sys.argv[1:]:
+    # with --manifest, plugins are registered from the manifest and imported on first use
+    # with --log, the conversation is logged to a file and resumed from it
+    # with --tools, one reply can call several functions, which run at the same time
+    manifest_file = None
+    log_file = None
+    tools = False
+    while args:
+        if args[0] == '--tools':
+            tools = True
+            args = args[1:]
+        elif len(args) >= 2 and args[0] in ('--manifest', '--log'):
+            if args[0] == '--manifest':
+                manifest_file = args[1]
+            else:
+                log_file = args[1]
+            args = args[2:]
+        else:
+            break
+
+    for module_name in args:
         try:
             # delete the .py suffix
             module_name = module_name.replace("/", ".").replace("\\", ".")
             if module_name.endswith('.py'):
                 module_name = module_name[:-3]
+            if manifest_file is not None:
+                modules.append(module_name)
+                continue
             # module = __import__(module_name)
             module = importlib.import_module(module_name)
             print("Using module: {}".format(module.__name__))
@@ -45,7 +68,7 @@ def main():
     if len(modules) == 0:
         logging.warning("No module imported, you're in normal chat mode.")
 
-    cli_loop(modules)
+    cli_loop(modules, manifest_file, log_file, tools)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,317 @@
+import itertools
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from plugins.grids.GridGraph import GridGraph
+
+
+NODE_TYPES = ('EMPTY', 'ROAD', 'STORE')
+
+
+class NodeAttributes(Mapping):
+    """Read-only {(x, y): ('type', 'label')} view over the arrays of a CompactGridGraph."""
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, node):
+        grid = self.grid
+        if not grid.has_node(node):
+            raise KeyError(node)
+        i = node[0] * grid.height + node[1]
+        return grid.type_names[grid.types[i]], grid.labels[grid.label_ids[i]]
+
+    def __iter__(self):
+        return itertools.product(range(self.grid.width), range(self.grid.height))
+
+    def __len__(self):
+        return self.grid.width * self.grid.height
+
+
+class CompactGridGraph(GridGraph):
+    """GridGraph backed by flat NumPy arrays instead of a networkx graph.
+
+    Node (x, y) is stored at index x * height + y. Node types are uint8 ids into
+    type_names and labels are int32 ids into the labels string table, id 0 being
+    the empty label. Unlike GridGraph, ROAD neighbours are always ordered W, N, E, S.
+    """
+
+    def __init__(self, width, height):
+        """Initialize a CompactGridGraph with given width and height.
+
+        Args:
+            width (int): The width of the grid.
+            height (int): The height of the grid.
+        """
+        self.graph = None
+        self.node_attributes = NodeAttributes(self)
+        self.type_names = list(NODE_TYPES)
+        self.labels = ['']
+        self._type_ids = {name: i for i, name in enumerate(self.type_names)}
+        self._label_ids = {'': 0}
+        self.frozen = False
+        self._reset(width, height)
+
+    def _reset(self, width, height):
+        self.width = width
+        self.height = height
+        self.types = np.zeros(width * height, dtype=np.uint8)
+        self.label_ids = np.zeros(width * height, dtype=np.int32)
+        self.label_index = None
+        self.label_cells = None
+        self.road_mask = None
+        self.road_indptr = None
+        self.road_indices = None
+        self.store_lookup = None
+
+    def _type_id(self, attribute):
+        if attribute not in self._type_ids:
+            if len(self.type_names) > np.iinfo(np.uint8).max:
+                raise ValueError("Too many node types")
+            self._type_ids[attribute] = len(self.type_names)
+            self.type_names.append(attribute)
+        return self._type_ids[attribute]
+
+    def _label_id(self, label):
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        return self._label_ids[label]
+
+    def freeze(self):
+        """Make the grid read-only so that it can be shared between callers."""
+        if self.frozen:
+            return
+        if self.label_index is None:
+            self.build_label_index()
+        if self.road_mask is None:
+            self.compile_roads()
+        if self.store_lookup is None:
+            self.build_store_lookup()
+        self.types.flags.writeable = False
+        self.label_ids.flags.writeable = False
+        self.frozen = True
+
+    def updated(self, changes):
+        """Return a frozen copy of the grid with some nodes changed, leaving this grid as it is.
+
+        Args:
+            changes (list): (x, y, type, label) of every node to change.
+
+        Returns:
+            CompactGridGraph: The changed grid.
+        """
+        grid = CompactGridGraph(self.width, self.height)
+        grid.type_names = list(self.type_names)
+        grid.labels = list(self.labels)
+        grid._type_ids = {name: i for i, name in enumerate(grid.type_names)}
+        grid._label_ids = {label: i for i, label in enumerate(grid.labels)}
+        grid.types = self.types.copy()
+        grid.label_ids = self.label_ids.copy()
+        for x, y, attribute, label in changes:
+            grid.set_node_attribute(x, y, attribute, label)
+        grid.freeze()
+        return grid
+
+    def set_node_attribute(self, x, y, attribute, label=''):
+        """Set the attribute and label for a specific node.
+
+        Args:
+            x (int): The x-coordinate of the node.
+            y (int): The y-coordinate of the node.
+            attribute (str): The type of the node (e.g., 'ROAD', 'STORE').
+            label (str): The label of the node (e.g., store name).
+        """
+        if self.frozen:
+            raise RuntimeError("Frozen grid can't be modified")
+        if self.has_node((x, y)):
+            i = x * self.height + y
+            self.types[i] = self._type_id(attribute)
+            self.label_ids[i] = self._label_id(label)
+            self.label_index = None
+            self.road_mask = None
+            self.store_lookup = None
+
+    def from_config_file(self, config_file):
+        """Load grid and node attributes from a configuration file.
+
+        Args:
+            config_file (str): The path to the configuration file.
+        """
+        if self.frozen:
+            raise RuntimeError("Frozen grid can't be modified")
+        with open(config_file, 'r', encoding='utf-8') as file:
+            # Read grid size
+            size_line = file.readline().strip().split()
+            new_width, new_height = int(size_line[0]), int(size_line[1])
+
+            # Reinitialize the grid if dimensions have changed
+            if (new_width, new_height) != (self.width, self.height):
+                self._reset(new_width, new_height)
+
+            # Read node attributes
+            indices, type_ids, label_ids = [], [], []
+            for line in file:
+                parts = line.strip().split()
+                if len(parts) >= 3:
+                    x, y = int(parts[0]), int(parts[1])
+                    if self.has_node((x, y)):
+                        indices.append(x * self.height + y)
+                        type_ids.append(self._type_id(parts[2]))
+                        label_ids.append(self._label_id(' '.join(parts[3:])))
+
+        # Later lines win over earlier lines for the same node
+        indices = np.array(indices, dtype=np.int64)
+        _, last = np.unique(indices[::-1], return_index=True)
+        last = len(indices) - 1 - last
+        self.types[indices[last]] = np.array(type_ids, dtype=np.uint8)[last]
+        self.label_ids[indices[last]] = np.array(label_ids, dtype=np.int32)[last]
+        self.label_index = None
+        self.road_mask = None
+        self.store_lookup = None
+
+    def save_to_file(self, file_name):
+        """Save node attributes to a CSV file.
+
+        Args:
+            file_name (str): The name of the output CSV file.
+        """
+        # pandas is slow to import and only needed here
+        import pandas as pd
+
+        nodes = pd.Index(list(self.node_attributes), tupleize_cols=False, name='Node')
+        node_data = pd.DataFrame({
+            'type': np.array(self.type_names, dtype=object)[self.types],
+            'label': np.array(self.labels, dtype=object)[self.label_ids],
+        }, index=nodes)
+        node_data.to_csv(file_name)
+
+    def has_node(self, node):
+        """Check whether a coordinate (x, y) lies on the grid."""
+        return 0 <= node[0] < self.width and 0 <= node[1] < self.height
+
+    def build_label_index(self):
+        """Index every labelled node by its label.
+
+        label_cells holds the node indices sorted by label id, in grid order within
+        a label, and the nodes of label id i are label_cells[label_index[i]:label_index[i + 1]].
+        """
+        cells = np.flatnonzero(self.label_ids).astype(np.int32)
+        ids = self.label_ids[cells]
+        order = np.argsort(ids, kind='stable')
+        self.label_cells = cells[order]
+        self.label_index = np.searchsorted(ids[order], np.arange(len(self.labels) + 1)).astype(np.int32)
+
+    def get_nodes_by_label(self, label):
+        """Find the coordinates of all nodes with a label.
+
+        Args:
+            label (str): The label of the nodes.
+
+        Returns:
+            tuple: The coordinates (x, y) of every node with the label, in grid order.
+
+        Raises:
+            ValueError: If no node with the specified label is found.
+        """
+        if self.label_index is None:
+            self.build_label_index()
+        label_id = self._label_ids.get(label, 0)
+        cells = self.label_cells[self.label_index[label_id]:self.label_index[label_id + 1]]
+        if label_id == 0 or len(cells) == 0:
+            raise ValueError("No node with the specified label found")
+        return tuple(divmod(int(i), self.height) for i in cells)
+
+    def get_labels_by_type(self, node_type):
+        """List the labels of a node type, in the grid order of their first node.
+
+        Args:
+            node_type (str): The type of the nodes (e.g., 'ROAD', 'STORE').
+
+        Returns:
+            list: The labels of the nodes of that type.
+        """
+        if self.label_index is None:
+            self.build_label_index()
+        starts, ends = self.label_index[:-1], self.label_index[1:]
+        label_ids = np.flatnonzero(ends > starts)
+        first_cells = self.label_cells[starts[label_ids]]
+        matches = self.types[first_cells] == self._type_ids.get(node_type, -1)
+        order = np.argsort(first_cells[matches])
+        return [self.labels[i] for i in label_ids[matches][order]]
+
+    def compile_roads(self):
+        """Compile the ROAD nodes into a flat adjacency structure.
+
+        Same layout as GridGraph.compile_roads, built with array operations.
+        """
+        width, height = self.width, self.height
+        road = (self.types == self._type_id('ROAD')).reshape(width, height)
+        index = np.arange(width * height, dtype=np.int32).reshape(width, height)
+
+        # Candidate neighbours in W, N, E, S order, -1 where there is none
+        neighbors = np.full((width, height, 4), -1, dtype=np.int32)
+        neighbors[1:, :, 0] = np.where(road[:-1, :], index[:-1, :], -1)
+        neighbors[:, 1:, 1] = np.where(road[:, :-1], index[:, :-1], -1)
+        neighbors[:-1, :, 2] = np.where(road[1:, :], index[1:, :], -1)
+        neighbors[:, :-1, 3] = np.where(road[:, 1:], index[:, 1:], -1)
+        neighbors[~road] = -1
+        neighbors = neighbors.reshape(-1, 4)
+        valid = neighbors >= 0
+
+        indptr = np.zeros(width * height + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=indptr[1:])
+
+        self.road_mask = road.reshape(-1).view(np.uint8)
+        self.road_indptr = array('i', indptr.tobytes())
+        self.road_indices = array('i', neighbors[valid].tobytes())
+
+    def build_store_lookup(self):
+        """Precompute get_nearest_store for every label, built with array operations.
+
+        store_lookup[i] is the label id of the store next to label id i, -1 if there is none.
+        """
+        if self.label_index is None:
+            self.build_label_index()
+        width, height = self.width, self.height
+        store = (self.types == self._type_ids.get('STORE', -1)).reshape(width, height)
+        label_ids = self.label_ids.reshape(width, height)
+
+        # The first STORE neighbour of every node in get_nearest_store's order, so
+        # the directions are filled in last to first and earlier ones overwrite
+        neighbor_store = np.full((width, height), -1, dtype=np.int32)
+        neighbor_store[:, :-1] = np.where(store[:, 1:], label_ids[:, 1:], neighbor_store[:, :-1])
+        neighbor_store[:, 1:] = np.where(store[:, :-1], label_ids[:, :-1], neighbor_store[:, 1:])
+        neighbor_store[:-1, :] = np.where(store[1:, :], label_ids[1:, :], neighbor_store[:-1, :])
+        neighbor_store[1:, :] = np.where(store[:-1, :], label_ids[:-1, :], neighbor_store[1:, :])
+
+        # The first node of each label, in grid order, that has a STORE neighbour
+        stores = neighbor_store.reshape(-1)[self.label_cells]
+        positions = np.where(stores >= 0, np.arange(len(stores)), len(stores))
+        starts, ends = self.label_index[:-1], self.label_index[1:]
+        labelled = np.flatnonzero(ends > starts)
+        lookup = np.full(len(self.labels), -1, dtype=np.int32)
+        if len(labelled):
+            first = np.minimum.reduceat(positions, starts[labelled])
+            found = first < ends[labelled]
+            lookup[labelled[found]] = stores[first[found]]
+        self.store_lookup = lookup
+
+    def get_road_store(self, road_label):
+        """Return get_nearest_store(road_label), from the lookup built by build_store_lookup.
+
+        Args:
+            road_label (str): The label of the ROAD node.
+
+        Returns:
+            str: The label of the STORE node next to it, or None if there is none.
+        """
+        if self.store_lookup is None:
+            self.build_store_lookup()
+        label_id = self._label_ids.get(road_label, 0)
+        if label_id == 0:
+            return self.get_nearest_store(road_label)
+        store_id = self.store_lookup[label_id]
+        return self.labels[store_id] if store_id >= 0 else None
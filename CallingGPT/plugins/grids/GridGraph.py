@@ -0,0 +1,471 @@
+import types
+from array import array
+
+import networkx as nx
+
+from plugins.grids import search
+
+
+class GridGraph:
+    def __init__(self, width, height):
+        """Initialize a GridGraph with given width and height.
+
+        Args:
+            width (int): The width of the grid.
+            height (int): The height of the grid.
+        """
+        self.width = width
+        self.height = height
+        self.graph = nx.grid_2d_graph(width, height)
+        self.node_attributes = {}  # Dictionary to hold node attributes
+        self.label_index = None  # Dictionary from label to all of its nodes
+        self.road_mask = None  # Compiled ROAD adjacency, see compile_roads
+        self.road_indptr = None
+        self.road_indices = None
+        self.store_lookup = None  # Road label -> store next to it, see build_store_lookup
+        self.frozen = False
+
+        # Initialize all nodes as EMPTY with no label
+        for node in self.graph.nodes:
+            self.node_attributes[node] = ('EMPTY', '')  # ('type', 'label')
+
+        nx.set_node_attributes(self.graph, 'EMPTY', 'type')
+        nx.set_node_attributes(self.graph, '', 'label')
+
+    @classmethod
+    def load(cls, config_file):
+        """Build a frozen GridGraph from a configuration file.
+
+        Args:
+            config_file (str): The path to the configuration file.
+
+        Returns:
+            GridGraph: The loaded grid, frozen so that it can be shared.
+        """
+        grid = cls(15, 15)
+        grid.from_config_file(config_file)
+        grid.freeze()
+        return grid
+
+    def freeze(self):
+        """Make the grid read-only so that it can be shared between callers."""
+        if self.frozen:
+            return
+        self.build_label_index()
+        self.compile_roads()
+        self.build_store_lookup()
+        nx.freeze(self.graph)
+        self.node_attributes = types.MappingProxyType(self.node_attributes)
+        self.frozen = True
+
+    def updated(self, changes):
+        """Return a frozen copy of the grid with some nodes changed, leaving this grid as it is.
+
+        Args:
+            changes (list): (x, y, type, label) of every node to change.
+
+        Returns:
+            GridGraph: The changed grid, the same as loading a file with the changes applied.
+        """
+        grid = type(self)(self.width, self.height)
+        for (x, y), (attribute, label) in self.node_attributes.items():
+            if attribute != 'EMPTY' or label:
+                grid.set_node_attribute(x, y, attribute, label)
+        for x, y, attribute, label in changes:
+            grid.set_node_attribute(x, y, attribute, label)
+        grid.freeze()
+        return grid
+
+    def set_node_attribute(self, x, y, attribute, label=''):
+        """Set the attribute and label for a specific node.
+
+        Args:
+            x (int): The x-coordinate of the node.
+            y (int): The y-coordinate of the node.
+            attribute (str): The type of the node (e.g., 'ROAD', 'STORE').
+            label (str): The label of the node (e.g., store name).
+        """
+        if self.frozen:
+            raise RuntimeError("Frozen grid can't be modified")
+        if (x, y) in self.graph.nodes:
+            self.node_attributes[(x, y)] = (attribute, label)
+            self.label_index = None
+            self.road_mask = None
+            self.store_lookup = None
+            nx.set_node_attributes(self.graph, {(x, y): attribute}, 'type')
+            nx.set_node_attributes(self.graph, {(x, y): label}, 'label')
+
+    def from_config_file(self, config_file):
+        """Load grid and node attributes from a configuration file.
+
+        Args:
+            config_file (str): The path to the configuration file.
+        """
+        with open(config_file, 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+            # Read grid size
+            size_line = lines[0].strip().split()
+            new_width, new_height = int(size_line[0]), int(size_line[1])
+
+            # Reinitialize the grid if dimensions have changed
+            if (new_width, new_height) != (self.width, self.height):
+                self.width = new_width
+                self.height = new_height
+                self.graph = nx.grid_2d_graph(new_width, new_height)
+                self.node_attributes = {}
+                self.label_index = None
+                self.road_mask = None
+                self.store_lookup = None
+                for node in self.graph.nodes:
+                    self.node_attributes[node] = ('EMPTY', '')
+                nx.set_node_attributes(self.graph, 'EMPTY', 'type')
+                nx.set_node_attributes(self.graph, '', 'label')
+
+            # Read node attributes
+            for line in lines[1:]:
+                parts = line.strip().split()
+                if len(parts) >= 3:
+                    x, y, attribute, label = int(parts[0]), int(parts[1]), parts[2], ' '.join(parts[3:])
+                    self.set_node_attribute(x, y, attribute, label)
+
+    def save_to_file(self, file_name):
+        """Save node attributes to a CSV file.
+
+        Args:
+            file_name (str): The name of the output CSV file.
+        """
+        # pandas is slow to import and only needed here
+        import pandas as pd
+
+        node_data = pd.DataFrame.from_dict(dict(self.node_attributes), orient='index', columns=['type', 'label'])
+        node_data.index.names = ['Node']
+        node_data.to_csv(file_name)
+
+    def has_node(self, node):
+        """Check whether a coordinate (x, y) lies on the grid."""
+        return node in self.graph
+
+    def build_label_index(self):
+        """Index every labelled node by its label.
+
+        Nodes sharing a label (e.g. a store occupying several cells) are kept
+        in grid order, so the first node is the one a linear scan would find.
+        """
+        label_index = {}
+        for node, attrs in self.node_attributes.items():
+            if attrs[1]:
+                label_index.setdefault(attrs[1], []).append(node)
+        self.label_index = {label: tuple(nodes) for label, nodes in label_index.items()}
+
+    def get_nodes_by_label(self, label):
+        """Find the coordinates of all nodes with a label.
+
+        Args:
+            label (str): The label of the nodes.
+
+        Returns:
+            tuple: The coordinates (x, y) of every node with the label, in grid order.
+
+        Raises:
+            ValueError: If no node with the specified label is found.
+        """
+        if self.label_index is None:
+            self.build_label_index()
+        nodes = self.label_index.get(label)
+        if not nodes:
+            raise ValueError("No node with the specified label found")
+        return nodes
+
+    def get_labels_by_type(self, node_type):
+        """List the labels of a node type, in the grid order of their first node.
+
+        Args:
+            node_type (str): The type of the nodes (e.g., 'ROAD', 'STORE').
+
+        Returns:
+            list: The labels of the nodes of that type.
+        """
+        if self.label_index is None:
+            self.build_label_index()
+        return [label for label, nodes in self.label_index.items() if self.node_attributes[nodes[0]][0] == node_type]
+
+    def get_node_by_label(self, label):
+        """Find the coordinates of a node by its label.
+
+        Args:
+            label (str): The label of the node.
+
+        Returns:
+            tuple: The coordinates (x, y) of the node.
+
+        Raises:
+            ValueError: If no node with the specified label is found.
+        """
+        return self.get_nodes_by_label(label)[0]
+
+    def get_road_node_by_label(self, label):
+        """Find the nearest ROAD node to the specified store node label.
+
+        Args:
+            label (str): The label of the store node.
+
+        Returns:
+            tuple: The coordinates (x, y) of the nearest ROAD node, or None if no ROAD node is found.
+        """
+        # Check the four neighboring nodes of every store cell for a ROAD node
+        for store_node in self.get_nodes_by_label(label):
+            neighbors = [
+                (store_node[0] + dx, store_node[1] + dy)
+                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+            ]
+            for neighbor in neighbors:
+                if self.has_node(neighbor) and self.node_attributes[neighbor][0] == 'ROAD':
+                    return neighbor
+        return None
+
+    def compile_roads(self):
+        """Compile the ROAD nodes into a flat adjacency structure.
+
+        Node (x, y) is stored at index x * height + y. road_mask[i] is 1 for a ROAD
+        node, and the ROAD neighbours of node i are
+        road_indices[road_indptr[i]:road_indptr[i + 1]].
+        """
+        width, height = self.width, self.height
+        size = width * height
+
+        road_mask = bytearray(size)
+        road_nodes = [node for node in self.graph.nodes if self.node_attributes[node][0] == 'ROAD']
+        for x, y in road_nodes:
+            road_mask[x * height + y] = 1
+
+        # Order the neighbours the way the networkx ROAD subgraph copy did, so
+        # equally short paths are broken the same way: networkx walks a small
+        # node set in set order, and each node's grid neighbours as W, E, N, S.
+        if 2 * len(road_nodes) < size:
+            road_nodes = list(set(road_nodes))
+        adjacency = {}
+        for x, y in road_nodes:
+            u = x * height + y
+            adjacency.setdefault(u, {})
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                nx_, ny = x + dx, y + dy
+                if 0 <= nx_ < width and 0 <= ny < height and road_mask[nx_ * height + ny]:
+                    v = nx_ * height + ny
+                    adjacency[u][v] = None
+                    adjacency.setdefault(v, {})[u] = None
+
+        road_indptr = array('i', [0])
+        road_indices = array('i')
+        for u in range(size):
+            road_indices.extend(adjacency.get(u, ()))
+            road_indptr.append(len(road_indices))
+
+        self.road_mask = road_mask
+        self.road_indptr = road_indptr
+        self.road_indices = road_indices
+
+    def get_shortest_path(self, start_label, end_label, engine='bidirectional'):
+        """Find the shortest path between two ROAD nodes.
+
+        Args:
+            start_label (str): The label of the starting ROAD node.
+            end_label (str): The label of the ending ROAD node.
+            engine (str): The search engine to use, one of search.ENGINES.
+
+        Returns:
+            list: The coordinates (x, y) of the nodes on the path, or None if there is no path.
+
+        Raises:
+            ValueError: If a label is unknown or does not belong to a ROAD node.
+        """
+        # Convert labels to coordinates
+        start = self.get_node_by_label(start_label)
+        end = self.get_node_by_label(end_label)
+
+        if self.road_mask is None:
+            self.compile_roads()
+
+        # Ensure start and end are ROAD nodes
+        source = start[0] * self.height + start[1]
+        target = end[0] * self.height + end[1]
+        if not self.road_mask[source] or not self.road_mask[target]:
+            raise ValueError("Start or end node is not of type ROAD")
+
+        # Find the shortest path over the ROAD nodes
+        path = search.ENGINES[engine](self, source, target)
+        if path is None:
+            return None
+        return [divmod(i, self.height) for i in path]
+
+    def get_shortest_paths(self, start_label, end_labels):
+        """Find the shortest paths from one ROAD node to several others with a single search.
+
+        Args:
+            start_label (str): The label of the starting ROAD node.
+            end_labels (list): The labels of the ending ROAD nodes.
+
+        Returns:
+            list: For every end label, the coordinates (x, y) of the nodes on the path, or None if there is no path.
+
+        Raises:
+            ValueError: If a label is unknown or does not belong to a ROAD node.
+        """
+        if self.road_mask is None:
+            self.compile_roads()
+
+        source, *targets = [
+            node[0] * self.height + node[1]
+            for node in map(self.get_node_by_label, [start_label, *end_labels])
+        ]
+        if not all(self.road_mask[i] for i in [source, *targets]):
+            raise ValueError("Start or end node is not of type ROAD")
+
+        paths = search.one_to_many(self, source, targets)
+        return [None if path is None else [divmod(i, self.height) for i in path] for path in paths]
+
+    def iter_path_groups(self, labels):
+        """Group the labels along a path into straight runs.
+
+        Args:
+            labels (iterable): (node, label) pairs in path order, label None for
+                nodes to leave out. Left out nodes still count for the direction.
+
+        Yields:
+            list: The labels of each run, in path order.
+        """
+        group = []
+        same_x = same_y = True
+        previous = None
+
+        for current, label in labels:
+            if label is not None:
+                # 若相邻坐标在同一水平或垂直方向，则继续归类
+                if group:
+                    if current[0] != previous[0]:
+                        same_x = False
+                    if current[1] != previous[1]:
+                        same_y = False
+
+                # 如果方向改变，则结束当前组并重新开始新组
+                if not same_x and not same_y:
+                    yield group
+                    group = [label]
+                    same_x = same_y = True
+                else:
+                    group.append(label)
+            previous = current
+
+        if group:
+            yield group
+
+    def format_path(self, path):
+        if not path:
+            return ""
+
+        labels = ((node, self.node_attributes[node][1]) for node in path)
+        return "".join("{" + ",".join(group) + "}" for group in self.iter_path_groups(labels))
+
+    def iter_path_labels(self, path):
+        """Yield (node, label) for every node of a path as format_path_with_labels names it.
+
+        ROAD nodes are named after the store next to them, or None if there is none.
+        """
+        for node in path:
+            attribute, label = self.node_attributes[node]
+            if attribute == 'ROAD':
+                # 如果有邻近的店铺，使用店铺名称，否则跳过此节点
+                yield node, self.get_road_store(label) or None
+            else:
+                yield node, label
+
+    def format_path_with_labels(self, path):
+        if not path:
+            return ""
+
+        # 去除每组中连续重复的店铺名称
+        groups = self.iter_path_groups(self.iter_path_labels(path))
+        return "".join("{" + ",".join(self.remove_consecutive_duplicates(group)) + "}" for group in groups)
+
+    def build_store_lookup(self):
+        """Precompute get_nearest_store for the label of every ROAD node."""
+        road_labels = {label for attribute, label in self.node_attributes.values() if attribute == 'ROAD' and label}
+        self.store_lookup = {label: self.get_nearest_store(label) for label in road_labels}
+
+    def get_road_store(self, road_label):
+        """Return get_nearest_store(road_label), from the lookup built by build_store_lookup.
+
+        Args:
+            road_label (str): The label of the ROAD node.
+
+        Returns:
+            str: The label of the STORE node next to it, or None if there is none.
+        """
+        if self.store_lookup is None:
+            self.build_store_lookup()
+        if road_label in self.store_lookup:
+            return self.store_lookup[road_label]
+        return self.get_nearest_store(road_label)
+
+    def remove_consecutive_duplicates(self, group):
+        """
+        去除列表中连续重复的元素，只保留一个
+        """
+        if not group:
+            return group
+        filtered_group = [group[0]]  # 初始化为第一个元素
+        for item in group[1:]:
+            if item != filtered_group[-1]:  # 仅在与前一个元素不同时添加
+                filtered_group.append(item)
+        return filtered_group
+
+    def get_nearest_store(self, road_label, node_type='STORE'):
+        """
+        Find the nearest STORE node among the four main adjacent points (up, down, left, right) of a given ROAD node.
+
+        Parameters:
+        road_label (str): The label of the ROAD node.
+
+        Returns:
+        str: The label of the nearest STORE node found, or None if no STORE is found.
+        """
+        # Convert label to coordinates, a multi-cell label is searched cell by cell
+        for road_node in self.get_nodes_by_label(road_label):
+            # Define the neighbors in the four cardinal directions
+            neighbors = [
+                (road_node[0] + dx, road_node[1] + dy)
+                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+            ]
+
+            # Filter and find the first STORE node within the neighborhood
+            for neighbor in neighbors:
+                if self.has_node(neighbor) and self.node_attributes[neighbor][0] == node_type:
+                    return self.node_attributes[neighbor][1]
+
+        return None
+
+    def get_shortest_path_with_stores(self, start_label, end_label):
+        """
+        Calculate the shortest path and replace each node with the nearest STORE if available.
+
+        Parameters:
+        start_label (str): Label of the starting node.
+        end_label (str): Label of the ending node.
+
+        Returns:
+        list: List of labels of STORE nodes or None for each node in the path.
+        """
+        # Get shortest path first
+        path = self.get_shortest_path(start_label, end_label)
+        if path is None:
+            return None
+
+        # Replace ROAD nodes with nearest STOREs
+        store_path = []
+        for node in path:
+            if self.node_attributes[node][0] == 'ROAD':
+                store_label = self.get_nearest_store(node)
+                store_path.append(store_label if store_label else None)
+            else:
+                store_path.append(None)  # Append None for non-ROAD nodes or if no STORE is nearby
+
+        return store_path
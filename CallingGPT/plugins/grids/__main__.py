@@ -0,0 +1,65 @@
+import argparse
+import time
+
+from plugins.grids import compiled, registry, route_table
+
+
+def build_routes(args):
+    for config_file in args.grid_files:
+        start = time.perf_counter()
+        table = route_table.build_route_table(config_file)
+        print("{}: {} stores, {:.2f}s -> {}".format(
+            config_file, len(table.stores), time.perf_counter() - start, route_table.table_file(config_file)))
+
+
+def compile_map(args):
+    for config_file in args.grid_files:
+        start = time.perf_counter()
+        output = compiled.compile_map(config_file, args.output, registry.BACKENDS[args.backend],
+                                      adjacency=not args.no_adjacency)
+        print("{}: {:.2f}s -> {}".format(config_file, time.perf_counter() - start, output))
+
+
+def set_cell(args):
+    # Load the route table first so that it is updated rather than rebuilt
+    route_table.get_route_table(args.grid_file)
+    old_grid = registry.get_grid(args.grid_file)
+    start = time.perf_counter()
+    grid = registry.update_cells([(args.x, args.y, args.type, ' '.join(args.label))], args.grid_file)
+    print("{} ({}, {}): {} -> {}, {:.2f}s".format(
+        args.grid_file, args.x, args.y, old_grid.node_attributes[(args.x, args.y)],
+        grid.node_attributes[(args.x, args.y)], time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m plugins.grids", description="Offline tools for grid maps.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("build-routes", help="precompute the store-to-store route table of grid files")
+    command.add_argument("grid_files", nargs="+", help="grid files such as plugins/grids/HCH2.txt")
+    command.set_defaults(func=build_routes)
+
+    command = commands.add_parser("compile-map", help="compile grid files into memory-mappable binary maps")
+    command.add_argument("grid_files", nargs="+", help="grid files such as plugins/grids/HCH2.txt")
+    command.add_argument("-o", "--output", help="output file, only with a single grid file")
+    command.add_argument("--backend", choices=sorted(registry.BACKENDS), default="compact",
+                         help="backend to read the grid with; networkx keeps its tie-breaking")
+    command.add_argument("--no-adjacency", action="store_true", help="leave out the precomputed ROAD adjacency")
+    command.set_defaults(func=compile_map)
+
+    command = commands.add_parser("set-cell", help="change a cell of a grid file and update its route table")
+    command.add_argument("grid_file", help="grid file such as plugins/grids/HCH2.txt")
+    command.add_argument("x", type=int)
+    command.add_argument("y", type=int)
+    command.add_argument("type", help="new node type, e.g. EMPTY to close a road")
+    command.add_argument("label", nargs="*", help="new label, none to clear it")
+    command.set_defaults(func=set_cell)
+
+    args = parser.parse_args()
+    if args.command == "compile-map" and args.output and len(args.grid_files) > 1:
+        parser.error("--output needs a single grid file")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
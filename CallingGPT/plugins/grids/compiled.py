@@ -0,0 +1,223 @@
+"""Binary compiled maps.
+
+A compiled map is a header, a section directory and 8-byte aligned sections:
+
+    types      uint8[width * height]   node type ids, index x * height + y
+    labelids   int32[width * height]   node label ids
+    typeofs    uint32[n + 1]           offsets of the type names in typestr
+    typestr    utf-8                   type names
+    lblofs     uint32[n + 1]           offsets of the labels in lblstr, label 0 is ''
+    lblstr     utf-8                   labels
+    lblorder   int32[n]                label ids sorted by their utf-8 bytes
+    lblcells   int32[]                 CompactGridGraph.label_cells
+    lblindex   int32[n + 1]            CompactGridGraph.label_index
+    lblstore   int32[n]                CompactGridGraph.store_lookup (optional)
+    roadmask   uint8[width * height]   ROAD mask (with FLAG_ADJACENCY)
+    indptr     int32[width * height + 1]
+    indices    int32[]                 ROAD adjacency (with FLAG_ADJACENCY)
+"""
+
+import bisect
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+from plugins.grids.CompactGridGraph import CompactGridGraph, NodeAttributes
+
+
+COMPILED_SUFFIX = '.gridmap'
+
+MAGIC = b'T2NGRID\0'
+
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sIIIII')  # magic, version, width, height, flags, section count
+_SECTION = struct.Struct('<8sQQ')  # name, offset, size in bytes
+
+FLAG_ADJACENCY = 1
+
+
+class StringTable(Sequence):
+    """Read-only list of the strings of a compiled map, decoded on access.
+
+    Also answers get(string) by binary search, so it can stand in for both
+    CompactGridGraph.labels and its label -> id dictionary.
+    """
+
+    def __init__(self, offsets, blob, order):
+        self.offsets = offsets
+        self.blob = blob
+        self.order = order
+
+    def _raw(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return self._raw(int(i) % len(self)).decode('utf-8')
+
+    def get(self, string, default=None):
+        raw = string.encode('utf-8')
+        position = bisect.bisect_left(self.order, raw, key=self._raw)
+        if position < len(self.order) and self._raw(self.order[position]) == raw:
+            return self.order[position]
+        return default
+
+    def __contains__(self, string):
+        return self.get(string) is not None
+
+
+def _to_compact(grid):
+    if isinstance(grid, CompactGridGraph):
+        return grid
+    compact = CompactGridGraph(grid.width, grid.height)
+    for (x, y), (attribute, label) in grid.node_attributes.items():
+        if attribute != 'EMPTY' or label:
+            compact.set_node_attribute(x, y, attribute, label)
+    compact.freeze()
+    # Keep the source grid's neighbour order, and with it its tie-breaking
+    compact.road_indptr = grid.road_indptr
+    compact.road_indices = grid.road_indices
+    return compact
+
+
+def _string_sections(prefix, strings):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(raw) for raw in encoded])
+    return [(prefix + 'ofs', offsets.tobytes()), (prefix + 'str', b''.join(encoded))]
+
+
+def write_compiled(grid, file_name, adjacency=True):
+    """Write a frozen grid as a compiled map.
+
+    Args:
+        grid (GridGraph): The grid to write, of any backend.
+        file_name (str): The output file.
+        adjacency (bool): Whether to include the precomputed ROAD adjacency.
+    """
+    grid = _to_compact(grid)
+    label_order = sorted(range(len(grid.labels)), key=lambda i: grid.labels[i].encode('utf-8'))
+
+    sections = [
+        ('types', grid.types.tobytes()),
+        ('labelids', grid.label_ids.astype(np.int32).tobytes()),
+        *_string_sections('type', grid.type_names),
+        *_string_sections('lbl', grid.labels),
+        ('lblorder', np.array(label_order, dtype=np.int32).tobytes()),
+        ('lblcells', grid.label_cells.astype(np.int32).tobytes()),
+        ('lblindex', grid.label_index.astype(np.int32).tobytes()),
+        ('lblstore', grid.store_lookup.astype(np.int32).tobytes()),
+    ]
+    if adjacency:
+        sections += [
+            ('roadmask', bytes(grid.road_mask)),
+            ('indptr', np.asarray(grid.road_indptr, dtype=np.int32).tobytes()),
+            ('indices', np.asarray(grid.road_indices, dtype=np.int32).tobytes()),
+        ]
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for name, data in sections:
+        offset += -offset % 8
+        directory.append((name, offset, len(data)))
+        offset += len(data)
+
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, grid.width, grid.height,
+                                FLAG_ADJACENCY if adjacency else 0, len(sections)))
+        for name, offset, size in directory:
+            file.write(_SECTION.pack(name.encode('ascii'), offset, size))
+        for (name, data), (_, offset, _) in zip(sections, directory):
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(data)
+    os.replace(tmp_name, file_name)
+
+
+def compile_map(config_file: str, output: str = None, grid_class: type = CompactGridGraph,
+                adjacency: bool = True) -> str:
+    """Compile a grid file such as HCH2.txt into a compiled map.
+
+    Args:
+        config_file: The path to the grid file.
+        output: The compiled map to write, the grid file with COMPILED_SUFFIX if not given.
+        grid_class: The GridGraph class to load the grid file with. GridGraph keeps its
+            tie-breaking between equally short routes, CompactGridGraph handles large venues.
+        adjacency: Whether to include the precomputed ROAD adjacency.
+
+    Returns:
+        The path of the compiled map.
+    """
+    output = output or os.path.splitext(config_file)[0] + COMPILED_SUFFIX
+    write_compiled(grid_class.load(config_file), output, adjacency)
+    return output
+
+
+def load_compiled(file_name: str) -> CompactGridGraph:
+    """Load a compiled map with a single read-only mmap.
+
+    Every array of the returned grid is a view into the mapping, so loading does
+    not depend on the venue size and processes loading the same file share one
+    copy of it in the page cache.
+
+    Args:
+        file_name: The path to the compiled map.
+
+    Returns:
+        The frozen grid.
+
+    Raises:
+        ValueError: If the file is not a compiled map of this format version.
+    """
+    with open(file_name, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, width, height, flags, count = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("{} is not a compiled map of version {}".format(file_name, FORMAT_VERSION))
+
+    view = memoryview(buffer)
+    sections = {}
+    for i in range(count):
+        name, offset, size = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+        sections[name.rstrip(b'\0').decode('ascii')] = view[offset:offset + size]
+
+    grid = CompactGridGraph.__new__(CompactGridGraph)
+    grid.graph = None
+    grid.width = width
+    grid.height = height
+    grid.types = np.frombuffer(sections['types'], dtype=np.uint8)
+    grid.label_ids = np.frombuffer(sections['labelids'], dtype=np.int32)
+
+    type_offsets = sections['typeofs'].cast('I')
+    grid.type_names = [bytes(sections['typestr'][type_offsets[i]:type_offsets[i + 1]]).decode('utf-8')
+                       for i in range(len(type_offsets) - 1)]
+    grid._type_ids = {name: i for i, name in enumerate(grid.type_names)}
+    grid.labels = StringTable(sections['lblofs'].cast('I'), sections['lblstr'], sections['lblorder'].cast('i'))
+    grid._label_ids = grid.labels
+
+    grid.label_cells = np.frombuffer(sections['lblcells'], dtype=np.int32)
+    grid.label_index = np.frombuffer(sections['lblindex'], dtype=np.int32)
+    grid.node_attributes = NodeAttributes(grid)
+    grid.store_lookup = None
+    if 'lblstore' in sections:
+        grid.store_lookup = np.frombuffer(sections['lblstore'], dtype=np.int32)
+
+    grid.road_mask = grid.road_indptr = grid.road_indices = None
+    if flags & FLAG_ADJACENCY:
+        grid.road_mask = np.frombuffer(sections['roadmask'], dtype=np.uint8)
+        grid.road_indptr = sections['indptr'].cast('i')
+        grid.road_indices = sections['indices'].cast('i')
+
+    grid.frozen = False
+    grid.freeze()
+    grid.mmap = buffer
+    return grid
@@ -0,0 +1,191 @@
+import glob
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from plugins.grids import registry, route_table, search
+
+
+FIELDS_VERSION = 1
+
+MMAP_BYTES = 64 << 20
+"""Fields taking more memory than this are built into a memory-mapped file next to the grid file."""
+
+_lock = threading.Lock()
+
+_fields = weakref.WeakKeyDictionary()
+"""Loaded distance fields by the grid snapshot they belong to, see registry.get_grid."""
+
+
+def fields_file(config_file: str, grid_hash: str) -> str:
+    """Return where the memory-mapped distance fields of a grid file version are stored.
+
+    Named after the whole file name, so the fields of HCH2.txt and HCH2.gridmap are kept apart.
+    """
+    return "{}.fields-v{}-{}.npy".format(config_file, FIELDS_VERSION, grid_hash[:16])
+
+
+class DistanceFields:
+    """The number of steps from every ROAD node to the entrance of every store.
+
+    Answers how far a node is from a store with a single array read, and the
+    route there by walking down the field from the node.
+    """
+
+    def __init__(self, grid, stores, entrances, fields):
+        self.width = grid.width
+        self.height = grid.height
+        self.stores = list(stores)
+        self.entrances = entrances
+        self.fields = fields
+        """fields[i, node] is the number of steps from node index x * height + y to
+        the entrance of store i, -1 if the node can't reach it."""
+        self.store_index = {store: i for i, store in enumerate(self.stores)}
+
+    @classmethod
+    def build(cls, grid, out=None):
+        """Search the whole grid from the entrance of every store.
+
+        Args:
+            grid (GridGraph): The grid to search.
+            out (numpy.ndarray): An int32 array of shape (stores, nodes) to fill, a new one if not given.
+
+        Returns:
+            DistanceFields: The distance fields of the grid.
+        """
+        stores = grid.get_labels_by_type('STORE')
+        entrances = route_table.store_entrances(grid, stores)
+        return cls(grid, stores, entrances, search.numpy_distances(grid, entrances, out))
+
+    def distance(self, store, node):
+        """Return the number of steps from a node to a store's entrance.
+
+        Args:
+            store (str): The label of the store.
+            node (tuple): The coordinates (x, y) of a ROAD node.
+
+        Returns:
+            int: The number of steps, or None if the node can't reach the store.
+
+        Raises:
+            KeyError: If the store is not in the fields.
+        """
+        distance = self.fields[self.store_index[store], node[0] * self.height + node[1]]
+        return int(distance) if distance >= 0 else None
+
+    def nearest(self, node, stores=None):
+        """Find the store whose entrance is the fewest steps from a node.
+
+        Args:
+            node (tuple): The coordinates (x, y) of a ROAD node.
+            stores (list): The labels of the stores to choose from, every store if not given.
+
+        Returns:
+            tuple: The label of the store and its number of steps, or None if no store can be reached.
+                Stores listed first win between equally close ones.
+        """
+        rows = np.arange(len(self.stores)) if stores is None else np.array(
+            [self.store_index[store] for store in stores], dtype=np.int64)
+        distances = self.fields[rows, node[0] * self.height + node[1]]
+        reached = np.flatnonzero(distances >= 0)
+        if len(reached) == 0:
+            return None
+        best = reached[np.argmin(distances[reached])]
+        return self.stores[rows[best]], int(distances[best])
+
+    def path(self, store, node):
+        """Walk down a store's field from a node to the store's entrance.
+
+        Args:
+            store (str): The label of the store.
+            node (tuple): The coordinates (x, y) of a ROAD node.
+
+        Returns:
+            list: The coordinates (x, y) of the nodes from node to the entrance, or None if there is no route.
+        """
+        field = self.fields[self.store_index[store]]
+        x, y = node
+        distance = field[x * self.height + y]
+        if distance < 0:
+            return None
+
+        path = [(x, y)]
+        while distance > 0:
+            # Only ROAD nodes have a distance, so a neighbour one step closer is always a ROAD node
+            for dx, dy in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height and field[nx * self.height + ny] == distance - 1:
+                    x, y, distance = nx, ny, distance - 1
+                    break
+            path.append((x, y))
+        return path
+
+
+def _load_mapped(grid, path):
+    stores = grid.get_labels_by_type('STORE')
+    shape = (len(stores), grid.width * grid.height)
+    # Named after the file version the grid was built from, not the file as it is now
+    file_name = fields_file(path, registry.grid_hash(grid))
+
+    if not os.path.exists(file_name) or np.load(file_name, mmap_mode='r').shape != shape:
+        # A temporary file of its own, as other processes may be building the same fields
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file_name), suffix='.tmp')
+        os.close(fd)
+        out = np.lib.format.open_memmap(tmp_name, mode='w+', dtype=np.int32, shape=shape)
+        DistanceFields.build(grid, out)
+        out.flush()
+        del out
+        os.replace(tmp_name, file_name)
+
+        # Fields of older versions of the grid file are no longer needed, but those of
+        # the file as it is now may be in use by a process with a newer snapshot
+        current = {file_name, fields_file(path, registry.file_hash(path))}
+        for old_file in glob.glob(fields_file(path, '*')):
+            if old_file not in current:
+                try:
+                    os.remove(old_file)
+                except OSError:
+                    # Still mapped on platforms that don't allow removing it, or already removed
+                    pass
+
+    fields = np.load(file_name, mmap_mode='r')
+    return DistanceFields(grid, stores, route_table.store_entrances(grid, stores), fields)
+
+
+def get_distance_fields(config_file: str = None, grid=None) -> DistanceFields:
+    """Return the distance fields of a grid, building them on first use.
+
+    Fields up to MMAP_BYTES are kept in memory. Larger ones are built once per
+    version of the grid file into a .npy file next to it and memory-mapped,
+    unless the grid was not loaded through the registry.
+
+    Args:
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The distance fields of the grid.
+    """
+    path = os.path.abspath(config_file or registry.DEFAULT_GRID)
+    if grid is None:
+        grid = registry.get_grid(path)
+
+    fields = _fields.get(grid)
+    if fields is not None:
+        return fields
+
+    with _lock:
+        fields = _fields.get(grid)
+        if fields is not None:
+            return fields
+
+        size = len(grid.get_labels_by_type('STORE')) * grid.width * grid.height * 4
+        if size <= MMAP_BYTES or registry.grid_hash(grid) is None:
+            fields = DistanceFields.build(grid)
+        else:
+            fields = _load_mapped(grid, path)
+        _fields[grid] = fields
+        return fields
@@ -0,0 +1,435 @@
+"""Hierarchical routing over venues of one or more floors.
+
+Every floor is split into square clusters of CLUSTER_SIZE nodes. A portal is a
+ROAD node next to a ROAD node of another cluster, or an end of a link between
+floors (an escalator or lift). The abstract graph joins the portals of a
+cluster by their shortest distance inside it, and the two sides of every
+border crossing and link directly. A route is searched on the abstract graph
+first and only then turned into nodes, inside the clusters it passes.
+
+Every crossing is a portal, so routes are shortest routes, not approximations.
+
+A venue file lists the floors and the links between them:
+
+    FLOOR F1 HCH1.txt
+    FLOOR F2 HCH2.txt
+    LINK F1 3 7 F2 3 7 5
+
+LINK joins node (3, 7) of F1 with node (3, 7) of F2 at a cost of 5 steps, in
+both directions. Grid files are relative to the venue file. A plain grid file
+is a venue of one floor.
+"""
+
+import heapq
+import os
+import threading
+import weakref
+from collections import deque
+
+import numpy as np
+
+from plugins.grids import registry, search
+
+
+CLUSTER_SIZE = 32
+
+VENUE_SUFFIX = '.venue'
+
+_lock = threading.Lock()
+
+_routers = weakref.WeakKeyDictionary()
+"""Routers of single grids by the grid snapshot they belong to, see registry.get_grid."""
+
+_venues: dict = {}
+"""Loaded venues with structure as follows:
+{
+    ("/abs/path/to/mall.venue", "networkx"): ((st_mtime_ns, st_size), venue),
+}
+"""
+
+
+class _Block:
+    """A cluster as a grid of its own, for the array searches of search.py."""
+
+    def __init__(self, road, x0, y0):
+        self.x0 = x0
+        self.y0 = y0
+        self.width, self.height = road.shape
+        self.road_mask = np.ascontiguousarray(road).view(np.uint8).reshape(-1)
+
+
+class ClusterMap:
+    """One floor split into clusters of cluster_size x cluster_size nodes."""
+
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.rows = -(-grid.height // cluster_size)
+        road = np.frombuffer(grid.road_mask, dtype=np.uint8).view(bool).reshape(grid.width, grid.height)
+        self.road = road
+
+        # Pairs of ROAD nodes on both sides of a cluster border
+        height = grid.height
+        index = np.arange(grid.width * height, dtype=np.int64).reshape(grid.width, height)
+        crossings = []
+        for x in range(cluster_size, grid.width, cluster_size):
+            both = road[x - 1, :] & road[x, :]
+            crossings += zip(index[x - 1, both].tolist(), index[x, both].tolist())
+        for y in range(cluster_size, height, cluster_size):
+            both = road[:, y - 1] & road[:, y]
+            crossings += zip(index[both, y - 1].tolist(), index[both, y].tolist())
+        self.crossings = crossings
+
+    def cluster_of(self, node):
+        """Return the cluster id of a node index."""
+        x, y = divmod(node, self.grid.height)
+        return x // self.cluster_size * self.rows + y // self.cluster_size
+
+    def bounds(self, cluster):
+        """Return the nodes (x0, y0) to (x1, y1), end excluded, a cluster spans."""
+        x0 = cluster // self.rows * self.cluster_size
+        y0 = cluster % self.rows * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.grid.width), min(y0 + self.cluster_size, self.grid.height)
+
+    def block(self, cluster):
+        """Return a cluster as a _Block."""
+        x0, y0, x1, y1 = self.bounds(cluster)
+        return _Block(self.road[x0:x1, y0:y1], x0, y0)
+
+    def to_local(self, block, node):
+        x, y = divmod(node, self.grid.height)
+        return (x - block.x0) * block.height + (y - block.y0)
+
+    def to_global(self, block, local):
+        x, y = divmod(local, block.height)
+        return (x + block.x0) * self.grid.height + (y + block.y0)
+
+
+class HierarchicalRouter:
+    """Shortest routes over one or more floors, searched on an abstract graph of portals.
+
+    Nodes are (floor, node index) pairs, with node index x * height + y on the grid
+    of that floor.
+    """
+
+    def __init__(self, grids, links=(), cluster_size=CLUSTER_SIZE):
+        """Build the abstract graph.
+
+        Args:
+            grids (list): The grid of every floor, with compiled ROAD adjacency.
+            links (list): ((floor, node), (floor, node), cost) for every link between ROAD nodes.
+            cluster_size (int): The side of a cluster in nodes.
+        """
+        self.maps = [ClusterMap(grid, cluster_size) for grid in grids]
+        self.links = list(links)
+        self.edges = {}
+        """edges[a] is a list of (b, cost, local), local telling whether the edge runs
+        inside a cluster and has to be refined into nodes."""
+
+        portals = {}
+        for floor, cluster_map in enumerate(self.maps):
+            for a, b in cluster_map.crossings:
+                self._add_edge((floor, a), (floor, b), 1, False)
+        for a, b, cost in links:
+            self._add_edge(a, b, cost, False)
+        for floor, node in self.edges:
+            portals.setdefault((floor, self.maps[floor].cluster_of(node)), []).append(node)
+
+        # Portals of the same cluster are joined by their distance inside it
+        for (floor, cluster), nodes in portals.items():
+            cluster_map = self.maps[floor]
+            block = cluster_map.block(cluster)
+            local = [cluster_map.to_local(block, node) for node in nodes]
+            distances = search.numpy_distances(block, local)
+            for i, a in enumerate(nodes):
+                for j, b in enumerate(nodes):
+                    if i != j and distances[i, local[j]] >= 0:
+                        self._add_edge((floor, a), (floor, b), int(distances[i, local[j]]), True, both=False)
+        self.portals = portals
+
+    def _add_edge(self, a, b, cost, local, both=True):
+        self.edges.setdefault(a, []).append((b, cost, local))
+        if both:
+            self.edges.setdefault(b, []).append((a, cost, local))
+
+    def _cluster_distances(self, key):
+        """Distances from a node to the portals of its cluster, and the distance field itself."""
+        floor, node = key
+        cluster_map = self.maps[floor]
+        cluster = cluster_map.cluster_of(node)
+        block = cluster_map.block(cluster)
+        field = search.numpy_distances(block, [cluster_map.to_local(block, node)])[0]
+        portals = {}
+        for portal in self.portals.get((floor, cluster), ()):
+            distance = field[cluster_map.to_local(block, portal)]
+            if distance >= 0:
+                portals[(floor, portal)] = int(distance)
+        return cluster, block, field, portals
+
+    def route(self, start, goal):
+        """Find a shortest route between two ROAD nodes.
+
+        Args:
+            start (tuple): (floor, node index) to start from.
+            goal (tuple): (floor, node index) to reach.
+
+        Returns:
+            list: The (floor, node index) pairs of the route, or None if there is no route.
+        """
+        if start == goal:
+            return [start]
+
+        start_cluster, block, field, from_start = self._cluster_distances(start)
+        goal_cluster, _, _, to_goal = self._cluster_distances(goal)
+
+        # A* on the abstract graph, with the start and goal joined to their clusters
+        extra = {start: [(portal, cost, True) for portal, cost in from_start.items()]}
+        if start[0] == goal[0] and start_cluster == goal_cluster:
+            distance = field[self.maps[goal[0]].to_local(block, goal[1])]
+            if distance >= 0:
+                extra[start].append((goal, int(distance), True))
+
+        heuristic = self._heuristic(goal)
+        cost = {start: 0}
+        pred = {start: None}
+        heap = [(heuristic(start), start)]
+        while heap:
+            _, key = heapq.heappop(heap)
+            if key == goal:
+                break
+            g = cost[key]
+            edges = [*self.edges.get(key, ()), *extra.get(key, ())]
+            if key in to_goal:
+                edges.append((goal, to_goal[key], True))
+            for other, step, local in edges:
+                if other not in cost or g + step < cost[other]:
+                    cost[other] = g + step
+                    pred[other] = (key, local)
+                    heapq.heappush(heap, (g + step + heuristic(other), other))
+
+        if goal not in pred:
+            return None
+
+        hops = [goal]
+        while pred[hops[-1]] is not None:
+            hops.append(pred[hops[-1]][0])
+        hops.reverse()
+
+        # Refine the edges inside clusters into nodes
+        path = [start]
+        for a, b in zip(hops, hops[1:]):
+            if pred[b][1]:
+                path += [(a[0], node) for node in self._local_path(a, b)[1:]]
+            else:
+                path.append(b)
+        return path
+
+    def _heuristic(self, goal):
+        """Return a lower bound of the distance to goal, for A*.
+
+        On the goal's floor it is the Manhattan distance, unless leaving the floor
+        through a link and coming back could be shorter. Other floors get 0.
+        """
+        floor, node = goal
+        height = self.maps[floor].grid.height
+        gx, gy = divmod(node, height)
+
+        # Leaving the floor costs two links, and coming back ends at one of its link ends
+        detour = float('inf')
+        for a, b, cost in self.links:
+            for end_floor, end in (a, b):
+                if end_floor == floor:
+                    x, y = divmod(end, height)
+                    detour = min(detour, abs(x - gx) + abs(y - gy) + 2 * cost)
+
+        def heuristic(key):
+            if key[0] != floor:
+                return 0
+            x, y = divmod(key[1], height)
+            return min(abs(x - gx) + abs(y - gy), detour)
+
+        return heuristic
+
+    def _local_path(self, a, b):
+        """BFS between two nodes of a cluster that stays inside the cluster."""
+        floor, source = a
+        target = b[1]
+        cluster_map = self.maps[floor]
+        grid = cluster_map.grid
+        indptr, indices, height = grid.road_indptr, grid.road_indices, grid.height
+        x0, y0, x1, y1 = cluster_map.bounds(cluster_map.cluster_of(source))
+
+        pred = {source: None}
+        queue = deque([source])
+        while queue and target not in pred:
+            v = queue.popleft()
+            for w in indices[indptr[v]:indptr[v + 1]]:
+                if w not in pred and x0 <= w // height < x1 and y0 <= w % height < y1:
+                    pred[w] = v
+                    queue.append(w)
+
+        path = [target]
+        while pred[path[-1]] is not None:
+            path.append(pred[path[-1]])
+        path.reverse()
+        return path
+
+
+def hierarchical(grid, source, target):
+    """Search engine routing on the abstract graph of a single grid.
+
+    The abstract graph is built on first use and kept for the grid snapshot.
+    Args and Returns are the same as search.bidirectional.
+    """
+    router = _routers.get(grid)
+    if router is None:
+        with _lock:
+            router = _routers.get(grid)
+            if router is None:
+                router = _routers[grid] = HierarchicalRouter([grid])
+
+    path = router.route((0, source), (0, target))
+    return [node for _, node in path] if path is not None else None
+
+
+class Venue:
+    """The floors of a venue and the links between them, with a HierarchicalRouter over them."""
+
+    def __init__(self, names, grids, links, cluster_size=CLUSTER_SIZE):
+        """Check the links and build the router.
+
+        Args:
+            names (list): The name of every floor.
+            grids (list): The grid of every floor.
+            links (list): ((floor, (x, y)), (floor, (x, y)), cost) for every link, floors by name.
+            cluster_size (int): The side of a cluster in nodes.
+        """
+        self.names = list(names)
+        self.grids = list(grids)
+        self.floor_files = []
+        floor_index = {name: i for i, name in enumerate(self.names)}
+
+        node_links = []
+        for (floor_a, (xa, ya)), (floor_b, (xb, yb)), cost in links:
+            a, b = floor_index[floor_a], floor_index[floor_b]
+            for floor, x, y in ((a, xa, ya), (b, xb, yb)):
+                if not self.grids[floor].has_node((x, y)) or self.grids[floor].node_attributes[(x, y)][0] != 'ROAD':
+                    raise ValueError("Link end ({}, {}) on {} is not a ROAD node".format(x, y, self.names[floor]))
+            node_links.append(((a, xa * self.grids[a].height + ya), (b, xb * self.grids[b].height + yb), cost))
+        self.router = HierarchicalRouter(self.grids, node_links, cluster_size)
+
+    @classmethod
+    def load(cls, venue_file, backend='networkx'):
+        """Load a venue file, or a grid file as a venue of one floor.
+
+        Args:
+            venue_file (str): The path to the venue or grid file.
+            backend (str): The GridGraph implementation of the floors, one of registry.BACKENDS.
+
+        Returns:
+            Venue: The venue.
+        """
+        if not venue_file.endswith(VENUE_SUFFIX):
+            name = os.path.splitext(os.path.basename(venue_file))[0]
+            venue = cls([name], [registry.get_grid(venue_file, backend)], [])
+            venue.floor_files = [os.path.abspath(venue_file)]
+            return venue
+
+        names, floor_files, links = [], [], []
+        directory = os.path.dirname(os.path.abspath(venue_file))
+        with open(venue_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                parts = line.split()
+                if not parts:
+                    continue
+                if parts[0] == 'FLOOR':
+                    names.append(parts[1])
+                    floor_files.append(os.path.join(directory, parts[2]))
+                elif parts[0] == 'LINK':
+                    cost = int(parts[7]) if len(parts) > 7 else 1
+                    links.append(((parts[1], (int(parts[2]), int(parts[3]))),
+                                  (parts[4], (int(parts[5]), int(parts[6]))), cost))
+                else:
+                    raise ValueError("Unknown venue file line: {}".format(line.strip()))
+        venue = cls(names, [registry.get_grid(floor_file, backend) for floor_file in floor_files], links)
+        venue.floor_files = floor_files
+        return venue
+
+    def find(self, label):
+        """Find the ROAD node of a label, looking through the floors in order.
+
+        Stores are entered from the ROAD node GridGraph.get_road_node_by_label picks.
+
+        Args:
+            label (str): The label of a store or ROAD node.
+
+        Returns:
+            tuple: (floor, node index) of the ROAD node.
+
+        Raises:
+            ValueError: If no floor has the label, or the store has no ROAD node next to it.
+        """
+        for floor, grid in enumerate(self.grids):
+            try:
+                node = grid.get_node_by_label(label)
+            except ValueError:
+                continue
+            if grid.node_attributes[node][0] != 'ROAD':
+                node = grid.get_road_node_by_label(label)
+                if node is None:
+                    raise ValueError("No ROAD node next to {}".format(label))
+            return floor, node[0] * grid.height + node[1]
+        raise ValueError("No node with the specified label found")
+
+    def route(self, start_label, end_label):
+        """Find a shortest route between two labels, possibly on different floors.
+
+        Returns:
+            list: (floor name, (x, y)) for every node of the route, or None if there is no route.
+        """
+        path = self.router.route(self.find(start_label), self.find(end_label))
+        if path is None:
+            return None
+        return [(self.names[floor], divmod(node, self.grids[floor].height)) for floor, node in path]
+
+    def format_route(self, path):
+        """Format a route floor by floor with GridGraph.format_path_with_labels, one floor per line."""
+        if not path:
+            return ""
+        lines = []
+        start = 0
+        for i in range(1, len(path) + 1):
+            if i == len(path) or path[i][0] != path[start][0]:
+                grid = self.grids[self.names.index(path[start][0])]
+                nodes = [node for _, node in path[start:i]]
+                lines.append("{}: {}".format(path[start][0], grid.format_path_with_labels(nodes)))
+                start = i
+        return "\n".join(lines)
+
+
+def get_venue(venue_file: str = None, backend: str = 'networkx') -> Venue:
+    """Return the shared Venue of a venue file, or of a grid file as a single floor.
+
+    The venue is rebuilt when the venue file changes or any floor gets a new
+    grid snapshot from registry.get_grid.
+
+    Args:
+        venue_file: The path to the venue or grid file, registry.DEFAULT_GRID if not given.
+        backend: The GridGraph implementation of the floors, one of registry.BACKENDS.
+
+    Returns:
+        The venue.
+    """
+    path = os.path.abspath(venue_file or registry.DEFAULT_GRID)
+    key = registry.file_key(path)
+
+    with _lock:
+        entry = _venues.get((path, backend))
+        if entry is not None and entry[0] == key and all(
+                registry.get_grid(floor_file, backend) is grid
+                for floor_file, grid in zip(entry[1].floor_files, entry[1].grids)):
+            return entry[1]
+
+        venue = Venue.load(path, backend)
+        _venues[(path, backend)] = (key, venue)
+        return venue
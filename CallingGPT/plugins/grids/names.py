@@ -0,0 +1,201 @@
+import threading
+import unicodedata
+import weakref
+
+try:
+    import opencc
+except ImportError:
+    opencc = None
+
+
+_TRADITIONAL = (
+    "門東記鍋麥勞壽蘭瀾魚國韓飯雞麵麪湯豬燒雜貨廳樂來龍鳳華興蓋簾個點燉錢廣灣臺書電車館飲鮮綠紅黃醬蝦"
+    "鴨鵝羅蘇張陳劉楊趙吳鄭孫馬萬時開場風雲錦祿鐵麗園團爾蘿蔔壺燜鹵滷鹹廚頭號實寶島餃餅粵滬鄉傳統臘腸"
+    "雙嚐嘗蠔鰻鱈貝魷絲營業創優闆齋鴛鴦豐發髮後裡裏乾涼貓魯漢薩盤熱凍葉檸喫樓層廁飽鹽醃燴燙煙"
+)
+_SIMPLIFIED = (
+    "门东记锅麦劳寿兰澜鱼国韩饭鸡面面汤猪烧杂货厅乐来龙凤华兴盖帘个点炖钱广湾台书电车馆饮鲜绿红黄酱虾"
+    "鸭鹅罗苏张陈刘杨赵吴郑孙马万时开场风云锦禄铁丽园团尔萝卜壶焖卤卤咸厨头号实宝岛饺饼粤沪乡传统腊肠"
+    "双尝尝蚝鳗鳕贝鱿丝营业创优板斋鸳鸯丰发发后里里干凉猫鲁汉萨盘热冻叶柠吃楼层厕饱盐腌烩烫烟"
+)
+_TO_SIMPLIFIED = str.maketrans(_TRADITIONAL, _SIMPLIFIED)
+"""Traditional characters common in store names, used when OpenCC is not installed."""
+
+_converter = opencc.OpenCC('t2s') if opencc is not None else None
+
+_lock = threading.Lock()
+
+_indexes = weakref.WeakKeyDictionary()
+"""Name indexes by the grid snapshot they belong to, see registry.get_grid."""
+
+
+def normalize(name):
+    """Reduce a name to the form names are compared in.
+
+    Full-width characters, letter case, whitespace and traditional characters
+    make no difference, e.g. normalize(' ＭＩＮＩＳＯ ') == normalize('miniso').
+    """
+    name = unicodedata.normalize('NFKC', name).casefold()
+    name = ''.join(name.split())
+    if _converter is not None:
+        return _converter.convert(name)
+    return name.translate(_TO_SIMPLIFIED)
+
+
+def _grams(name):
+    return set(name) | {name[i:i + 2] for i in range(len(name) - 1)}
+
+
+def edit_distance(a, b):
+    """Return the Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class UnknownName(ValueError):
+    """Raised when a name can't be resolved to a single label.
+
+    Attributes:
+        name (str): The name that was looked up.
+        candidates (list): The closest labels, best first, possibly empty.
+    """
+
+    def __init__(self, name, candidates):
+        self.name = name
+        self.candidates = candidates
+        if candidates:
+            super().__init__("Unknown position {}, did you mean: {}?".format(name, ", ".join(candidates)))
+        else:
+            super().__init__("Unknown position {}".format(name))
+
+
+class NameIndex:
+    """Resolves slightly wrong names to the labels of a grid.
+
+    Labels are indexed by the characters and character pairs of their normalized
+    form. A lookup only ranks the labels sharing one of those with the name, by
+    edit distance first.
+    """
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.label_set = set(self.labels)
+        self.normalized = [normalize(label) for label in self.labels]
+        self.exact = {}
+        self.grams = {}
+        for i, name in enumerate(self.normalized):
+            self.exact.setdefault(name, []).append(i)
+            for gram in _grams(name):
+                self.grams.setdefault(gram, []).append(i)
+
+    @classmethod
+    def build(cls, grid):
+        """Index the STORE and ROAD labels of a grid."""
+        return cls(grid.get_labels_by_type('STORE') + grid.get_labels_by_type('ROAD'))
+
+    def _ranked(self, name):
+        shared = {}
+        for gram in _grams(name):
+            for i in self.grams.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        ranked = []
+        for i, count in shared.items():
+            candidate = self.normalized[i]
+            ranked.append((edit_distance(name, candidate), not candidate.startswith(name), -count, i))
+        ranked.sort()
+        return ranked
+
+    def match(self, name, limit=5):
+        """Return the labels closest to a name, best first.
+
+        Args:
+            name (str): The name to look up.
+            limit (int): The most labels to return.
+
+        Returns:
+            list: The closest labels, empty if no label has a character in common with the name.
+        """
+        return [self.labels[i] for *_, i in self._ranked(normalize(name))[:limit]]
+
+    def containing(self, name):
+        """Return the labels that contain a name after normalize, e.g. every 拉面 store for '拉面'.
+
+        Args:
+            name (str): The part of the labels to look for.
+
+        Returns:
+            list: The labels, in index order.
+        """
+        normalized = normalize(name)
+        if not normalized:
+            return []
+        candidates = set(self.grams.get(normalized[0], ()))
+        for char in normalized[1:]:
+            candidates &= set(self.grams.get(char, ()))
+        return [self.labels[i] for i in sorted(candidates) if normalized in self.normalized[i]]
+
+    def resolve(self, name):
+        """Return the label a name most likely means.
+
+        A name resolves when it is a label, when it equals exactly one label after
+        normalize, when it is the start of exactly one label, or when a single
+        label is closest and at most one edit per three characters away.
+
+        Args:
+            name (str): The name to look up.
+
+        Returns:
+            str: The label.
+
+        Raises:
+            UnknownName: If the name doesn't resolve to a single label.
+        """
+        if name in self.label_set:
+            return name
+        normalized = normalize(name)
+        if len(self.exact.get(normalized, ())) == 1:
+            return self.labels[self.exact[normalized][0]]
+
+        ranked = self._ranked(normalized)
+        prefixed = [i for *_, i in ranked if self.normalized[i].startswith(normalized)]
+        if len(prefixed) == 1 and len(normalized) >= 2:
+            return self.labels[prefixed[0]]
+        if ranked:
+            distance, _, _, best = ranked[0]
+            unique = len(ranked) == 1 or ranked[1][0] > distance
+            if unique and distance <= len(self.normalized[best]) // 3:
+                return self.labels[best]
+
+        raise UnknownName(name, [self.labels[i] for *_, i in ranked[:5]])
+
+
+def get_name_index(grid) -> NameIndex:
+    """Return the name index of a grid snapshot, building it on first use.
+
+    Args:
+        grid: A frozen grid from registry.get_grid.
+
+    Returns:
+        The name index of the grid.
+    """
+    index = _indexes.get(grid)
+    if index is not None:
+        return index
+
+    with _lock:
+        index = _indexes.get(grid)
+        if index is None:
+            index = _indexes[grid] = NameIndex.build(grid)
+        return index
+
+
+def resolve(grid, name):
+    """Resolve a name to a label of a grid, see NameIndex.resolve."""
+    return get_name_index(grid).resolve(name)
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+from typing import NamedTuple
+
+from plugins.grids.GridGraph import GridGraph
+from plugins.grids.CompactGridGraph import CompactGridGraph
+from plugins.grids import compiled
+
+
+GRIDS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_GRID = os.path.join(GRIDS_DIR, 'HCH2.txt')
+
+BACKENDS = {
+    'networkx': GridGraph,
+    'compact': CompactGridGraph,
+}
+
+_lock = threading.RLock()
+
+_maps: dict = {}
+"""Loaded maps with structure as follows:
+{
+    ("/abs/path/to/HCH2.txt", "networkx"): ((st_mtime_ns, st_size), grid),
+}
+"""
+
+_listeners: list = []
+
+
+class MapUpdate(NamedTuple):
+    """A change published by update_cells, as passed to update listeners."""
+    path: str
+    backend: str
+    old_grid: GridGraph
+    new_grid: GridGraph
+    nodes: list
+
+
+def file_key(path: str) -> tuple:
+    """Return the (mtime, size) key a loaded file is cached under."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_hash(path: str) -> str:
+    """Return the sha256 hex digest of a file."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def grid_hash(grid) -> str:
+    """Return the file_hash of the file a grid snapshot was built from.
+
+    Data derived from a snapshot and stored next to its file must be stamped with
+    this hash rather than the file's current one, which may belong to a newer map.
+
+    Returns:
+        The hash, or None for grids not returned by get_grid or update_cells.
+    """
+    return getattr(grid, 'source_hash', None)
+
+
+def get_grid(config_file: str = None, backend: str = 'networkx') -> GridGraph:
+    """Return the shared, frozen GridGraph of a grid file.
+
+    The grid is built on first use and reused until the file's mtime or size
+    changes, in which case it is rebuilt. Callers must not modify the result.
+    Compiled maps (see compiled.py) are memory-mapped whatever the backend.
+
+    Args:
+        config_file: The path to the grid file, DEFAULT_GRID if not given.
+        backend: The GridGraph implementation, one of BACKENDS. Use 'compact'
+            for large venues.
+
+    Returns:
+        The frozen GridGraph snapshot of the file.
+    """
+    path = os.path.abspath(config_file or DEFAULT_GRID)
+    key = file_key(path)
+
+    entry = _maps.get((path, backend))
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    with _lock:
+        entry = _maps.get((path, backend))
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        # Hashed before loading: if the file changes meanwhile, the hash and key
+        # are older than the grid, and the grid is reloaded on the next call
+        source_hash = file_hash(path)
+        if path.endswith(compiled.COMPILED_SUFFIX):
+            grid = compiled.load_compiled(path)
+        else:
+            grid = BACKENDS[backend].load(path)
+        grid.source_hash = source_hash
+        _maps[(path, backend)] = (key, grid)
+        return grid
+
+
+def add_update_listener(listener):
+    """Call listener(update) with a MapUpdate whenever update_cells changes a grid file.
+
+    Listeners run after the file is replaced but before the new grid is published,
+    so data they derive from update.new_grid is in place before any caller sees it.
+    """
+    _listeners.append(listener)
+
+
+def _rewrite_grid_file(path, changes):
+    # Lines are written back with the file's own line endings, so only the changed lines differ
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        text = file.read()
+    lines = text.splitlines()
+    newline = '\r\n' if lines and text[len(lines[0]):].startswith('\r\n') else '\n'
+    end = newline if text.endswith(('\n', '\r')) else ''
+
+    changed = {(x, y): (attribute, label) for x, y, attribute, label in changes}
+    kept = lines[:1]
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) >= 3 and (int(parts[0]), int(parts[1])) in changed:
+            continue
+        kept.append(line)
+    # EMPTY nodes without a label need no line
+    for (x, y), (attribute, label) in changed.items():
+        if attribute != 'EMPTY' or label:
+            kept.append("{} {} {} {}".format(x, y, attribute, label).rstrip())
+
+    tmp_name = path + '.tmp'
+    with open(tmp_name, 'w', encoding='utf-8', newline='') as file:
+        file.write(newline.join(kept) + end)
+    os.replace(tmp_name, path)
+
+
+def update_cells(changes: list, config_file: str = None, backend: str = 'networkx') -> GridGraph:
+    """Change nodes of a grid file in place and publish the new version of the map.
+
+    The grid file is rewritten atomically and the new grid is built from the
+    current one rather than reloaded. Callers holding the previous grid keep an
+    unchanged snapshot; get_grid returns the new one once every update listener
+    has run.
+
+    Args:
+        changes: (x, y, type, label) of every node to change, e.g. (3, 4, 'EMPTY', '')
+            to close a road.
+        config_file: The path to the grid file, DEFAULT_GRID if not given.
+        backend: The GridGraph implementation to build the new grid with.
+
+    Returns:
+        The new frozen GridGraph.
+
+    Raises:
+        ValueError: If a node is not on the grid or a type is not a single word.
+    """
+    path = os.path.abspath(config_file or DEFAULT_GRID)
+    changes = [(int(x), int(y), attribute, ' '.join(label.split())) for x, y, attribute, label in changes]
+
+    with _lock:
+        old_grid = get_grid(path, backend)
+        for x, y, attribute, label in changes:
+            if not old_grid.has_node((x, y)):
+                raise ValueError("Node ({}, {}) is not on the grid".format(x, y))
+            if len(attribute.split()) != 1:
+                raise ValueError("Invalid node type: {!r}".format(attribute))
+
+        new_grid = old_grid.updated(changes)
+        if path.endswith(compiled.COMPILED_SUFFIX):
+            compiled.write_compiled(new_grid, path)
+        else:
+            _rewrite_grid_file(path, changes)
+        new_grid.source_hash = file_hash(path)
+
+        update = MapUpdate(path, backend, old_grid, new_grid, [(x, y) for x, y, _, _ in changes])
+        for listener in _listeners:
+            listener(update)
+
+        # Other backends load the new file on their next use
+        for other in [key for key in _maps if key[0] == path]:
+            del _maps[other]
+        _maps[(path, backend)] = (file_key(path), new_grid)
+        return new_grid
+
+
+def clear():
+    """Drop all loaded maps."""
+    with _lock:
+        _maps.clear()
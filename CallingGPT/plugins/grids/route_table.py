@@ -0,0 +1,343 @@
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+import zipfile
+
+import numpy as np
+
+from plugins.grids import registry, search
+
+
+ROUTE_TABLE_VERSION = 2
+
+_lock = threading.Lock()
+
+_tables = weakref.WeakKeyDictionary()
+"""Loaded route tables by the grid snapshot they belong to, see registry.get_grid."""
+
+
+def file_hash(config_file: str) -> str:
+    """Return the sha256 hex digest of a grid file."""
+    return registry.file_hash(config_file)
+
+
+def neighbour_order(grid) -> str:
+    """Return a digest of the order of the ROAD neighbours of a grid.
+
+    Searches break ties between equally short routes by this order, which differs
+    between backends, so a stored table is only valid for grids of the same order.
+    """
+    return hashlib.sha256(memoryview(grid.road_indices).cast('B')).hexdigest()[:16]
+
+
+def table_file(config_file: str) -> str:
+    """Return where the route table of a grid file is stored, e.g. HCH2.txt.routes.npz next to HCH2.txt.
+
+    Named after the whole file name, so HCH2.txt and its compiled HCH2.gridmap keep a table each.
+    """
+    return config_file + '.routes.npz'
+
+
+class RouteTable:
+    """Shortest routes between the entrances of every pair of stores on a grid.
+
+    A store's entrance is the ROAD node GridGraph.get_road_node_by_label picks for it.
+    Routes are the ones the default search engine returns, so they match what a live
+    GridGraph.get_shortest_path call between the two entrances would give on a grid
+    of the same neighbour order.
+    """
+
+    def __init__(self, grid_hash, order, height, stores, entrances, distances, path_offsets, path_nodes):
+        self.grid_hash = grid_hash
+        self.order = order
+        """The neighbour_order of the grid the routes were searched on."""
+        self.height = height
+        self.stores = list(stores)
+        self.entrances = entrances
+        self.distances = distances
+        """distances[i, j] is the number of steps from store i to store j, -1 if unreachable."""
+        self.path_offsets = path_offsets
+        self.path_nodes = path_nodes
+        """The route from store i to store j is path_nodes[path_offsets[k]:path_offsets[k + 1]]
+        with k = i * len(stores) + j, as node indices x * height + y."""
+        self.store_index = {store: i for i, store in enumerate(self.stores)}
+
+    @classmethod
+    def build(cls, grid, grid_hash):
+        """Search the route between the entrances of every pair of stores.
+
+        Args:
+            grid (GridGraph): The grid to search.
+            grid_hash (str): The hash of the grid file the grid was loaded from, see registry.grid_hash.
+
+        Returns:
+            RouteTable: The route table of the grid.
+        """
+        stores = grid.get_labels_by_type('STORE')
+        entrances = store_entrances(grid, stores)
+
+        count = len(stores)
+        distances = np.full((count, count), -1, dtype=np.int32)
+        path_offsets = np.zeros(count * count + 1, dtype=np.int64)
+        path_nodes = []
+        for i in range(count):
+            for j in range(count):
+                path = None
+                if entrances[i] >= 0 and entrances[j] >= 0:
+                    path = search.bidirectional(grid, int(entrances[i]), int(entrances[j]))
+                if path is not None:
+                    distances[i, j] = len(path) - 1
+                    path_nodes.extend(path)
+                path_offsets[i * count + j + 1] = len(path_nodes)
+
+        return cls(grid_hash, neighbour_order(grid), grid.height, stores, entrances, distances,
+                   path_offsets, np.array(path_nodes, dtype=np.int32))
+
+    def updated(self, grid, nodes, grid_hash):
+        """Return the route table of grid, the grid of this table with some nodes changed.
+
+        Only the routes the change can affect are searched again: routes from or to
+        a store whose entrance moved, routes through a node that is no longer a ROAD
+        node and routes a new ROAD node makes shorter. The other routes are kept, so
+        they stay shortest routes but may differ from the one build would pick among
+        equally short ones.
+
+        Args:
+            grid (GridGraph): The changed grid.
+            nodes (list): The coordinates (x, y) of the changed nodes.
+            grid_hash (str): The hash of the changed grid file.
+
+        Returns:
+            RouteTable: The route table of the changed grid.
+        """
+        if not self.stores:
+            # Nothing to carry over
+            return RouteTable.build(grid, grid_hash)
+
+        stores = grid.get_labels_by_type('STORE')
+        entrances = store_entrances(grid, stores)
+        count, old_count = len(stores), len(self.stores)
+
+        changed = np.array([x * grid.height + y for x, y in nodes], dtype=np.int32)
+        road = np.frombuffer(grid.road_mask, dtype=np.uint8).view(bool)
+        closed = changed[~road[changed]]
+        opened = changed[road[changed]]
+
+        # Old routes through a node that is no longer a ROAD node
+        blocked = np.zeros(old_count * old_count, dtype=bool)
+        pairs = np.repeat(np.arange(old_count * old_count), np.diff(self.path_offsets))
+        blocked[pairs[np.isin(self.path_nodes, closed)]] = True
+
+        # Reuse the old route when both stores kept their entrance and the route is still open
+        old = np.array([self.store_index.get(store, 0) for store in stores], dtype=np.int64)
+        kept = np.array([store in self.store_index for store in stores], dtype=bool) & (self.entrances[old] == entrances)
+        reuse = kept[:, None] & kept[None, :] & ~blocked[old[:, None] * old_count + old[None, :]]
+        old_distances = self.distances[old[:, None], old[None, :]]
+
+        # ... and no new ROAD node is on a shorter way between them
+        for node in opened:
+            distances = search.numpy_distances(grid, [node])[0][entrances]
+            reached = (entrances >= 0) & (distances >= 0)
+            detour = distances[:, None] + distances[None, :]
+            reuse &= ~(reached[:, None] & reached[None, :] & ((old_distances < 0) | (detour < old_distances)))
+
+        new_distances = np.full((count, count), -1, dtype=np.int32)
+        path_offsets = np.zeros(count * count + 1, dtype=np.int64)
+        path_nodes = []
+        for i in range(count):
+            for j in range(count):
+                if reuse[i, j]:
+                    k = old[i] * old_count + old[j]
+                    path = self.path_nodes[self.path_offsets[k]:self.path_offsets[k + 1]].tolist()
+                    new_distances[i, j] = self.distances[old[i], old[j]]
+                else:
+                    path = None
+                    if entrances[i] >= 0 and entrances[j] >= 0:
+                        path = search.bidirectional(grid, int(entrances[i]), int(entrances[j]))
+                    if path is not None:
+                        new_distances[i, j] = len(path) - 1
+                path_nodes.extend(path or [])
+                path_offsets[i * count + j + 1] = len(path_nodes)
+
+        return RouteTable(grid_hash, neighbour_order(grid), grid.height, stores, entrances, new_distances,
+                          path_offsets, np.array(path_nodes, dtype=np.int32))
+
+    @classmethod
+    def load(cls, file_name):
+        """Load a route table written by save.
+
+        Returns:
+            RouteTable: The route table, or None if the file was written by another format version.
+        """
+        with np.load(file_name, allow_pickle=False) as data:
+            if int(data['version']) != ROUTE_TABLE_VERSION:
+                return None
+            return cls(str(data['grid_hash']), str(data['order']), int(data['height']), data['stores'].tolist(),
+                       data['entrances'], data['distances'], data['path_offsets'], data['path_nodes'])
+
+    def save(self, file_name):
+        """Write the route table, replacing any existing file atomically.
+
+        Every writer uses a temporary file of its own, so processes building the
+        same table at once don't write over each other's.
+        """
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(
+                file,
+                version=ROUTE_TABLE_VERSION,
+                grid_hash=self.grid_hash,
+                order=self.order,
+                height=self.height,
+                stores=np.array(self.stores, dtype=str),
+                entrances=self.entrances,
+                distances=self.distances,
+                path_offsets=self.path_offsets,
+                path_nodes=self.path_nodes,
+            )
+        os.replace(tmp_name, file_name)
+
+    def get_path(self, start_store, end_store):
+        """Return the route between two stores' entrances.
+
+        Args:
+            start_store (str): The label of the starting store.
+            end_store (str): The label of the destination store.
+
+        Returns:
+            list: The coordinates (x, y) of the nodes on the route, or None if there is no route.
+
+        Raises:
+            KeyError: If a store is not in the table or has no entrance.
+        """
+        i = self.store_index[start_store]
+        j = self.store_index[end_store]
+        if self.entrances[i] < 0 or self.entrances[j] < 0:
+            raise KeyError("Store has no entrance")
+        if self.distances[i, j] < 0:
+            return None
+        k = i * len(self.stores) + j
+        nodes = self.path_nodes[self.path_offsets[k]:self.path_offsets[k + 1]]
+        return [divmod(int(node), self.height) for node in nodes]
+
+
+def store_entrances(grid, stores):
+    """Return the node index of the entrance of every store, -1 for stores without one.
+
+    A store's entrance is the ROAD node GridGraph.get_road_node_by_label picks for it.
+    """
+    entrances = np.full(len(stores), -1, dtype=np.int32)
+    for i, store in enumerate(stores):
+        road_node = grid.get_road_node_by_label(store)
+        if road_node is not None:
+            entrances[i] = road_node[0] * grid.height + road_node[1]
+    return entrances
+
+
+def build_route_table(config_file: str = None, grid=None) -> RouteTable:
+    """Build the route table of a grid file and store it next to the file.
+
+    The table is stamped with the hash of the file version the grid was built
+    from, and only stored when that version is known, see registry.grid_hash.
+
+    Args:
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The new route table.
+    """
+    path = os.path.abspath(config_file or registry.DEFAULT_GRID)
+    if grid is None:
+        grid = registry.get_grid(path)
+    table = RouteTable.build(grid, registry.grid_hash(grid))
+    if table.grid_hash is not None:
+        table.save(table_file(path))
+    return table
+
+
+def get_route_table(config_file: str = None, grid=None) -> RouteTable:
+    """Return the route table of a grid file.
+
+    The table is read from its file next to the grid file, and only rebuilt (and
+    written back) when it is missing, can't be read or was built from another version of the
+    file or a grid of another neighbour order.
+    Tables belong to a grid snapshot, so callers that pass the grid they work
+    with get a matching table even while the map is being updated.
+
+    Args:
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The route table of the grid.
+    """
+    path = os.path.abspath(config_file or registry.DEFAULT_GRID)
+    if grid is None:
+        grid = registry.get_grid(path)
+
+    table = _tables.get(grid)
+    if table is not None:
+        return table
+
+    with _lock:
+        table = _tables.get(grid)
+        if table is not None:
+            return table
+
+        grid_hash = registry.grid_hash(grid)
+        if grid_hash is not None and os.path.exists(table_file(path)):
+            try:
+                table = RouteTable.load(table_file(path))
+            except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+                # Unreadable, e.g. cut short, so rebuilt like a missing one
+                table = None
+        if table is None or table.grid_hash != grid_hash or table.order != neighbour_order(grid):
+            table = build_route_table(path, grid)
+
+        _tables[grid] = table
+        return table
+
+
+def _on_update(update):
+    # Carry the table of the previous version over instead of rebuilding it
+    table = _tables.get(update.old_grid)
+    if table is None:
+        return
+    with _lock:
+        table = table.updated(update.new_grid, update.nodes, registry.grid_hash(update.new_grid))
+        table.save(table_file(update.path))
+        _tables[update.new_grid] = table
+
+
+registry.add_update_listener(_on_update)
+
+
+def find_path(start_label: str, end_label: str, config_file: str = None, grid=None) -> list:
+    """Return the route between two positions, as shortest_path_calculation walks it.
+
+    Pairs of stores are read from the route table. Other positions are routed
+    live from the ROAD node next to them.
+
+    Args:
+        start_label: The label of the starting position.
+        end_label: The label of the destination.
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The coordinates (x, y) of the nodes on the route, or None if there is no route.
+
+    Raises:
+        ValueError: If a label is unknown or has no ROAD node next to it.
+    """
+    if grid is None:
+        grid = registry.get_grid(config_file)
+    try:
+        return get_route_table(config_file, grid).get_path(start_label, end_label)
+    except KeyError:
+        start_road = grid.get_nearest_store(start_label, node_type='ROAD')
+        end_road = grid.get_nearest_store(end_label, node_type='ROAD')
+        return grid.get_shortest_path(start_road, end_road)
@@ -0,0 +1,283 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+
+def _walk_back(pred, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = pred[node]
+    path.reverse()
+    return path
+
+
+def bidirectional(grid, source, target):
+    """Bidirectional BFS, breaking ties exactly like networkx's shortest_path.
+
+    Args:
+        grid (GridGraph): A grid with compiled ROAD adjacency.
+        source (int): The node index to start from.
+        target (int): The node index to reach.
+
+    Returns:
+        list: The node indices of the path, or None if there is no path.
+    """
+    if source == target:
+        return [source]
+
+    indptr, indices = grid.road_indptr, grid.road_indices
+    pred = {source: None}
+    succ = {target: None}
+    forward_fringe = [source]
+    reverse_fringe = [target]
+    meet = None
+
+    while meet is None and forward_fringe and reverse_fringe:
+        if len(forward_fringe) <= len(reverse_fringe):
+            this_level, forward_fringe = forward_fringe, []
+            for v in this_level:
+                for w in indices[indptr[v]:indptr[v + 1]]:
+                    if w not in pred:
+                        forward_fringe.append(w)
+                        pred[w] = v
+                    if w in succ:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+        else:
+            this_level, reverse_fringe = reverse_fringe, []
+            for v in this_level:
+                for w in indices[indptr[v]:indptr[v + 1]]:
+                    if w not in succ:
+                        succ[w] = v
+                        reverse_fringe.append(w)
+                    if w in pred:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+
+    if meet is None:
+        return None
+
+    path = _walk_back(pred, meet)
+    w = succ[meet]
+    while w is not None:
+        path.append(w)
+        w = succ[w]
+    return path
+
+
+def bfs(grid, source, target):
+    """Breadth-first search from source, stopping as soon as target is reached.
+
+    Args and Returns are the same as bidirectional.
+    """
+    indptr, indices = grid.road_indptr, grid.road_indices
+    pred = {source: None}
+    queue = deque([source])
+
+    while queue and target not in pred:
+        v = queue.popleft()
+        for w in indices[indptr[v]:indptr[v + 1]]:
+            if w not in pred:
+                pred[w] = v
+                queue.append(w)
+
+    if target not in pred:
+        return None
+    return _walk_back(pred, target)
+
+
+def one_to_many(grid, source, targets):
+    """Breadth-first search from source until every target is reached.
+
+    Args:
+        grid (GridGraph): A grid with compiled ROAD adjacency.
+        source (int): The node index to start from.
+        targets (list): The node indices to reach.
+
+    Returns:
+        list: For every target, the node indices of the path, or None if there is no path.
+    """
+    indptr, indices = grid.road_indptr, grid.road_indices
+    pred = {source: None}
+    remaining = set(targets)
+    remaining.discard(source)
+    queue = deque([source])
+
+    while queue and remaining:
+        v = queue.popleft()
+        for w in indices[indptr[v]:indptr[v + 1]]:
+            if w not in pred:
+                pred[w] = v
+                queue.append(w)
+                remaining.discard(w)
+
+    return [_walk_back(pred, target) if target in pred else None for target in targets]
+
+
+def astar(grid, source, target):
+    """A* search with the Manhattan distance as heuristic.
+
+    Among nodes with the same estimate the deepest one is expanded first, which
+    keeps the search close to a straight line on open corridors.
+
+    Args and Returns are the same as bidirectional.
+    """
+    indptr, indices, height = grid.road_indptr, grid.road_indices, grid.height
+    tx, ty = divmod(target, height)
+
+    def heuristic(node):
+        x, y = divmod(node, height)
+        return abs(x - tx) + abs(y - ty)
+
+    pred = {source: None}
+    cost = {source: 0}
+    heap = [(heuristic(source), 0, source)]
+
+    while heap:
+        _, neg_g, v = heapq.heappop(heap)
+        if v == target:
+            return _walk_back(pred, target)
+        g = -neg_g
+        if g > cost[v]:
+            continue
+        for w in indices[indptr[v]:indptr[v + 1]]:
+            if w not in cost or g + 1 < cost[w]:
+                cost[w] = g + 1
+                pred[w] = v
+                heapq.heappush(heap, (g + 1 + heuristic(w), -(g + 1), w))
+
+    return None
+
+
+def _expand(frontier, height, size):
+    y = frontier % height
+    # W, N, E, S neighbours of the frontier and the node each came from
+    candidates = np.concatenate([
+        frontier[frontier >= height] - height,
+        frontier[y > 0] - 1,
+        frontier[frontier < size - height] + height,
+        frontier[y < height - 1] + 1,
+    ])
+    parents = np.concatenate([
+        frontier[frontier >= height],
+        frontier[y > 0],
+        frontier[frontier < size - height],
+        frontier[y < height - 1],
+    ])
+    return candidates, parents
+
+
+def numpy_bfs(grid, source, target=None):
+    """Level-synchronous BFS with every frontier expanded by array operations.
+
+    Only uses the ROAD mask and the grid shape, so it suits large grids where a
+    Python loop per node is the bottleneck.
+
+    Args:
+        grid (GridGraph): A grid with compiled ROAD adjacency.
+        source (int): The node index to start from.
+        target (int): The node index to reach, or None to search the whole grid.
+
+    Returns:
+        list: The node indices of the path, or None if there is no path. Without a
+            target, the predecessor array of the whole search is returned instead,
+            -1 marking unreached nodes and the source being its own predecessor.
+    """
+    height = grid.height
+    size = grid.width * height
+    road = np.frombuffer(grid.road_mask, dtype=np.uint8).view(bool)
+
+    pred = np.full(size, -1, dtype=np.int32)
+    pred[source] = source
+    frontier = np.array([source], dtype=np.int32)
+
+    while len(frontier) and (target is None or pred[target] < 0):
+        candidates, parents = _expand(frontier, height, size)
+        fresh = road[candidates] & (pred[candidates] < 0)
+        frontier, first = np.unique(candidates[fresh], return_index=True)
+        pred[frontier] = parents[fresh][first]
+
+    if target is None:
+        return pred
+    if pred[target] < 0:
+        return None
+
+    path = [target]
+    while path[-1] != source:
+        path.append(int(pred[path[-1]]))
+    path.reverse()
+    return path
+
+
+def numpy_distances(grid, sources, out=None):
+    """Level-synchronous BFS like numpy_bfs from several sources at once, counting the steps to every node.
+
+    The searches from all sources share every array operation, so a level costs
+    the same whether it expands one search or hundreds.
+
+    Args:
+        grid (GridGraph): A grid with compiled ROAD adjacency.
+        sources (list): The node indices to start from, -1 for a search that reaches nothing.
+        out (numpy.ndarray): An int32 array of shape (len(sources), nodes) to fill, a new one if not given.
+
+    Returns:
+        numpy.ndarray: out[i, node] is the number of steps from sources[i] to node index node, -1 for unreached nodes.
+    """
+    height = grid.height
+    size = grid.width * height
+    road = np.frombuffer(grid.road_mask, dtype=np.uint8).view(bool)
+
+    distances = np.empty((len(sources), size), dtype=np.int32) if out is None else out
+    distances[:] = -1
+    flat = distances.reshape(-1)
+
+    # Search i works on the slice flat[i * size:(i + 1) * size]
+    sources = np.asarray(sources, dtype=np.int64)
+    frontier = np.flatnonzero(sources >= 0) * size + sources[sources >= 0]
+    flat[frontier] = 0
+
+    level = 0
+    while len(frontier):
+        level += 1
+        nodes = frontier % size
+        y = nodes % height
+        candidates = np.concatenate([
+            frontier[nodes >= height] - height,
+            frontier[y > 0] - 1,
+            frontier[nodes < size - height] + height,
+            frontier[y < height - 1] + 1,
+        ])
+        candidates = candidates[road[candidates % size] & (flat[candidates] == -1)]
+        # Drop duplicates without sorting: the last write of a marker wins, and only that copy keeps its marker
+        markers = -2 - np.arange(len(candidates), dtype=np.int32)
+        flat[candidates] = markers
+        frontier = candidates[flat[candidates] == markers]
+        flat[frontier] = level
+
+    return distances
+
+
+def hierarchical(grid, source, target):
+    """Search on the abstract graph of hierarchy.HierarchicalRouter, for very large grids.
+
+    Args and Returns are the same as bidirectional.
+    """
+    from plugins.grids import hierarchy
+    return hierarchy.hierarchical(grid, source, target)
+
+
+ENGINES = {
+    'bidirectional': bidirectional,
+    'bfs': bfs,
+    'astar': astar,
+    'numpy': numpy_bfs,
+    'hierarchical': hierarchical,
+}
+"""Search engines usable by GridGraph.get_shortest_path, all returning shortest paths.
+'bidirectional' is the default and matches the routes networkx used to return."""
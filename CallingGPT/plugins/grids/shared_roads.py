@@ -0,0 +1,144 @@
+import threading
+import weakref
+
+import numpy as np
+
+
+_NEIGHBOR_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+_lock = threading.Lock()
+
+_tables = weakref.WeakKeyDictionary()
+"""Shared road tables by the grid snapshot they belong to, see registry.get_grid."""
+
+
+def _calculate_distance(node1, node2):
+    """Calculate the distance between two nodes."""
+    dx = abs(node1[0] - node2[0])
+    dy = abs(node1[1] - node2[1])
+
+    # Use 1 for vertical/horizontal distance, and 1.5 for diagonal
+    if dx == 0 or dy == 0:
+        return dx + dy  # Horizontal or vertical neighbors
+    else:
+        return 1.5 * (dx + dy)  # Diagonal neighbors
+
+
+def find_shared_road(grid, start_label, end_label):
+    """Find the closest ROAD node that touches both a node of start_label and a node of end_label.
+
+    Args:
+        grid (GridGraph): The grid to search.
+        start_label (str): The label of the first store.
+        end_label (str): The label of the second store.
+
+    Returns:
+        tuple: The coordinates (x, y) of the ROAD node, or None if there is none.
+
+    Raises:
+        ValueError: If no node with one of the labels is found.
+    """
+    closest_node = None
+    min_distance = float('inf')
+
+    for start_node in grid.get_nodes_by_label(start_label):
+        for end_node in grid.get_nodes_by_label(end_label):
+            # Get the neighbors of both nodes
+            start_neighbors = [(start_node[0] + dx, start_node[1] + dy) for dx, dy in _NEIGHBOR_OFFSETS]
+            end_neighbors = [(end_node[0] + dx, end_node[1] + dy) for dx, dy in _NEIGHBOR_OFFSETS]
+
+            # Find the intersection of neighbors of both nodes
+            common_neighbors = set(start_neighbors) & set(end_neighbors)
+
+            for neighbor in common_neighbors:
+                if grid.has_node(neighbor) and grid.node_attributes[neighbor][0] == 'ROAD':
+                    dist_start = _calculate_distance(start_node, neighbor)
+                    dist_end = _calculate_distance(end_node, neighbor)
+                    total_distance = dist_start + dist_end
+
+                    if total_distance < min_distance:
+                        min_distance = total_distance
+                        closest_node = neighbor
+
+    return closest_node
+
+
+class SharedRoadTable:
+    """The answer of find_shared_road for every pair of stores on a grid."""
+
+    def __init__(self, height, stores, roads):
+        self.height = height
+        self.stores = list(stores)
+        self.roads = roads
+        """roads[i, j] is the node index x * height + y of the shared ROAD node of
+        stores i and j, -1 if they share none."""
+        self.store_index = {store: i for i, store in enumerate(self.stores)}
+
+    @classmethod
+    def build(cls, grid):
+        """Run find_shared_road for every pair of stores that can share a ROAD node.
+
+        Two nodes only have a common neighbour when they are at most two nodes
+        apart, so all other pairs are recorded as sharing none without a search.
+
+        Args:
+            grid (GridGraph): The grid to search.
+
+        Returns:
+            SharedRoadTable: The table of the grid.
+        """
+        stores = grid.get_labels_by_type('STORE')
+        store_index = {store: i for i, store in enumerate(stores)}
+        roads = np.full((len(stores), len(stores)), -1, dtype=np.int32)
+
+        for i, store in enumerate(stores):
+            candidates = set()
+            for x, y in grid.get_nodes_by_label(store):
+                for dx in range(-2, 3):
+                    for dy in range(-2, 3):
+                        node = (x + dx, y + dy)
+                        if grid.has_node(node) and grid.node_attributes[node][1] in store_index:
+                            candidates.add(store_index[grid.node_attributes[node][1]])
+
+            for j in candidates:
+                road = find_shared_road(grid, store, stores[j])
+                if road is not None:
+                    roads[i, j] = road[0] * grid.height + road[1]
+
+        return cls(grid.height, stores, roads)
+
+    def get_road(self, start_store, end_store):
+        """Return the shared ROAD node of two stores.
+
+        Args:
+            start_store (str): The label of the first store.
+            end_store (str): The label of the second store.
+
+        Returns:
+            tuple: The coordinates (x, y) of the ROAD node, or None if there is none.
+
+        Raises:
+            KeyError: If a store is not in the table.
+        """
+        road = self.roads[self.store_index[start_store], self.store_index[end_store]]
+        return divmod(int(road), self.height) if road >= 0 else None
+
+
+def get_shared_road_table(grid) -> SharedRoadTable:
+    """Return the shared road table of a grid snapshot, building it on first use.
+
+    Args:
+        grid: A frozen grid from registry.get_grid.
+
+    Returns:
+        The shared road table of the grid.
+    """
+    table = _tables.get(grid)
+    if table is not None:
+        return table
+
+    with _lock:
+        table = _tables.get(grid)
+        if table is None:
+            table = _tables[grid] = SharedRoadTable.build(grid)
+        return table
@@ -0,0 +1,139 @@
+import itertools
+
+
+EXACT_LIMIT = 10
+"""Up to this many stops the order is solved exactly, above it heuristically."""
+
+
+def route_length(distances, order):
+    """Return the length of visiting the nodes in order.
+
+    Args:
+        distances (list): distances[i][j] is the distance from node i to node j.
+        order (list): The nodes in visiting order.
+    """
+    return sum(distances[a][b] for a, b in zip(order, order[1:]))
+
+
+def held_karp(distances):
+    """Exact shortest route from node 0 through every other node, by dynamic programming.
+
+    Args:
+        distances (list): distances[i][j] is the distance from node i to node j.
+
+    Returns:
+        list: The nodes in visiting order, starting with node 0.
+    """
+    count = len(distances)
+    if count <= 2:
+        return list(range(count))
+
+    # best[mask][j]: shortest route from 0 through the stops in mask, ending at stop j
+    stops = count - 1
+    best = [[None] * stops for _ in range(1 << stops)]
+    for j in range(stops):
+        best[1 << j][j] = (distances[0][j + 1], None)
+
+    for mask in range(1, 1 << stops):
+        for j in range(stops):
+            if best[mask][j] is None:
+                continue
+            length = best[mask][j][0]
+            for k in range(stops):
+                if mask & (1 << k):
+                    continue
+                candidate = length + distances[j + 1][k + 1]
+                entry = best[mask | (1 << k)][k]
+                if entry is None or candidate < entry[0]:
+                    best[mask | (1 << k)][k] = (candidate, j)
+
+    full = (1 << stops) - 1
+    j = min(range(stops), key=lambda j: best[full][j][0])
+    order = []
+    mask = full
+    while j is not None:
+        order.append(j + 1)
+        j, mask = best[mask][j][1], mask & ~(1 << j)
+    return [0] + order[::-1]
+
+
+def nearest_neighbour(distances):
+    """Greedy route from node 0, always going to the closest unvisited node."""
+    order = [0]
+    remaining = set(range(1, len(distances)))
+    while remaining:
+        nearest = min(remaining, key=lambda j: (distances[order[-1]][j], j))
+        order.append(nearest)
+        remaining.remove(nearest)
+    return order
+
+
+def two_opt(distances, order):
+    """Improve a route from a fixed first node by reversing stretches of it until no reversal helps."""
+    order = list(order)
+    length = route_length(distances, order)
+    improved = True
+    while improved:
+        improved = False
+        for i, j in itertools.combinations(range(1, len(order)), 2):
+            candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+            candidate_length = route_length(distances, candidate)
+            if candidate_length < length:
+                order, length = candidate, candidate_length
+                improved = True
+    return order
+
+
+def or_opt(distances, order):
+    """Improve a route from a fixed first node by moving stretches of up to 3 nodes elsewhere."""
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+        length = route_length(distances, order)
+        for size in (1, 2, 3):
+            for i in range(1, len(order) - size + 1):
+                segment = order[i:i + size]
+                rest = order[:i] + order[i + size:]
+                for position in range(1, len(rest) + 1):
+                    if position == i:
+                        continue
+                    candidate = rest[:position] + segment + rest[position:]
+                    candidate_length = route_length(distances, candidate)
+                    if candidate_length < length:
+                        order, length = candidate, candidate_length
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return order
+
+
+def solve_order(distances):
+    """Find a short route from node 0 through every other node.
+
+    Solved exactly with held_karp for up to EXACT_LIMIT other nodes, otherwise
+    with nearest_neighbour improved by two_opt and or_opt.
+
+    Args:
+        distances (list): distances[i][j] is the distance from node i to node j, None if unreachable.
+
+    Returns:
+        list: The nodes in visiting order, starting with node 0.
+    """
+    # Unreachable legs cost more than any route made of reachable ones
+    finite = [d for row in distances for d in row if d is not None]
+    unreachable = (max(finite, default=0) + 1) * len(distances)
+    distances = [[unreachable if d is None else d for d in row] for row in distances]
+
+    if len(distances) - 1 <= EXACT_LIMIT:
+        return held_karp(distances)
+
+    order = nearest_neighbour(distances)
+    while True:
+        length = route_length(distances, order)
+        order = or_opt(distances, two_opt(distances, order))
+        if route_length(distances, order) >= length:
+            return order
@@ -0,0 +1,292 @@
+"""Weighted routing, for routes that avoid stairs, crowded food courts and the like.
+
+Stepping onto a ROAD node costs that node's cost, 1 unless the cost file of the
+grid says otherwise. The cost file sits next to the grid file, HCH2.costs for
+HCH2.txt, with one node per line:
+
+    # x y cost [note]
+    4 6 5 stairs
+    7 2 3 food court at lunch
+
+Routes are searched with A* on a binary heap. Its heuristic comes from ALT
+preprocessing: the weighted distances from a few landmark nodes to every node,
+which bound the distance between any two nodes by the triangle inequality.
+"""
+
+import heapq
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from plugins.grids import registry
+
+
+LANDMARKS = 8
+
+ACTIVE_LANDMARKS = 3
+"""The landmarks a query bounds its distances with, the ones best for its source and target."""
+
+COSTS_SUFFIX = '.costs'
+
+_lock = threading.Lock()
+
+_routers = weakref.WeakKeyDictionary()
+"""Weighted routers by the grid snapshot they belong to, see registry.get_grid,
+as (cost file key, router) so that editing the cost file rebuilds them."""
+
+
+def costs_file(config_file: str) -> str:
+    """Return where the costs of a grid file are stored, e.g. HCH2.costs next to HCH2.txt."""
+    return os.path.splitext(config_file)[0] + COSTS_SUFFIX
+
+
+def load_costs(grid, file_name=None):
+    """Read the cost of every node of a grid.
+
+    Args:
+        grid (GridGraph): The grid the costs belong to.
+        file_name (str): The path to the cost file, every node costing 1 if not given.
+
+    Returns:
+        numpy.ndarray: costs[x * height + y] is the cost of stepping onto node (x, y).
+
+    Raises:
+        ValueError: If a line is malformed, names a node off the grid or has a negative cost.
+    """
+    costs = np.ones(grid.width * grid.height, dtype=np.float64)
+    if file_name is None:
+        return costs
+
+    with open(file_name, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            parts = line.split('#', 1)[0].split()
+            if not parts:
+                continue
+            try:
+                x, y, cost = int(parts[0]), int(parts[1]), float(parts[2])
+            except (IndexError, ValueError):
+                raise ValueError("Malformed cost on line {} of {}".format(number, file_name))
+            if not grid.has_node((x, y)) or not cost >= 0:
+                raise ValueError("Invalid cost on line {} of {}".format(number, file_name))
+            costs[x * grid.height + y] = cost
+    return costs
+
+
+def dijkstra(grid, costs, source):
+    """Weighted distances from a node to every node.
+
+    Args:
+        grid (GridGraph): A grid with compiled ROAD adjacency.
+        costs (numpy.ndarray): The cost of every node, see load_costs.
+        source (int): The node index to start from.
+
+    Returns:
+        numpy.ndarray: The distance to every node index, inf for unreached nodes.
+    """
+    indptr, indices = grid.road_indptr, grid.road_indices
+    step = costs.tolist()
+    distances = [float('inf')] * len(step)
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap:
+        g, v = heapq.heappop(heap)
+        if g > distances[v]:
+            continue
+        for w in indices[indptr[v]:indptr[v + 1]].tolist():
+            if g + step[w] < distances[w]:
+                distances[w] = g + step[w]
+                heapq.heappush(heap, (g + step[w], w))
+
+    return np.array(distances)
+
+
+class WeightedRouter:
+    """Cheapest routes over the ROAD nodes of a grid with per-node costs."""
+
+    def __init__(self, grid, costs, landmarks=LANDMARKS):
+        """Pick the landmarks and search from each of them.
+
+        Landmarks are picked one by one as the ROAD node farthest from the ones
+        already picked, which spreads them along the edges of the map.
+
+        Args:
+            grid (GridGraph): A grid with compiled ROAD adjacency.
+            costs (numpy.ndarray): The cost of every node, see load_costs.
+            landmarks (int): The number of landmarks, 0 for plain Dijkstra.
+        """
+        self.grid = grid
+        self.costs = costs
+        self.step = costs.tolist()
+        self.landmarks = []
+        road = np.flatnonzero(np.frombuffer(grid.road_mask, dtype=np.uint8))
+        self.lowest = float(costs[road].min()) if len(road) else 1.0
+
+        tables = []
+        if len(road) and landmarks > 0:
+            # Start from the node farthest from an arbitrary one, then keep maximising the distance to the closest landmark
+            closest = dijkstra(grid, costs, int(road[0]))
+            for _ in range(landmarks):
+                score = np.where(np.isfinite(closest), closest, -1.0)
+                landmark = int(np.argmax(score))
+                if landmark in self.landmarks:
+                    break
+                self.landmarks.append(landmark)
+                tables.append(dijkstra(grid, costs, landmark))
+                closest = tables[-1] if len(tables) == 1 else np.minimum(closest, tables[-1])
+        self.table = np.stack(tables) if tables else np.zeros((0, len(costs)))
+        """table[i, node] is the distance from landmark i to node, inf if it can't reach it."""
+        # Indexing a memoryview gives a float without going through numpy scalars
+        self.rows = [memoryview(row) for row in self.table]
+
+    def _heuristic(self, source, target):
+        """Return the ALT lower bound of the distance from a node to target.
+
+        The distance from a to b and from b to a only differ by the costs of the
+        two ends, so the distances from a landmark also bound the distances to it.
+        Only the ACTIVE_LANDMARKS landmarks giving the best bound at source are
+        used, together with the Manhattan bound.
+        """
+        rows, step = self.rows, self.step
+        bounds = []
+        for row in rows:
+            to_target, from_source = row[target], row[source]
+            if to_target != float('inf') and from_source != float('inf'):
+                bounds.append((max(to_target - from_source, from_source - to_target + step[target] - step[source]),
+                               row, to_target, to_target - step[target]))
+        bounds.sort(key=lambda bound: -bound[0])
+        active = [bound[1:] for bound in bounds[:ACTIVE_LANDMARKS]]
+        height, lowest = self.grid.height, self.lowest
+        tx, ty = divmod(target, height)
+
+        def heuristic(node):
+            x, y = divmod(node, height)
+            bound = (abs(x - tx) + abs(y - ty)) * lowest
+            for row, to_target, rise in active:
+                from_landmark = row[node]
+                if to_target - from_landmark > bound:
+                    bound = to_target - from_landmark
+                if from_landmark - rise - step[node] > bound:
+                    bound = from_landmark - rise - step[node]
+            return bound
+
+        return heuristic
+
+    def _manhattan(self, target):
+        """Return the Manhattan distance to target times the lowest cost, a lower bound of the distance."""
+        height, lowest = self.grid.height, self.lowest
+        tx, ty = divmod(target, height)
+
+        def heuristic(node):
+            x, y = divmod(node, height)
+            return (abs(x - tx) + abs(y - ty)) * lowest
+
+        return heuristic
+
+    def route(self, source, target, heuristic='alt'):
+        """Find the cheapest route between two ROAD nodes.
+
+        Args:
+            source (int): The node index to start from.
+            target (int): The node index to reach.
+            heuristic (str): 'alt' for A* with the landmark bounds, 'manhattan' for A* with
+                the Manhattan distance times the lowest cost, None for Dijkstra.
+
+        Returns:
+            tuple: The node indices of the route and its cost, or None if there is no route.
+        """
+        indptr, indices = self.grid.road_indptr, self.grid.road_indices
+        costs = self.step
+        if heuristic == 'alt':
+            estimate = self._heuristic(source, target)
+        elif heuristic == 'manhattan':
+            estimate = self._manhattan(target)
+        else:
+            def estimate(node):
+                return 0.0
+
+        pred = {source: None}
+        cost = {source: 0.0}
+        heap = [(estimate(source), 0.0, source)]
+        while heap:
+            _, g, v = heapq.heappop(heap)
+            if v == target:
+                path = [target]
+                while pred[path[-1]] is not None:
+                    path.append(pred[path[-1]])
+                path.reverse()
+                return path, g
+            if g > cost[v]:
+                continue
+            for w in indices[indptr[v]:indptr[v + 1]].tolist():
+                step = g + costs[w]
+                if w not in cost or step < cost[w]:
+                    h = estimate(w)
+                    if h == float('inf'):
+                        continue
+                    cost[w] = step
+                    pred[w] = v
+                    heapq.heappush(heap, (step + h, step, w))
+
+        return None
+
+
+def get_router(config_file: str = None, grid=None) -> WeightedRouter:
+    """Return the weighted router of a grid file with the costs of its cost file.
+
+    Args:
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The router, rebuilt when the grid or the cost file changes.
+    """
+    path = os.path.abspath(config_file or registry.DEFAULT_GRID)
+    if grid is None:
+        grid = registry.get_grid(path)
+    cost_path = costs_file(path)
+    key = registry.file_key(cost_path) if os.path.exists(cost_path) else None
+
+    entry = _routers.get(grid)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    with _lock:
+        entry = _routers.get(grid)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        router = WeightedRouter(grid, load_costs(grid, cost_path if key is not None else None))
+        _routers[grid] = (key, router)
+        return router
+
+
+def find_path(start_label: str, end_label: str, config_file: str = None, grid=None) -> list:
+    """Return the cheapest route between two positions, entered from the ROAD node next to them.
+
+    Args:
+        start_label: The label of the starting position.
+        end_label: The label of the destination.
+        config_file: The path to the grid file, registry.DEFAULT_GRID if not given.
+        grid: The grid of the file, registry.get_grid(config_file) if not given.
+
+    Returns:
+        The coordinates (x, y) of the nodes on the route, or None if there is no route.
+
+    Raises:
+        ValueError: If a label is unknown or has no ROAD node next to it.
+    """
+    if grid is None:
+        grid = registry.get_grid(config_file)
+    ends = []
+    for label in (start_label, end_label):
+        node = grid.get_road_node_by_label(label)
+        if node is None:
+            raise ValueError("No ROAD node next to {}".format(label))
+        ends.append(node[0] * grid.height + node[1])
+
+    route = get_router(config_file, grid).route(*ends)
+    if route is None:
+        return None
+    return [divmod(int(node), grid.height) for node in route[0]]
@@ -0,0 +1,61 @@
+from plugins.grids import names, registry, route_table, tour
+
+
+def itinerary_planning(Cu: str, stores: list[str]) -> str:
+    """Plan the order to visit several stores in and the route through them.
+
+    Args:
+        Cu: The current position, is also the starting position.
+        stores: The stores to visit, in any order.
+
+    Returns:
+        the visiting order on the first line and the whole route on the second, then the stores that can't be reached, if any
+    """
+    grid = registry.get_grid()
+    table = route_table.get_route_table(grid=grid)
+
+    # Slightly wrong names are resolved locally
+    try:
+        stores = [names.resolve(grid, store) for store in [Cu, *stores]]
+    except names.UnknownName as e:
+        return str(e)
+
+    stops = stores[:1]
+    for store in stores[1:]:
+        if store not in stops:
+            stops.append(store)
+
+    # Distances between stores come from the route table, others are routed live
+    paths = {}
+    distances = [[0] * len(stops) for _ in stops]
+    for i, start in enumerate(stops):
+        for j, end in enumerate(stops):
+            if i == j:
+                continue
+            if start in table.store_index and end in table.store_index:
+                distance = int(table.distances[table.store_index[start], table.store_index[end]])
+                distances[i][j] = distance if distance >= 0 else None
+            else:
+                paths[i, j] = route_table.find_path(start, end, grid=grid)
+                distances[i][j] = len(paths[i, j]) - 1 if paths[i, j] is not None else None
+
+    # Stores that can't be reached from the start are left out of the tour
+    unreachable = [stops[j] for j in range(1, len(stops)) if distances[0][j] is None]
+    keep = [0] + [j for j in range(1, len(stops)) if distances[0][j] is not None]
+    stops = [stops[j] for j in keep]
+    distances = [[distances[i][j] for j in keep] for i in keep]
+    paths = {(keep.index(i), keep.index(j)): path for (i, j), path in paths.items() if i in keep and j in keep}
+
+    order = tour.solve_order(distances)
+
+    legs = []
+    for i, j in zip(order, order[1:]):
+        path = paths[i, j] if (i, j) in paths else route_table.find_path(stops[i], stops[j], grid=grid)
+        if path is None:
+            return "{} is unreachable from {}".format(stops[j], stops[i])
+        legs.append(grid.format_path_with_labels(path))
+
+    result = "{}\n{}".format("->".join(stops[i] for i in order), "".join(legs))
+    if unreachable:
+        result += "\n{} can't be reached from {} and was left out".format(", ".join(unreachable), stops[0])
+    return result
@@ -0,0 +1,57 @@
+from plugins.grids import distance_fields, names, registry
+
+
+def __warmup__():
+    # Build the distance fields before the first question, in a worker process
+    distance_fields.get_distance_fields(grid=registry.get_grid())
+
+
+def nearest_store(Cu: str, stores: list[str] = None) -> str:
+    """Find the closest of several stores from the current position and the route to it.
+
+    Args:
+        Cu: The current position, is also the starting position.
+        stores: The stores to choose from, every store if not given. A name that is part of several store names, such as a dish, stands for all of them.
+
+    Returns:
+        the closest store and its distance in steps on the first line and the route to it on the second
+    """
+    grid = registry.get_grid()
+    fields = distance_fields.get_distance_fields(grid=grid)
+    index = names.get_name_index(grid)
+
+    # Slightly wrong names are resolved locally
+    try:
+        Cu = index.resolve(Cu)
+    except names.UnknownName as e:
+        return str(e)
+
+    if stores is None:
+        candidates = [store for store in fields.stores if store != Cu]
+    else:
+        candidates = []
+        for name in stores:
+            try:
+                matches = [index.resolve(name)]
+            except names.UnknownName:
+                matches = []
+            # ROAD labels resolve too, but only stores can be chosen
+            matches = [store for store in matches if store in fields.store_index]
+            if not matches:
+                matches = [store for store in index.containing(name) if store in fields.store_index]
+            if not matches:
+                suggestions = [store for store in index.match(name, limit=20) if store in fields.store_index]
+                return str(names.UnknownName(name, suggestions[:5]))
+            candidates += [store for store in matches if store not in candidates]
+
+    start = grid.get_node_by_label(Cu)
+    if grid.node_attributes[start][0] != 'ROAD':
+        start = grid.get_road_node_by_label(Cu)
+        if start is None:
+            return "No ROAD node next to {}".format(Cu)
+
+    nearest = fields.nearest(start, candidates)
+    if nearest is None:
+        return "None of the stores can be reached from {}".format(Cu)
+    store, distance = nearest
+    return "{}: {} steps\n{}".format(store, distance, grid.format_path_with_labels(fields.path(store, start)))
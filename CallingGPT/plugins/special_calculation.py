@@ -1,3 +1,7 @@
+from src.CallingGPT.entities import memo
+
+
+@memo.memoize
 def special_calculation(a: int, b: int) -> int:
     """Calculate two numbers by this formula: 2*a+b-1.
 
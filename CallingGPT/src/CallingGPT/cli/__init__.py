@@ -5,9 +5,9 @@ import json
 from ..session.session import Session
 
 
-def cli_loop(modules: list):
+def cli_loop(modules: list, manifest_file: str = None, log_file: str = None, tools: bool = False):
 
-    session = Session(modules)
+    session = Session(modules, manifest_file=manifest_file, log_file=log_file, tools=tools)
 
     cmd = input(">>> ")
 
@@ -17,11 +17,14 @@ def cli_loop(modules: list):
             print("exit: exit the program")
             print("lsf: list all functions")
             print("msg: list all messages")
+            print("stats: show the size and latency of the last turn's requests and the cache hits")
             print("load: load a module dynamically")
         elif cmd == "lsf":
             print(json.dumps(session.namespace.functions_list, indent=4))
         elif cmd == "msg":
             print(json.dumps(session.messages, indent=4))
+        elif cmd == "stats":
+            print(json.dumps({**session.stats, "cache": session.namespace.cache.stats()}, indent=4))
         elif cmd == "load":
             module_name = input("module name: ")
             modules = []
@@ -39,10 +42,32 @@ def cli_loop(modules: list):
                 logging.error(e)
             session.namespace.add_modules(modules)
         else:
-            resp = session.ask(cmd)
+            resp = session.ask(cmd, stream=True)
 
+            # tokens are printed as they arrive, the complete reply then only ends the line
+            streaming = False
             for repl in resp:
-                if 'function_call' in repl:
+                if 'delta' in repl:
+                    if not streaming:
+                        print("<<< ", end='')
+                        streaming = True
+                    print(repl['delta'], end='', flush=True)
+                    continue
+                if streaming:
+                    print()
+                    streaming = False
+                    if 'function_call' not in repl and not repl.get('tool_calls'):
+                        continue
+
+                if repl.get('tool_calls'):
+                    for tool_call in repl['tool_calls']:
+                        print(
+                            "call<{}>: {}".format(
+                                tool_call['function']['name'],
+                                tool_call['function']['arguments']
+                            )
+                        )
+                elif 'function_call' in repl:
                     print(
                         "call<{}>: {}".format(
                             repl['function_call']['name'],
@@ -70,4 +95,6 @@ def cli_loop(modules: list):
             #         )
             #     )
 
-        cmd = input(">>> ")
\ No newline at end of file
+        cmd = input(">>> ")
+
+    session.store.close()
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+def memoize(function: callable = None, ttl: float = None, version: str = None, files: list = None):
+    """
+    Mark a plugin function whose result only depends on its arguments, so that
+    Namespace.call_function answers repeated calls from its MemoCache.
+    ttl is how many seconds a result is kept, the cache's ttl if not given.
+    version is a tag to change when the function's behaviour changes, and files
+    are paths whose (mtime, size) are part of the key, such as the map the
+    function reads, so that no result outlives a change of them.
+    Usable as @memoize or @memoize(ttl=..., version=..., files=[...]).
+    """
+    def mark(function: callable) -> callable:
+        function.__memoize__ = memo_options(ttl, version, files)
+        return function
+
+    if function is not None:
+        return mark(function)
+    return mark
+
+
+def memo_options(ttl: float = None, version: str = None, files: list = None) -> dict:
+    """
+    Return the memoize options of a function, as kept in __memoize__ and the plugin manifest.
+    """
+    return {
+        "ttl": ttl,
+        "version": version,
+        "files": [os.path.abspath(file) for file in files or []],
+    }
+
+
+def _file_tag(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class MemoCache:
+    """
+    Results of memoized functions, by function name, arguments and version.
+    The least recently used result is evicted beyond maxsize, and a result
+    expires ttl seconds after it was stored.
+    """
+
+    maxsize: int = 1024
+
+    ttl: float = 600
+
+    hits: int = 0
+
+    misses: int = 0
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        """(expiry, result) by key, least recently used first."""
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(function_name: str, args: dict, options: dict):
+        """
+        Return the key of a call, None if its arguments can't be canonicalized.
+        """
+        try:
+            canonical = json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        except (TypeError, ValueError):
+            return None
+        return (
+            function_name,
+            canonical,
+            options.get("version"),
+            tuple(_file_tag(file) for file in options.get("files") or []),
+        )
+
+    def get(self, key) -> tuple:
+        """
+        Return (True, result) for a stored result, (False, None) otherwise.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, result, ttl: float = None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Return {"hits": ..., "misses": ..., "entries": ...}.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+default_cache = MemoCache()
+"""The MemoCache namespaces share unless given their own, so results carry across conversations."""
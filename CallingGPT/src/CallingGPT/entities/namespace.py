@@ -1,6 +1,16 @@
 import sys
+import os
 import re
+import json
+import marshal
+import hashlib
 import inspect
+import threading
+import importlib
+import importlib.util
+
+from .pool import WorkerPool, PluginError
+from .memo import MemoCache, default_cache, memo_options
 
 
 def get_func_schema(function: callable) -> dict:
@@ -111,10 +121,244 @@ def get_func_schema(function: callable) -> dict:
     }
 
 
+def get_module_functions(module) -> dict:
+    """
+    Return the functions of a module a namespace registers, by name.
+    These are the ones listed in __functions__, or else every public callable.
+    """
+    # assert module is a module
+    assert isinstance(module, type(sys))
+    # ignore non-function attributes
+    if not hasattr(module, '__functions__'):
+        functions = {k: v for k, v in module.__dict__.items() if callable(v)}
+        # ignore private functions
+        functions = {k: v for k, v in functions.items() if not k.startswith('_')}
+    else:
+        functions = {v.__name__: v for v in module.__functions__ }
+    return functions
+
+
+class SchemaRegistry:
+    """
+    Function schemas compiled once per function.
+    A schema is keyed by the function's code object and a hash of its docstring,
+    so it is only compiled again when the function's source changes.
+    With a cache_file, compiled schemas are also kept on disk, and a cold
+    start with unchanged functions skips docstring parsing entirely.
+    """
+
+    version: int = 1
+
+    schemas: dict = {}
+    """Compiled schemas by schema key, without the function:
+    {
+        (code, "docstring sha1", "defaults", "annotations"): {
+            "description": "function description",
+            "parameters": {...}
+        },
+    }
+    """
+
+    def __init__(self, cache_file: str = None):
+        self.schemas = {}
+        self.cache_file = cache_file
+        self.stored = {}
+        """Schemas read from cache_file, by the digest of their schema key."""
+        self.dirty = False
+
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                self.stored = data["schemas"]
+
+    @staticmethod
+    def _key(function: callable):
+        doc_hash = hashlib.sha1((function.__doc__ or "").encode('utf-8')).hexdigest()
+        return (
+            function.__code__,
+            doc_hash,
+            repr(function.__defaults__),
+            repr(function.__annotations__),
+        )
+
+    @staticmethod
+    def _digest(key) -> str:
+        code, doc_hash, defaults, annotations = key
+        digest = hashlib.sha256(marshal.dumps(code))
+        for part in (doc_hash, defaults, annotations):
+            digest.update(part.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, function: callable) -> dict:
+        """
+        Return the schema of a function, see get_func_schema.
+        Callables without a code object, e.g. builtins, are compiled on every call.
+        """
+        if not hasattr(function, '__code__'):
+            return get_func_schema(function)
+
+        key = self._key(function)
+        schema = self.schemas.get(key)
+
+        if schema is None and self.cache_file is not None:
+            digest = self._digest(key)
+            schema = self.stored.get(digest)
+            if schema is None:
+                schema = get_func_schema(function)
+                del schema["function"]
+                self.stored[digest] = schema
+                self.dirty = True
+            self.schemas[key] = schema
+        elif schema is None:
+            schema = get_func_schema(function)
+            del schema["function"]
+            self.schemas[key] = schema
+
+        return {"function": function, **schema}
+
+    def save(self):
+        """
+        Write newly compiled schemas to cache_file, replacing it atomically.
+        """
+        if self.cache_file is None or not self.dirty:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.version, "schemas": self.stored}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+        self.dirty = False
+
+
+default_registry = SchemaRegistry()
+"""The in-memory SchemaRegistry namespaces share unless given their own."""
+
+
+class LazyFunction:
+    """
+    Stands in for a function whose module is not imported yet.
+    The module is imported on the first call.
+    """
+
+    def __init__(self, module_name: str, name: str):
+        self.module_name = module_name
+        self.__name__ = name
+        self.function = None
+
+    def load(self) -> callable:
+        """
+        Import the module and return the function.
+        """
+        if self.function is None:
+            module = importlib.import_module(self.module_name)
+            self.function = get_module_functions(module)[self.__name__]
+        return self.function
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+class PluginManifest:
+    """
+    Schemas of plugin modules kept in a file, to register their functions without importing them.
+    An entry is checked against the (mtime, size) of its module's source file, and only
+    modules that are new or whose source changed are imported to compile their schemas.
+    """
+
+    version: int = 2
+
+    modules: dict = {}
+    """Manifest entries by module name:
+    {
+        "plugins.goodbye": {
+            "source": [st_mtime_ns, st_size],
+            "functions": {
+                "goodbye": {
+                    "description": "function description",
+                    "parameters": {...}
+                },
+            },
+            "memoize": {
+                "goodbye": {"ttl": null, "version": null, "files": []},
+            }
+        },
+    }
+    """
+
+    def __init__(self, manifest_file: str = None, registry: SchemaRegistry = None):
+        self.manifest_file = manifest_file
+        self.registry = registry if registry is not None else default_registry
+        self.modules = {}
+        self.dirty = False
+
+        if manifest_file is not None and os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                self.modules = data["modules"]
+
+    @staticmethod
+    def _source_key(module_name: str) -> list:
+        spec = importlib.util.find_spec(module_name)
+        if spec is None:
+            raise ModuleNotFoundError("No module named {}".format(module_name))
+        if spec.origin is None or not os.path.exists(spec.origin):
+            return None
+        stat = os.stat(spec.origin)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def get(self, module_name: str) -> dict:
+        """
+        Return the schemas of the functions of a module by name, without the functions.
+        The module is only imported when its entry is missing or out of date.
+        """
+        source = self._source_key(module_name)
+        entry = self.modules.get(module_name)
+        if entry is not None and source is not None and entry["source"] == source:
+            return entry["functions"]
+
+        module = importlib.import_module(module_name)
+        functions = {}
+        memoize = {}
+        for name, function in get_module_functions(module).items():
+            schema = self.registry.get(function)
+            functions[name] = {k: v for k, v in schema.items() if k != "function"}
+            if hasattr(function, '__memoize__'):
+                memoize[name] = function.__memoize__
+
+        self.modules[module_name] = {"source": source, "functions": functions, "memoize": memoize}
+        self.dirty = True
+        return functions
+
+    def get_memoize(self, module_name: str) -> dict:
+        """
+        Return the memoize options of the memoized functions of a module by name, see memo.memoize.
+        Only valid after get.
+        """
+        return self.modules[module_name]["memoize"]
+
+    def save(self):
+        """
+        Write the manifest if it changed, replacing the file atomically.
+        """
+        if self.manifest_file is None or not self.dirty:
+            return
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.version, "modules": self.modules}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+        self.dirty = False
+
+
 class Namespace:
     """
     Namespace is a virtual container for functions, generated automatically by CallingGPT
     with user provided modules.
+    A module can also be given by name, its functions are then registered from the
+    manifest and the module is only imported when one of them is called.
+    With a WorkerPool, functions of modules run in its worker processes, unless
+    set_execution says otherwise, each within the pool's timeout or its own, see set_timeout.
+    Results of memoized functions, see memo.memoize and set_memoize, are kept in a MemoCache.
     """
 
     modules: list = []
@@ -149,34 +393,86 @@ class Namespace:
         }
     }
 
+    Use add_function and add_modules to change it, they keep functions_list up to date.
     """
 
+    registry: SchemaRegistry = None
+
+    _functions_list: list = None
+
+    manifest: PluginManifest = None
+
+    pool: WorkerPool = None
+
+    execution: dict = {}
+    """Where functions run, "inline" or "pool" by function name, see set_execution."""
+
+    timeouts: dict = {}
+    """Seconds a function run in the worker pool may take by function name, see set_timeout."""
+
+    module_names: dict = {}
+    """The name of the module behind every module of functions, which workers import."""
+
+    cache: MemoCache = None
+
+    memoized: dict = {}
+    """The memoize options of memoized functions by function name."""
+
+    def _retrieve_module(self, module):
+        if isinstance(module, str):
+            self.module_names[module.replace(".","-")] = module
+            self.functions[module.replace(".","-")] = {
+                name: {"function": LazyFunction(module, name), **schema}
+                for name, schema in self.manifest.get(module).items()
+            }
+            for name, options in self.manifest.get_memoize(module).items():
+                self.memoized["{}-{}".format(module.replace(".","-"), name)] = options
+            return
+
+        functions = get_module_functions(module)
+
+        self.module_names[module.__name__.replace(".","-")] = module.__name__
+        self.functions[module.__name__.replace(".","-")] = {}
+
+        for name, function in functions.items():
+            funtion_dict = self.registry.get(function)
+
+            self.functions[module.__name__.replace(".","-")][name] = funtion_dict
+            if hasattr(function, '__memoize__'):
+                self.memoized["{}-{}".format(module.__name__.replace(".","-"), name)] = function.__memoize__
+
     def _retrieve_functions(self):
         self.functions = {}
         for module in self.modules:
-            # assert module is a module
-            assert isinstance(module, type(sys))
-            # ignore non-function attributes
-            if not hasattr(module, '__functions__'):
-                functions = {k: v for k, v in module.__dict__.items() if callable(v)}
-                # ignore private functions
-                functions = {k: v for k, v in functions.items() if not k.startswith('_')}
-            else:
-                functions = {v.__name__: v for v in module.__functions__ }
-
-            self.functions[module.__name__.replace(".","-")] = {}
-
-            for name, function in functions.items():
-                funtion_dict = get_func_schema(function)
+            self._retrieve_module(module)
+        self._save()
+        self._functions_list = None
 
-                self.functions[module.__name__.replace(".","-")][name] = funtion_dict
+    def _save(self):
+        self.registry.save()
+        self.manifest.save()
 
-    def __init__(self, modules: list):
+    def __init__(self, modules: list, registry: SchemaRegistry = None, manifest: PluginManifest = None, pool: WorkerPool = None, cache: MemoCache = None):
         self.modules = modules
+        self.registry = registry if registry is not None else default_registry
+        self.manifest = manifest if manifest is not None else PluginManifest(registry=self.registry)
+        self.pool = pool
+        self.cache = cache if cache is not None else default_cache
+        self.execution = {}
+        self.timeouts = {}
+        self.module_names = {}
+        self.memoized = {}
         self._retrieve_functions()
 
     @property
     def functions_list(self):
+        """
+        The schemas of all functions in the format of the functions parameter of the API.
+        Built once per change of the namespace, callers must not modify it.
+        """
+        if self._functions_list is not None:
+            return self._functions_list
+
         result: list = []
         for module_name, module in self.functions.items():
             for function_name, function in module.items():
@@ -185,13 +481,26 @@ class Namespace:
                 del func["function"]
                 result.append(func)
 
+        self._functions_list = result
         return result
     
-    def call_function(self, function_name: str, args: dict):
+    def call_function(self, function_name: str, args: dict, cancel: threading.Event = None):
         """
         Call a function by name.
+        A function run in the worker pool is abandoned when it runs out of time or
+        cancel is set, and returns an error message for the model instead of raising,
+        as it does when it fails.
+        A memoized function is only called when the cache has no result for its arguments.
         """
         result = {}
+        timeout = self.timeouts.get(function_name)
+
+        options = self.memoized.get(function_name)
+        key = self.cache.key(function_name, args, options) if options is not None else None
+        if key is not None:
+            found, result = self.cache.get(key)
+            if found:
+                return result
 
         # split the function name
         fn_spt = function_name.split('-')
@@ -201,11 +510,55 @@ class Namespace:
         # get the function
         function = self.functions[module_name][function_name]['function']
 
-        # call the function
-        result = function(**args)
+        if self._runs_in_pool(module_name, function_name):
+            try:
+                result = self.pool.call(self.module_names[module_name], function_name, args, timeout, cancel)
+            except PluginError as e:
+                # errors are not cached, the next call tries again
+                return "Error: {}".format(e)
+        else:
+            # call the function
+            result = function(**args)
+
+        if key is not None:
+            self.cache.put(key, result, options["ttl"])
 
         return result
-    
+
+    def _runs_in_pool(self, module_name: str, function_name: str) -> bool:
+        # functions added one by one have no module a worker could import
+        if self.pool is None or module_name not in self.module_names:
+            return False
+        return self.execution.get("{}-{}".format(module_name, function_name), "pool") == "pool"
+
+    def set_execution(self, function_name: str, execution: str):
+        """
+        Choose where a function runs, "inline" in the calling thread or "pool" in a worker process.
+        """
+        if execution not in ("inline", "pool"):
+            raise ValueError("Unknown execution {}".format(execution))
+        self.execution[function_name] = execution
+
+    def set_timeout(self, function_name: str, timeout: float = None):
+        """
+        Set the seconds a function run in the worker pool may take, the pool's timeout if None.
+        """
+        if timeout is None:
+            self.timeouts.pop(function_name, None)
+            return
+        if timeout <= 0:
+            raise ValueError("Invalid timeout {}".format(timeout))
+        self.timeouts[function_name] = timeout
+
+    def set_memoize(self, function_name: str, enabled: bool = True, ttl: float = None, version: str = None, files: list = None):
+        """
+        Memoize a function as if it was marked with memo.memoize, or stop memoizing it.
+        """
+        if not enabled:
+            self.memoized.pop(function_name, None)
+            return
+        self.memoized[function_name] = memo_options(ttl, version, files)
+
     def add_function(self, module_name: str, function: callable):
         """
         Add a function to namespace.
@@ -213,12 +566,19 @@ class Namespace:
         # assert isinstance(function, callable)
         if module_name not in self.functions:
             self.functions[module_name] = {}
-        self.functions[module_name][function.__name__] = get_func_schema(function)
+        self.functions[module_name][function.__name__] = self.registry.get(function)
+        if hasattr(function, '__memoize__'):
+            self.memoized["{}-{}".format(module_name, function.__name__)] = function.__memoize__
+        self._save()
+        self._functions_list = None
 
     def add_modules(self, modules: list):
         """
-        Add a module to namespace.
+        Add a module to namespace, or a module name to register it lazily.
         """
         self.modules.extend(modules)
-        self._retrieve_functions()
-    
\ No newline at end of file
+        # only the new modules are retrieved
+        for module in modules:
+            self._retrieve_module(module)
+        self._save()
+        self._functions_list = None
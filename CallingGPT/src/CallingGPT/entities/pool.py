@@ -0,0 +1,197 @@
+import os
+import time
+import queue
+import logging
+import importlib
+import threading
+import multiprocessing
+
+
+class PluginError(Exception):
+    """
+    Raised by WorkerPool.call when a call fails, times out or is cancelled.
+    The message is meant to be returned to the model as the function result.
+    """
+
+
+def _worker_main(conn, modules: list):
+    from .namespace import get_module_functions
+
+    # import the plugins, and let them load their data, before the first call arrives
+    errors = []
+    for module_name in modules:
+        try:
+            module = importlib.import_module(module_name)
+            if hasattr(module, '__warmup__'):
+                module.__warmup__()
+        except Exception as e:
+            errors.append("{}: {}: {}".format(module_name, type(e).__name__, e))
+    # the worker still serves the other modules, the parent reports the failures
+    conn.send(errors)
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if msg is None:
+            break
+
+        module_name, function_name, args = msg
+        try:
+            module = importlib.import_module(module_name)
+            result = get_module_functions(module)[function_name](**args)
+            conn.send((True, result))
+        except Exception as e:
+            try:
+                conn.send((False, "{}: {}".format(type(e).__name__, e)))
+            except Exception:
+                break
+
+
+class _Worker:
+
+    def __init__(self, context, modules: list):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, modules), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class WorkerPool:
+    """
+    A pool of warm worker processes running plugin functions.
+    Workers import the given plugin modules when they start and keep them, and
+    whatever the plugins cache such as loaded maps, for their whole life. A
+    module can prepare in advance by defining __warmup__(), which a new worker
+    calls once. Modules that fail to import or warm up are logged.
+    Calls only go to workers that are done warming up.
+    A call that times out or is cancelled kills its worker, which is replaced
+    by a fresh one.
+    """
+
+    timeout: float = 30
+
+    def __init__(self, modules: list, workers: int = None, timeout: float = 30):
+        """
+        modules are the names of the plugin modules to import in every worker,
+        workers is the number of processes, os.cpu_count() if not given, and
+        timeout the seconds a call may take unless the call says otherwise.
+        """
+        self.modules = list(modules)
+        self.timeout = timeout
+        # workers are spawned rather than forked, the parent usually runs threads
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = queue.Queue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        for _ in range(workers or os.cpu_count() or 1):
+            self._start_worker()
+
+    def _start_worker(self):
+        worker = _Worker(self.context, self.modules)
+        with self.lock:
+            self.workers.add(worker)
+        # only a worker done with warming up takes calls
+        threading.Thread(target=self._wait_ready, args=(worker,), daemon=True).start()
+
+    def _wait_ready(self, worker: _Worker):
+        try:
+            errors = worker.conn.recv()
+        except (EOFError, OSError):
+            logging.error("A plugin worker exited while starting.")
+            with self.lock:
+                self.workers.discard(worker)
+            return
+        for error in errors:
+            logging.error("A plugin worker failed to load {}".format(error))
+        self.idle.put(worker)
+
+    def _replace(self, worker: _Worker):
+        with self.lock:
+            self.workers.discard(worker)
+        worker.kill()
+        if not self.closed:
+            self._start_worker()
+
+    def call(self, module_name: str, function_name: str, args: dict, timeout: float = None, cancel: threading.Event = None):
+        """
+        Run a function of a module in a worker and return its result.
+        Blocks until the result arrives, the timeout runs out or cancel is set.
+        The timeout includes waiting for a free worker.
+
+        Raises:
+            PluginError: If the function raised, timed out or was cancelled.
+        """
+        if self.closed:
+            raise PluginError("The worker pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                worker = self.idle.get(timeout=0.05)
+                break
+            except queue.Empty:
+                with self.lock:
+                    running = bool(self.workers)
+                if not running or self.closed:
+                    raise PluginError("No plugin worker is running")
+                if cancel is not None and cancel.is_set():
+                    raise PluginError("{} was cancelled".format(function_name))
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise PluginError("{} timed out after {}s waiting for a worker".format(function_name, timeout))
+        done = False
+        try:
+            worker.conn.send((module_name, function_name, args))
+            while not worker.conn.poll(0.05):
+                if not worker.process.is_alive():
+                    raise PluginError("{} crashed".format(function_name))
+                if cancel is not None and cancel.is_set():
+                    raise PluginError("{} was cancelled".format(function_name))
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise PluginError("{} timed out after {}s".format(function_name, timeout))
+            ok, result = worker.conn.recv()
+            done = True
+        finally:
+            # a worker still busy with an abandoned call can't be reused
+            if done:
+                self.idle.put(worker)
+            else:
+                self._replace(worker)
+
+        if not ok:
+            raise PluginError(result)
+        return result
+
+    def close(self):
+        """
+        Stop all workers.
+        """
+        self.closed = True
+        with self.lock:
+            workers, self.workers = self.workers, set()
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,103 @@
+import json
+
+
+MESSAGE_TOKENS = 4
+"""Tokens every message costs besides its text, for its role and separators."""
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without a tokenizer.
+    English runs about four characters to a token, Chinese about one character.
+    """
+    if not text:
+        return 0
+    # CJK and later scripts
+    wide = sum(1 for c in text if c > '\u2e7f')
+    return wide + (len(text) - wide + 3) // 4
+
+
+class History:
+    """
+    Keeps the messages sent with every request within a token budget.
+    System messages are pinned, and so is the current turn, from the last user
+    message on. When the rest doesn't fit, the results of earlier function
+    calls are cut down first, oldest first, then the oldest turns are dropped whole.
+    """
+
+    budget: int = 8000
+
+    result_chars: int = 200
+    """Characters of an earlier function result kept when it's cut down."""
+
+    def __init__(self, budget: int = 8000, result_chars: int = 200, count=count_tokens):
+        """
+        count estimates the tokens of a text, see count_tokens.
+        """
+        self.budget = budget
+        self.result_chars = result_chars
+        self.count = count
+
+    def message_tokens(self, message: dict) -> int:
+        tokens = MESSAGE_TOKENS + self.count(message.get('content')) + self.count(message.get('name'))
+        if message.get('function_call'):
+            tokens += self.count(message['function_call'].get('name')) + self.count(message['function_call'].get('arguments'))
+        for tool_call in message.get('tool_calls') or []:
+            tokens += self.count(tool_call['function']['name']) + self.count(tool_call['function']['arguments'])
+        return tokens
+
+    def tokens(self, messages: list) -> int:
+        return sum(self.message_tokens(message) for message in messages)
+
+    def _cut(self, message: dict) -> dict:
+        content = message['content']
+        message = dict(message)
+        message['content'] = "{}... ({} more characters dropped)".format(
+            content[:self.result_chars], len(content) - self.result_chars)
+        return message
+
+    def compact(self, messages: list) -> list:
+        """
+        Return the messages to send, within the budget if the pinned ones allow.
+        The given list and its messages are left as they are, and returned if they fit.
+        """
+        sizes = [self.message_tokens(message) for message in messages]
+        total = sum(sizes)
+        if total <= self.budget:
+            return messages
+        messages = list(messages)
+
+        current = max((i for i, message in enumerate(messages) if message['role'] == 'user'), default=len(messages))
+
+        # cut down the results of earlier function calls
+        for i in range(current):
+            if total <= self.budget:
+                return messages
+            message = messages[i]
+            if message['role'] in ('function', 'tool') and len(message['content'] or '') > self.result_chars:
+                messages[i] = self._cut(message)
+                total += self.message_tokens(messages[i]) - sizes[i]
+                sizes[i] = self.message_tokens(messages[i])
+        if total <= self.budget:
+            return messages
+
+        # then drop the earliest turns whole, a function result must not lose its call
+        dropped = set()
+        for i in range(current):
+            if total <= self.budget and messages[i]['role'] == 'user':
+                break
+            if messages[i]['role'] != 'system':
+                dropped.add(i)
+                total -= sizes[i]
+
+        return [message for i, message in enumerate(messages) if i not in dropped]
+
+    def measure(self, messages: list) -> dict:
+        """
+        Return the size of a request's messages, {"messages": ..., "tokens": ..., "bytes": ...}.
+        """
+        return {
+            "messages": len(messages),
+            "tokens": self.tokens(messages),
+            "bytes": len(json.dumps(messages, ensure_ascii=False).encode('utf-8')),
+        }
@@ -1,77 +1,330 @@
-from ..entities.namespace import Namespace
+from ..entities.namespace import Namespace, SchemaRegistry, PluginManifest
+from ..entities.pool import WorkerPool
+from .history import History
+from .store import MessageStore
 import openai
+import asyncio
+import time
+import functools
+import threading
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+TOOL_WORKERS = 8
+"""Threads of the executor sessions share to run the calls of one reply at the same time."""
+
+_executor = None
+
+_executor_lock = threading.Lock()
+
+
+def _default_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="CallingGPT")
+        return _executor
+
+
+def _merge_delta(message: dict, delta: dict):
+    """
+    Add a streamed delta to the message being assembled.
+    Content and function call names and arguments arrive in pieces and are concatenated,
+    the pieces of tool calls by the index of their call.
+    """
+    for key, value in delta.items():
+        if key == 'tool_calls':
+            tool_calls = message.setdefault('tool_calls', [])
+            for piece in value:
+                while len(tool_calls) <= piece['index']:
+                    tool_calls.append({"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                tool_call = tool_calls[piece['index']]
+                if piece.get('id'):
+                    tool_call['id'] = piece['id']
+                for call_key, part in (piece.get('function') or {}).items():
+                    if part:
+                        tool_call['function'][call_key] += part
+        elif key == 'function_call':
+            function_call = message.setdefault('function_call', {})
+            for call_key, piece in value.items():
+                function_call[call_key] = function_call.get(call_key, '') + piece
+        elif key == 'content':
+            if value is not None:
+                message['content'] = (message['content'] or '') + value
+        elif value is not None:
+            message[key] = value
 
 
 class Session:
 
     namespace: Namespace = None
 
-    messages: list[dict] = []
+    store: MessageStore = None
 
     model: str = "ft:gpt-4o-2024-08-06:sun-yat-sen-university::AK0BjAyV"
 
-    def __init__(self, modules: list, model: str = "ft:gpt-4o-2024-08-06:sun-yat-sen-university::AK0BjAyV"):
-        self.namespace = Namespace(modules)
-        self.model = model
+    tools: bool = False
 
-    def ask(self, msg: str) -> dict:
-        # copy messages
+    executor = None
 
-        messages = self.messages.copy()
+    history: History = None
 
-        messages.append(
-            {
-                "role": "user",
-                "content": msg
-            }
-        )
-        while True:
+    stats: dict = {}
+    """The requests of the last turn, the size of the last request and the seconds spent waiting for replies."""
+
+    cancelled: threading.Event = None
+    """Set by cancel until the next turn, abandons the plugin functions running in the worker pool."""
+
+    def __init__(self, modules: list, model: str = "ft:gpt-4o-2024-08-06:sun-yat-sen-university::AK0BjAyV", schema_cache: str = None, manifest_file: str = None, tools: bool = False, executor=None, pool: WorkerPool = None, history: History = None, log_file: str = None):
+        """
+        With tools, functions are offered in the tools format, in which one reply
+        can call several functions. These calls run at the same time in executor,
+        a concurrent.futures executor, or a thread pool shared by all sessions if not given.
+        With pool, plugin functions run in its worker processes, see Namespace.
+        history keeps the messages sent with every request within a token budget,
+        History() if not given. The messages stored are kept whole.
+        With log_file, the messages are logged to it, and a conversation already
+        logged there is resumed, see MessageStore.
+        """
+        registry = SchemaRegistry(schema_cache) if schema_cache is not None else None
+        manifest = PluginManifest(manifest_file, registry) if manifest_file is not None else None
+        self.namespace = Namespace(modules, registry, manifest, pool)
+        self.model = model
+        self.tools = tools
+        self.executor = executor
+        self.history = history if history is not None else History()
+        self.store = MessageStore(log_file)
+        self.stats = {}
+        self.cancelled = threading.Event()
+
+    @property
+    def messages(self) -> list:
+        return self.store.messages
 
-            args = {
-                "model": self.model,
-                "messages": messages,
-            }
+    def cancel(self):
+        """
+        Abandon the plugin functions of the current turn that run in the worker pool.
+        They return an error message for the model, as when they time out, see Namespace.set_timeout.
+        """
+        self.cancelled.set()
 
-            if len(self.namespace.functions_list) > 0:
-                args['functions'] = self.namespace.functions_list
-                args['function_call'] = "auto"
+    def ask(self, msg: str, stream: bool = False) -> dict:
+        """
+        Send a message and yield every reply until the assistant answers without calling a function.
+        With stream, the content of a reply is also yielded piece by piece as {"delta": "..."}
+        while it arrives, before the complete reply.
+        """
+        # the question is only stored once it's answered, so a failed request leaves no trace
+        user_msg = {
+            "role": "user",
+            "content": msg
+        }
+        self.stats = {"requests": 0, "seconds": 0.0}
+        self.cancelled.clear()
+        while True:
 
-            resp = openai.ChatCompletion.create(
-                **args
-            )
+            args = self._request_args(self.store.messages if user_msg is None else self.store.messages + [user_msg])
+            start = time.perf_counter()
+            if stream:
+                reply_msg = {"role": "assistant", "content": None}
+                for chunk in openai.ChatCompletion.create(stream=True, **args):
+                    if not chunk["choices"]:
+                        continue
+                    delta = chunk["choices"][0]["delta"]
+                    _merge_delta(reply_msg, delta)
+                    if delta.get('content'):
+                        yield {"delta": delta['content']}
+            else:
+                resp = openai.ChatCompletion.create(
+                    **args
+                )
 
-            logging.debug("Response: {}".format(resp))
-            reply_msg = resp["choices"][0]['message']
+                logging.debug("Response: {}".format(resp))
+                reply_msg = resp["choices"][0]['message']
+            self._report(args['messages'], time.perf_counter() - start)
+            if user_msg is not None:
+                self.store.append(user_msg)
+                user_msg = None
 
             yield reply_msg
 
-            ret = {}
+            if reply_msg.get('tool_calls'):
+
+                calls = self._parse_tool_calls(reply_msg)
+                call_rets = self._call_functions(calls)
 
-            if 'function_call' in reply_msg:
+                self._add_tool_results(reply_msg, call_rets)
+            elif 'function_call' in reply_msg:
 
                 fc = reply_msg['function_call']
                 args = json.loads(fc['arguments'])
                 call_ret = self._call_function(fc['name'], args)
 
-                messages.append({
-                    "role": "function",
-                    "name": fc['name'],
-                    "content": str(call_ret)
-                })
+                self._add_function_result(fc['name'], call_ret)
+            else:
+                self._add_reply(reply_msg)
+
+                break
+
+    def _request_args(self, messages: list) -> dict:
+        args = {
+            "model": self.model,
+            "messages": self.history.compact(messages),
+        }
+
+        functions = self.namespace.functions_list
+        if len(functions) > 0 and self.tools:
+            args['tools'] = [{"type": "function", "function": function} for function in functions]
+            args['tool_choice'] = "auto"
+        elif len(functions) > 0:
+            args['functions'] = functions
+            args['function_call'] = "auto"
+
+        return args
+
+    def _report(self, messages: list, seconds: float):
+        self.stats.update(self.history.measure(messages))
+        self.stats['requests'] += 1
+        self.stats['seconds'] += seconds
+        logging.debug("Request of {messages} messages, {tokens} tokens and {bytes} bytes".format(**self.stats)
+                      + " answered in {:.3f}s".format(seconds))
 
-                self.messages = messages.copy()
+    def _parse_tool_calls(self, reply_msg: dict) -> list:
+        return [
+            (tool_call['function']['name'], json.loads(tool_call['function']['arguments']))
+            for tool_call in reply_msg['tool_calls']
+        ]
+
+    def _add_tool_results(self, reply_msg: dict, call_rets: list):
+        self.store.append({
+            "role": "assistant",
+            "content": reply_msg.get('content'),
+            "tool_calls": [
+                {
+                    "id": tool_call['id'],
+                    "type": "function",
+                    "function": {
+                        "name": tool_call['function']['name'],
+                        "arguments": tool_call['function']['arguments'],
+                    },
+                }
+                for tool_call in reply_msg['tool_calls']
+            ],
+        })
+
+        for tool_call, call_ret in zip(reply_msg['tool_calls'], call_rets):
+            self.store.append({
+                "role": "tool",
+                "tool_call_id": tool_call['id'],
+                "content": str(call_ret)
+            })
+
+    def _add_function_result(self, function_name: str, call_ret):
+        self.store.append({
+            "role": "function",
+            "name": function_name,
+            "content": str(call_ret)
+        })
+
+    def _add_reply(self, reply_msg: dict):
+        self.store.append({
+            "role": "assistant",
+            "content": reply_msg['content']
+        })
+
+    def _call_function(self, function_name: str, args: dict):
+        return self.namespace.call_function(function_name, args, self.cancelled)
+
+    def _call_functions(self, calls: list) -> list:
+        """
+        Run the (function_name, args) calls of one reply at the same time, returning their results in order.
+        """
+        if len(calls) == 1:
+            return [self._call_function(*calls[0])]
+        executor = self.executor if self.executor is not None else _default_executor()
+        futures = [executor.submit(self._call_function, function_name, args) for function_name, args in calls]
+        return [future.result() for future in futures]
+
+
+class AsyncSession(Session):
+    """
+    A Session whose ask is an async generator, so that many conversations can share one event loop.
+    Requests use the async client, and plugin functions run in a thread so that a slow
+    function doesn't block the other conversations.
+    """
+
+    def __init__(self, modules: list, model: str = "ft:gpt-4o-2024-08-06:sun-yat-sen-university::AK0BjAyV", schema_cache: str = None, manifest_file: str = None, tools: bool = False, executor=None, pool: WorkerPool = None, history: History = None, log_file: str = None):
+        """
+        executor is the concurrent.futures executor plugin functions run in,
+        asyncio.to_thread is used if not given.
+        """
+        super().__init__(modules, model, schema_cache, manifest_file, tools, executor, pool, history, log_file)
+
+    async def ask(self, msg: str, stream: bool = False):
+        """
+        Send a message and yield every reply, see Session.ask.
+        """
+        # the question is only stored once it's answered, so a failed request leaves no trace
+        user_msg = {
+            "role": "user",
+            "content": msg
+        }
+        self.stats = {"requests": 0, "seconds": 0.0}
+        self.cancelled.clear()
+        while True:
+
+            args = self._request_args(self.store.messages if user_msg is None else self.store.messages + [user_msg])
+            start = time.perf_counter()
+            if stream:
+                reply_msg = {"role": "assistant", "content": None}
+                async for chunk in await openai.ChatCompletion.acreate(stream=True, **args):
+                    if not chunk["choices"]:
+                        continue
+                    delta = chunk["choices"][0]["delta"]
+                    _merge_delta(reply_msg, delta)
+                    if delta.get('content'):
+                        yield {"delta": delta['content']}
             else:
-                messages.append({
-                    "role": "assistant",
-                    "content": reply_msg['content']
-                })
+                resp = await openai.ChatCompletion.acreate(
+                    **args
+                )
+
+                logging.debug("Response: {}".format(resp))
+                reply_msg = resp["choices"][0]['message']
+            self._report(args['messages'], time.perf_counter() - start)
+            if user_msg is not None:
+                self.store.append(user_msg)
+                user_msg = None
+
+            yield reply_msg
+
+            if reply_msg.get('tool_calls'):
+
+                calls = self._parse_tool_calls(reply_msg)
+                call_rets = await asyncio.gather(*[self._call_function_async(*call) for call in calls])
 
-                self.messages = messages.copy()
+                self._add_tool_results(reply_msg, call_rets)
+            elif 'function_call' in reply_msg:
+
+                fc = reply_msg['function_call']
+                args = json.loads(fc['arguments'])
+                call_ret = await self._call_function_async(fc['name'], args)
+
+                self._add_function_result(fc['name'], call_ret)
+            else:
+                self._add_reply(reply_msg)
 
                 break
 
-    def _call_function(self, function_name: str, args: dict):
-        return self.namespace.call_function(function_name, args)
-    
\ No newline at end of file
+    async def _call_function_async(self, function_name: str, args: dict):
+        try:
+            if self.executor is None:
+                return await asyncio.to_thread(self._call_function, function_name, args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(self._call_function, function_name, args))
+        except asyncio.CancelledError:
+            # the thread can't be cancelled, the function it waits for in the worker pool can
+            self.cancel()
+            raise
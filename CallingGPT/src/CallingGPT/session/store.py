@@ -0,0 +1,83 @@
+import os
+import json
+
+
+class MessageStore:
+    """
+    The messages of one conversation.
+    Messages are only ever appended, to a list in memory and, with a log file, as
+    one JSON line each to the log, so the log always holds the whole conversation.
+    A store opened on an existing log resumes the conversation.
+    Only the messages sent with a request are compacted, see History.
+    """
+
+    log_file: str = None
+
+    messages: list = []
+
+    def __init__(self, log_file: str = None):
+        self.log_file = log_file
+        self.messages = []
+        self._log = None
+        if log_file is not None:
+            if os.path.exists(log_file):
+                self.messages, end = self._read(log_file)
+                # drop a line cut short by a crash, so the next message starts a line of its own
+                with open(log_file, 'r+b') as file:
+                    file.truncate(end)
+            self._log = open(log_file, 'a', encoding='utf-8')
+
+    @staticmethod
+    def load(file_name: str) -> list:
+        """
+        Read the messages of a log, a last line cut short by a crash is skipped.
+        """
+        return MessageStore._read(file_name)[0]
+
+    @staticmethod
+    def _read(file_name: str) -> tuple:
+        """
+        Return the messages of a log and the offset of the end of the last whole one.
+        """
+        messages = []
+        end = 0
+        with open(file_name, 'rb') as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    messages.append(json.loads(line.decode('utf-8')))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    break
+                end += len(line)
+        return messages, end
+
+    def append(self, message: dict):
+        self.messages.append(message)
+        if self._log is not None:
+            self._log.write(json.dumps(message, ensure_ascii=False) + "\n")
+            self._log.flush()
+
+    def snapshot(self, file_name: str):
+        """
+        Write all messages to a log file, replacing it atomically, to be resumed with MessageStore(file_name).
+        """
+        tmp_name = file_name + '.tmp'
+        with open(tmp_name, 'w', encoding='utf-8') as file:
+            for message in self.messages:
+                file.write(json.dumps(message, ensure_ascii=False) + "\n")
+        os.replace(tmp_name, file_name)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
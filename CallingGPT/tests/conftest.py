@@ -0,0 +1,14 @@
+import types
+
+import pytest
+
+
+@pytest.fixture
+def plugin_module():
+    """A factory of plugin modules: plugin_module(*functions) is a module named plugin holding the functions."""
+    def make(*functions):
+        module = types.ModuleType('plugin')
+        for function in functions:
+            setattr(module, function.__name__, function)
+        return module
+    return make
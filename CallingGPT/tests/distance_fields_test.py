@@ -0,0 +1,67 @@
+import shutil
+
+from plugins.grids import distance_fields, registry, route_table
+from plugins.nearest_store import nearest_store
+
+
+def test_fields_match_route_table():
+    grid = registry.get_grid()
+    fields = distance_fields.get_distance_fields()
+    table = route_table.get_route_table()
+
+    assert fields.stores == table.stores
+    for start in table.stores:
+        entrance = table.entrances[table.store_index[start]]
+        if entrance < 0:
+            continue
+        node = divmod(int(entrance), grid.height)
+        for end in table.stores:
+            distance = fields.distance(end, node)
+            assert (-1 if distance is None else distance) == table.distances[table.store_index[start], table.store_index[end]]
+            path = fields.path(end, node)
+            if path is not None:
+                assert len(path) == distance + 1
+                assert all(grid.node_attributes[node][0] == 'ROAD' for node in path)
+                assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+
+
+def test_mapped_fields(tmp_path, monkeypatch):
+    config_file = str(tmp_path / 'HCH2.txt')
+    shutil.copyfile(registry.DEFAULT_GRID, config_file)
+    monkeypatch.setattr(distance_fields, 'MMAP_BYTES', 0)
+
+    fields = distance_fields.get_distance_fields(config_file)
+    expected = distance_fields.DistanceFields.build(registry.get_grid(config_file))
+    assert (fields.fields == expected.fields).all()
+    assert [path.name for path in tmp_path.glob('*.npy')] == [
+        'HCH2.txt.fields-v1-{}.npy'.format(route_table.file_hash(config_file)[:16])]
+
+    # A new version of the file replaces the old fields file
+    registry.update_cells([(3, 7, 'EMPTY', '')], config_file)
+    distance_fields.get_distance_fields(config_file)
+    assert [path.name for path in tmp_path.glob('*.npy')] == [
+        'HCH2.txt.fields-v1-{}.npy'.format(route_table.file_hash(config_file)[:16])]
+
+    # Fields built for an older snapshot leave those of the file as it is now alone
+    old_grid = registry.get_grid(config_file)
+    registry.update_cells([(3, 7, 'ROAD', '')], config_file)
+    distance_fields.get_distance_fields(config_file)
+    distance_fields._fields.clear()
+    distance_fields.get_distance_fields(config_file, old_grid)
+    assert sorted(path.name for path in tmp_path.glob('*.npy')) == sorted(
+        'HCH2.txt.fields-v1-{}.npy'.format(registry.grid_hash(grid)[:16])
+        for grid in (old_grid, registry.get_grid(config_file)))
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_nearest_store():
+    fields = distance_fields.get_distance_fields()
+    grid = registry.get_grid()
+    start = grid.get_road_node_by_label('麦当劳')
+
+    store, distance = fields.nearest(start, ['豚一拉面', '超力家拉面'])
+    assert distance == min(fields.distance('豚一拉面', start), fields.distance('超力家拉面', start))
+    assert nearest_store('麦当劳', ['拉面']).startswith('{}: {} steps\n'.format(store, distance))
+    assert nearest_store('麦当劳', ['xyz']) == 'Unknown position xyz'
+    # ROAD labels are not stores to choose from
+    assert nearest_store('麦当劳', ['C3']).startswith('Unknown position C3')
@@ -0,0 +1,98 @@
+import os
+import shutil
+
+import networkx as nx
+import pytest
+
+from plugins.grids import compiled, registry
+from plugins.grids.GridGraph import GridGraph
+
+
+def test_registry_reuses_and_reloads(tmp_path):
+    config_file = str(tmp_path / 'HCH2.txt')
+    shutil.copyfile(registry.DEFAULT_GRID, config_file)
+
+    grid = registry.get_grid(config_file)
+    assert registry.get_grid(config_file) is grid
+
+    with pytest.raises(RuntimeError):
+        grid.set_node_attribute(0, 0, 'ROAD', 'X1')
+
+    with open(config_file, 'a', encoding='utf-8') as file:
+        file.write('\n9 10 ROAD X1\n')
+    os.utime(config_file, ns=(0, 0))
+
+    reloaded = registry.get_grid(config_file)
+    assert reloaded is not grid
+    assert reloaded.get_node_by_label('X1') == (9, 10)
+
+
+def test_label_index_keeps_every_store_cell():
+    grid = registry.get_grid()
+
+    assert grid.get_nodes_by_label('麦当劳') == ((0, 8), (1, 8))
+    assert grid.get_node_by_label('麦当劳') == (0, 8)
+    assert grid.get_node_by_label('C1') == (0, 3)
+
+    with pytest.raises(ValueError):
+        grid.get_node_by_label('不存在的店')
+
+
+def test_road_search_matches_networkx():
+    grid = registry.get_grid()
+    road_nodes = [node for node in grid.graph.nodes if grid.node_attributes[node][0] == 'ROAD']
+    subgraph = grid.graph.subgraph(road_nodes).copy()
+
+    for start in road_nodes:
+        for end in road_nodes:
+            path = grid.get_shortest_path(grid.node_attributes[start][1], grid.node_attributes[end][1])
+            assert path == nx.shortest_path(subgraph, source=start, target=end)
+
+
+def test_compact_backend_matches_networkx_backend():
+    grid = registry.get_grid()
+    compact = registry.get_grid(backend='compact')
+
+    assert dict(compact.node_attributes) == dict(grid.node_attributes)
+    assert compact.get_nodes_by_label('麦当劳') == ((0, 8), (1, 8))
+
+    road_labels = [attrs[1] for attrs in grid.node_attributes.values() if attrs[0] == 'ROAD']
+    for start in road_labels:
+        for end in road_labels:
+            assert len(compact.get_shortest_path(start, end)) == len(grid.get_shortest_path(start, end))
+
+
+def test_store_lookup_matches_nearest_store():
+    grid = registry.get_grid()
+    compact = registry.get_grid(backend='compact')
+
+    for road_label in grid.get_labels_by_type('ROAD'):
+        nearest_store = grid.get_nearest_store(road_label)
+        assert grid.get_road_store(road_label) == nearest_store
+        assert compact.get_road_store(road_label) == nearest_store
+
+
+def test_format_path_with_labels_skips_roads_without_store():
+    grid = GridGraph(3, 3)
+    for x in range(3):
+        grid.set_node_attribute(x, 1, 'ROAD', 'R{}'.format(x))
+    grid.set_node_attribute(0, 0, 'STORE', 'A')
+    grid.set_node_attribute(2, 2, 'STORE', 'B')
+    grid.set_node_attribute(2, 0, 'STORE', 'C')
+    grid.freeze()
+
+    path = [(0, 0), (0, 1), (1, 1), (2, 1), (2, 2)]
+    assert grid.format_path(path) == '{A,R0}{R1,R2}{B}'
+    assert grid.format_path_with_labels(path) == '{A}{C,B}'
+
+
+def test_compiled_map_round_trip(tmp_path):
+    grid = registry.get_grid()
+    output = compiled.compile_map(registry.DEFAULT_GRID, str(tmp_path / 'HCH2.gridmap'), GridGraph)
+    loaded = registry.get_grid(output)
+
+    assert dict(loaded.node_attributes) == dict(grid.node_attributes)
+    assert loaded.get_nodes_by_label('麦当劳') == ((0, 8), (1, 8))
+    for start in grid.get_labels_by_type('ROAD'):
+        for end in grid.get_labels_by_type('ROAD'):
+            assert loaded.get_shortest_path(start, end) == grid.get_shortest_path(start, end)
@@ -0,0 +1,76 @@
+import shutil
+
+import pytest
+
+from plugins.grids import hierarchy, registry, search
+
+
+@pytest.mark.parametrize('cluster_size', [3, 4])
+def test_router_finds_shortest_paths(cluster_size):
+    grid = registry.get_grid('plugins/grids/HCH2.txt')
+    router = hierarchy.HierarchicalRouter([grid], cluster_size=cluster_size)
+    roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+
+    for source in roads:
+        for target in roads[::3]:
+            expected = search.bidirectional(grid, source, target)
+            path = router.route((0, source), (0, target))
+            if expected is None:
+                assert path is None
+                continue
+            assert len(path) == len(expected)
+            assert path[0] == (0, source) and path[-1] == (0, target)
+            for (_, u), (_, v) in zip(path, path[1:]):
+                assert v in grid.road_indices[grid.road_indptr[u]:grid.road_indptr[u + 1]]
+
+
+def _write_venue(tmp_path):
+    shutil.copy('plugins/grids/HCH1.txt', tmp_path / 'HCH1.txt')
+    shutil.copy('plugins/grids/HCH2.txt', tmp_path / 'HCH2.txt')
+    venue_file = tmp_path / 'mall.venue'
+    venue_file.write_text("FLOOR F1 HCH1.txt\nFLOOR F2 HCH2.txt\nLINK F1 3 7 F2 3 7 5\n", encoding='utf-8')
+    return str(venue_file)
+
+
+def test_venue_routes_across_floors(tmp_path):
+    venue = hierarchy.get_venue(_write_venue(tmp_path))
+    assert venue.names == ['F1', 'F2']
+    assert hierarchy.get_venue(str(tmp_path / 'mall.venue')) is venue
+
+    path = venue.route('大榕树', '文通冰室')
+    assert path[0][0] == 'F1' and path[-1][0] == 'F2'
+    assert ('F1', (3, 7)) in path and ('F2', (3, 7)) in path
+
+    first, second = venue.grids
+    x, y = first.get_road_node_by_label('大榕树')
+    start = x * first.height + y
+    x, y = second.get_road_node_by_label('文通冰室')
+    end = x * second.height + y
+    expected = (len(search.bidirectional(first, start, 3 * first.height + 7)) - 1 + 5
+                + len(search.bidirectional(second, 3 * second.height + 7, end)) - 1)
+    steps = sum(1 if a[0] == b[0] else 5 for a, b in zip(path, path[1:]))
+    assert steps == expected
+
+    lines = venue.format_route(path).split("\n")
+    assert len(lines) == 2
+    assert lines[0].startswith("F1: {") and lines[1].startswith("F2: {")
+
+
+def test_venue_rejects_links_off_roads(tmp_path):
+    venue_file = _write_venue(tmp_path)
+    with open(venue_file, 'a', encoding='utf-8') as file:
+        file.write("LINK F1 5 5 F2 5 5\n")
+    with pytest.raises(ValueError):
+        hierarchy.Venue.load(venue_file)
+
+
+def test_grid_file_is_a_venue_of_one_floor():
+    venue = hierarchy.get_venue('plugins/grids/HCH2.txt')
+    grid = registry.get_grid('plugins/grids/HCH2.txt')
+    assert venue.names == ['HCH2']
+
+    path = venue.route('麦当劳', 'MINISO')
+    start = grid.node_attributes[grid.get_road_node_by_label('麦当劳')][1]
+    end = grid.node_attributes[grid.get_road_node_by_label('MINISO')][1]
+    assert len(path) == len(grid.get_shortest_path(start, end))
+    assert venue.format_route(path) == "HCH2: " + grid.format_path_with_labels([node for _, node in path])
@@ -0,0 +1,62 @@
+from src.CallingGPT.session.history import History, count_tokens
+
+
+def _conversation(turns, result):
+    messages = [{"role": "system", "content": "You guide visitors around the mall."}]
+    for i in range(turns):
+        messages += [
+            {"role": "user", "content": "question {}".format(i)},
+            {"role": "assistant", "content": None,
+             "function_call": {"name": "plugins-route", "arguments": '{"to": "%d"}' % i}},
+            {"role": "function", "name": "plugins-route", "content": result},
+            {"role": "assistant", "content": "answer {}".format(i)},
+        ]
+    return messages
+
+
+def test_count_tokens():
+    assert count_tokens(None) == 0
+    assert count_tokens("abcdefgh") == 2
+    assert count_tokens("麦当劳") == 3
+
+
+def test_small_histories_are_sent_as_they_are():
+    history = History(budget=10000)
+    messages = _conversation(3, "{麦当劳}{MINISO}")
+    assert history.compact(messages) == messages
+
+
+def test_earlier_results_are_cut_down_first():
+    history = History(budget=400, result_chars=20)
+    messages = _conversation(3, "{麦当劳}" * 50)
+    assert history.tokens(messages) > 400
+
+    compacted = history.compact(messages)
+    assert history.tokens(compacted) <= 400
+    assert [m["role"] for m in compacted] == [m["role"] for m in messages]
+    # the current turn is kept as it is
+    assert compacted[-4:] == messages[-4:]
+    assert compacted[3]["content"].startswith("{麦当劳}{麦当劳}") and "dropped" in compacted[3]["content"]
+    # the given messages are left as they are
+    assert messages[3]["content"] == "{麦当劳}" * 50
+
+
+def test_earliest_turns_are_dropped_whole():
+    history = History(budget=400, result_chars=20)
+    messages = _conversation(20, "{麦当劳}" * 50)
+
+    compacted = history.compact(messages)
+    assert history.tokens(compacted) <= 400
+    assert len(compacted) < len(messages)
+    assert compacted[0] == messages[0]
+    assert compacted[1]["role"] == "user"
+    assert compacted[-4:] == messages[-4:]
+    assert len(compacted) % 4 == 1
+
+
+def test_pinned_messages_are_kept_over_budget():
+    history = History(budget=10)
+    messages = _conversation(2, "{麦当劳}" * 50)
+
+    compacted = history.compact(messages)
+    assert compacted == [messages[0]] + messages[-4:]
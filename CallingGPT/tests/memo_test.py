@@ -0,0 +1,109 @@
+import time
+
+from src.CallingGPT.entities import memo
+from src.CallingGPT.entities.namespace import Namespace, PluginManifest
+
+
+def test_cache_evicts_least_recently_used_and_expired():
+    cache = memo.MemoCache(maxsize=2, ttl=60)
+    for i in range(3):
+        cache.put(i, str(i))
+        cache.get(0)
+    assert cache.get(0) == (True, "0")
+    assert cache.get(1) == (False, None)
+    assert cache.get(2) == (True, "2")
+
+    cache.put("short", "lived", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") == (False, None)
+    assert cache.stats() == {"hits": 5, "misses": 2, "entries": 1}
+
+
+def test_key_is_canonical_json():
+    options = memo.memo_options(version="v1")
+    assert memo.MemoCache.key("f", {"a": 1, "b": [1, 2]}, options) == memo.MemoCache.key("f", {"b": [1, 2], "a": 1}, options)
+    assert memo.MemoCache.key("f", {"a": 1}, options) != memo.MemoCache.key("f", {"a": 1}, memo.memo_options(version="v2"))
+    assert memo.MemoCache.key("f", {"a": object()}, options) is None
+
+
+def _functions(calls, map_file):
+    @memo.memoize(files=[map_file])
+    def route(start: str, end: str) -> str:
+        """Find a route.
+
+        Args:
+            start: Where to start.
+            end: Where to go.
+        """
+        calls.append((start, end))
+        return "{}->{}".format(start, end)
+
+    def now() -> float:
+        """Return the time."""
+        calls.append("now")
+        return time.time()
+
+    return route, now
+
+
+def test_namespace_answers_repeated_calls_from_cache(tmp_path, plugin_module):
+    map_file = tmp_path / 'map.txt'
+    map_file.write_text("a", encoding='utf-8')
+    calls = []
+    cache = memo.MemoCache()
+    namespace = Namespace([plugin_module(*_functions(calls, str(map_file)))], cache=cache)
+
+    for _ in range(3):
+        assert namespace.call_function('plugin-route', {"start": "A", "end": "B"}) == "A->B"
+    assert calls == [("A", "B")]
+    assert cache.stats()["hits"] == 2
+
+    # a change of the map is a new key
+    map_file.write_text("ab", encoding='utf-8')
+    namespace.call_function('plugin-route', {"end": "B", "start": "A"})
+    assert len(calls) == 2
+
+    # only memoized functions are cached
+    namespace.call_function('plugin-now', {})
+    namespace.call_function('plugin-now', {})
+    assert calls.count("now") == 2
+    namespace.set_memoize('plugin-now')
+    namespace.call_function('plugin-now', {})
+    namespace.call_function('plugin-now', {})
+    assert calls.count("now") == 3
+    namespace.set_memoize('plugin-route', enabled=False)
+    namespace.call_function('plugin-route', {"start": "A", "end": "B"})
+    assert len([call for call in calls if call != "now"]) == 3
+
+
+PLUGIN = '''
+from src.CallingGPT.entities import memo
+
+calls = []
+
+
+@memo.memoize(version="1")
+def double(x: int) -> int:
+    """Double a number.
+
+    Args:
+        x: The number.
+    """
+    calls.append(x)
+    return 2 * x
+'''
+
+
+def test_manifest_records_memoized_functions(tmp_path, monkeypatch):
+    (tmp_path / 'memo_plugin.py').write_text(PLUGIN, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    manifest_file = str(tmp_path / 'plugins.json')
+    Namespace(['memo_plugin'], manifest=PluginManifest(manifest_file))
+
+    namespace = Namespace(['memo_plugin'], manifest=PluginManifest(manifest_file), cache=memo.MemoCache())
+    assert namespace.memoized == {'memo_plugin-double': memo.memo_options(version="1")}
+    assert namespace.call_function('memo_plugin-double', {"x": 2}) == 4
+    assert namespace.call_function('memo_plugin-double', {"x": 2}) == 4
+
+    import memo_plugin
+    assert memo_plugin.calls == [2]
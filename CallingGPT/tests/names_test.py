@@ -0,0 +1,31 @@
+import pytest
+
+from plugins.grids import names, registry
+from plugins.shortest_path_calculation import shortest_path_calculation
+
+
+@pytest.mark.parametrize('name, label', [
+    ('麦当劳', '麦当劳'),
+    ('麦当老', '麦当劳'),
+    ('麥當勞', '麦当劳'),
+    (' 麦 当劳 ', '麦当劳'),
+    ('ｍｉｎｉｓｏ', 'MINISO'),
+    ('太二', '太二酸菜鱼'),
+    ('超力拉面', '超力家拉面'),
+    ('c1', 'C1'),
+])
+def test_resolve(name, label):
+    assert names.resolve(registry.get_grid(), name) == label
+
+
+def test_ambiguous_name_lists_candidates():
+    with pytest.raises(names.UnknownName) as e:
+        names.resolve(registry.get_grid(), '拉面')
+    assert e.value.candidates[0] == '豚一拉面'
+    assert '超力家拉面' in e.value.candidates
+    assert isinstance(e.value, ValueError)
+
+
+def test_plugins_resolve_names():
+    assert shortest_path_calculation('麥當勞', '文通冰室 ') == shortest_path_calculation('麦当劳', '文通冰室')
+    assert shortest_path_calculation('C', '麦当劳').startswith('Unknown position C, did you mean: C1,')
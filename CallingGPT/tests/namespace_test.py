@@ -0,0 +1,121 @@
+import os
+import sys
+
+from src.CallingGPT.entities import namespace
+from src.CallingGPT.entities.namespace import Namespace, PluginManifest, SchemaRegistry
+
+
+def _greet():
+    # a new copy of the function every time, as a test may change its docstring
+    def greet(name: str, times: int = 1) -> str:
+        """Greet someone.
+
+        Args:
+            name: The name to greet.
+            times: How many times.
+
+        Returns:
+            the greeting
+        """
+        return "hi {}".format(name) * times
+
+    return greet
+
+
+def _count_parses(monkeypatch):
+    calls = []
+    parse = namespace.get_func_schema
+
+    def counting(function):
+        calls.append(function)
+        return parse(function)
+
+    monkeypatch.setattr(namespace, 'get_func_schema', counting)
+    return calls
+
+
+def test_schemas_are_compiled_once(monkeypatch, plugin_module):
+    calls = _count_parses(monkeypatch)
+    module = plugin_module(_greet())
+    registry = SchemaRegistry()
+
+    ns = Namespace([module], registry)
+    Namespace([module], registry)
+    # Another module's copy of the same function shares its schema
+    ns.add_modules([plugin_module(_greet())])
+    assert len(calls) == 1
+
+    functions = ns.functions_list
+    assert functions is ns.functions_list
+    assert functions == [{
+        "description": "Greet someone.",
+        "parameters": {
+            "type": "object",
+            "required": ["name"],
+            "properties": {
+                "name": {"type": "string", "description": "The name to greet."},
+                "times": {"type": "integer", "description": "How many times."},
+            },
+        },
+        "name": "plugin-greet",
+    }]
+    assert ns.call_function("plugin-greet", {"name": "a", "times": 2}) == "hi ahi a"
+
+    ns.add_function("extra", _greet())
+    assert [f["name"] for f in ns.functions_list] == ["plugin-greet", "extra-greet"]
+
+
+def test_changed_docstring_is_compiled_again(plugin_module):
+    module = plugin_module(_greet())
+    registry = SchemaRegistry()
+    Namespace([module], registry)
+
+    module.greet.__doc__ = module.greet.__doc__.replace("Greet someone.", "Say hello.")
+    assert Namespace([module], registry).functions_list[0]["description"] == "Say hello."
+
+
+def test_schemas_persist_on_disk(tmp_path, monkeypatch, plugin_module):
+    cache_file = str(tmp_path / 'schemas.json')
+    expected = Namespace([plugin_module(_greet())], SchemaRegistry(cache_file)).functions_list
+
+    calls = _count_parses(monkeypatch)
+    assert Namespace([plugin_module(_greet())], SchemaRegistry(cache_file)).functions_list == expected
+    assert calls == []
+
+
+PLUGIN = '''
+def add(a: int, b: int) -> int:
+    """{}
+
+    Args:
+        a: The first number.
+        b: The second number.
+    """
+    return a + b
+'''
+
+
+def test_manifest_defers_imports(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    plugin_file = tmp_path / 'lazy_plugin.py'
+    plugin_file.write_text(PLUGIN.format("Add two numbers."), encoding='utf-8')
+    manifest_file = str(tmp_path / 'plugins.json')
+
+    # The first start imports the module to write the manifest
+    expected = Namespace(['lazy_plugin'], manifest=PluginManifest(manifest_file)).functions_list
+    assert expected[0]["name"] == "lazy_plugin-add"
+    del sys.modules['lazy_plugin']
+
+    ns = Namespace(['lazy_plugin'], manifest=PluginManifest(manifest_file))
+    assert ns.functions_list == expected
+    assert 'lazy_plugin' not in sys.modules
+    assert ns.call_function("lazy_plugin-add", {"a": 1, "b": 2}) == 3
+    assert 'lazy_plugin' in sys.modules
+    del sys.modules['lazy_plugin']
+
+    # A changed source is imported again
+    plugin_file.write_text(PLUGIN.format("Sum two numbers."), encoding='utf-8')
+    os.utime(plugin_file, ns=(0, 1))
+    ns = Namespace(['lazy_plugin'], manifest=PluginManifest(manifest_file))
+    assert ns.functions_list[0]["description"] == "Sum two numbers."
+    del sys.modules['lazy_plugin']
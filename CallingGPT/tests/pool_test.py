@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.CallingGPT.entities.namespace import Namespace
+from src.CallingGPT.entities.pool import PluginError, WorkerPool
+
+
+PLUGIN = '''
+import os
+import time
+
+_state = {}
+
+
+def __warmup__():
+    _state['warm'] = True
+
+
+def pid() -> int:
+    """Return the process id.
+
+    Returns:
+        the process id
+    """
+    return os.getpid()
+
+
+def warm() -> bool:
+    """Tell whether the module was warmed up.
+
+    Returns:
+        whether it was
+    """
+    return _state.get('warm', False)
+
+
+def sleep(seconds: float) -> str:
+    """Sleep.
+
+    Args:
+        seconds: How long.
+
+    Returns:
+        done
+    """
+    time.sleep(seconds)
+    return "done"
+
+
+def fail() -> str:
+    """Fail.
+
+    Returns:
+        nothing
+    """
+    raise ValueError("broken")
+'''
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    (tmp_path / 'pooled_plugin.py').write_text(PLUGIN, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    with WorkerPool(['pooled_plugin'], workers=1, timeout=10) as pool:
+        yield pool
+
+
+def test_calls_run_in_warm_workers(pool):
+    assert pool.call('pooled_plugin', 'pid', {}) != os.getpid()
+    assert pool.call('pooled_plugin', 'warm', {}) is True
+    assert pool.call('pooled_plugin', 'sleep', {'seconds': 0}) == "done"
+
+
+def test_errors_timeouts_and_cancellation(pool):
+    with pytest.raises(PluginError, match="ValueError: broken"):
+        pool.call('pooled_plugin', 'fail', {})
+
+    pid = pool.call('pooled_plugin', 'pid', {})
+    start = time.monotonic()
+    with pytest.raises(PluginError, match="timed out"):
+        pool.call('pooled_plugin', 'sleep', {'seconds': 30}, timeout=0.5)
+    assert time.monotonic() - start < 5
+    # the stuck worker is replaced by a fresh one
+    assert pool.call('pooled_plugin', 'pid', {}) != pid
+
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    with pytest.raises(PluginError, match="cancelled"):
+        pool.call('pooled_plugin', 'sleep', {'seconds': 30}, cancel=cancel)
+    assert pool.call('pooled_plugin', 'warm', {}) is True
+
+
+def test_namespace_chooses_where_functions_run(pool):
+    namespace = Namespace(['pooled_plugin'], pool=pool)
+    assert namespace.call_function('pooled_plugin-pid', {}) != os.getpid()
+    assert namespace.call_function('pooled_plugin-fail', {}) == "Error: ValueError: broken"
+
+    namespace.set_execution('pooled_plugin-pid', 'inline')
+    assert namespace.call_function('pooled_plugin-pid', {}) == os.getpid()
+    with pytest.raises(ValueError):
+        namespace.set_execution('pooled_plugin-pid', 'elsewhere')
+
+
+def test_namespace_passes_timeouts_and_cancellation_to_the_pool(pool):
+    namespace = Namespace(['pooled_plugin'], pool=pool)
+    namespace.set_timeout('pooled_plugin-sleep', 0.3)
+    start = time.monotonic()
+    assert namespace.call_function('pooled_plugin-sleep', {'seconds': 30}) == "Error: sleep timed out after 0.3s"
+    assert time.monotonic() - start < 5
+    with pytest.raises(ValueError):
+        namespace.set_timeout('pooled_plugin-sleep', 0)
+
+    namespace.set_timeout('pooled_plugin-sleep', None)
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    assert namespace.call_function('pooled_plugin-sleep', {'seconds': 30}, cancel) == "Error: sleep was cancelled"
+    assert namespace.call_function('pooled_plugin-sleep', {'seconds': 0}) == "done"
+
+
+def test_waiting_for_a_worker_counts_against_the_timeout(pool):
+    busy = threading.Thread(target=pool.call, args=('pooled_plugin', 'sleep', {'seconds': 1}))
+    busy.start()
+    time.sleep(0.2)
+    start = time.monotonic()
+    with pytest.raises(PluginError, match="waiting for a worker"):
+        pool.call('pooled_plugin', 'pid', {}, timeout=0.3)
+    assert time.monotonic() - start < 0.8
+    busy.join()
+
+
+def test_warmup_failures_are_reported(tmp_path, monkeypatch, caplog):
+    (tmp_path / 'broken_plugin.py').write_text(
+        "def __warmup__():\n    raise RuntimeError('no map')\n\n\ndef ping():\n    return 'pong'\n", encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    with WorkerPool(['broken_plugin', 'missing_plugin'], workers=1) as pool:
+        assert pool.call('broken_plugin', 'ping', {}) == 'pong'
+    assert "broken_plugin: RuntimeError: no map" in caplog.text
+    assert "missing_plugin: ModuleNotFoundError" in caplog.text
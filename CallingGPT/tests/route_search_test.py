@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from plugins.grids import registry, search
+from plugins.grids.GridGraph import GridGraph
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def _random_grid(backend, width, height, density):
+    grid = backend(width, height)
+    for x in range(width):
+        for y in range(height):
+            if random.random() < density:
+                grid.set_node_attribute(x, y, 'ROAD', 'R{}-{}'.format(x, y))
+    grid.freeze()
+    return grid
+
+
+def _check_path(grid, path, source, target):
+    assert path[0] == source and path[-1] == target
+    for u, v in zip(path, path[1:]):
+        assert v in grid.road_indices[grid.road_indptr[u]:grid.road_indptr[u + 1]]
+
+
+@pytest.mark.parametrize('engine', sorted(search.ENGINES))
+def test_engines_find_shortest_paths(engine):
+    random.seed(7)
+    grids = [registry.get_grid(), registry.get_grid(backend='compact')]
+    grids += [_random_grid(GridGraph, 12, 9, 0.6), _random_grid(CompactGridGraph, 15, 15, 0.55)]
+
+    for grid in grids:
+        roads = [i for i in range(grid.width * grid.height) if grid.road_mask[i]]
+        for source in roads:
+            for target in roads[::5]:
+                expected = search.bidirectional(grid, source, target)
+                path = search.ENGINES[engine](grid, source, target)
+                if expected is None:
+                    assert path is None
+                else:
+                    assert len(path) == len(expected)
+                    _check_path(grid, path, source, target)
@@ -0,0 +1,191 @@
+import os
+import shutil
+import threading
+
+from plugins.grids import compiled, registry, route_table
+
+
+def _copy_grid(tmp_path):
+    config_file = str(tmp_path / 'HCH2.txt')
+    shutil.copyfile(registry.DEFAULT_GRID, config_file)
+    return config_file
+
+
+def test_route_table_matches_live_search(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    grid = registry.get_grid(config_file)
+    table = route_table.get_route_table(config_file)
+
+    assert os.path.exists(route_table.table_file(config_file))
+    for start in table.stores:
+        for end in table.stores:
+            start_road = grid.get_nearest_store(start, node_type='ROAD')
+            end_road = grid.get_nearest_store(end, node_type='ROAD')
+            assert table.get_path(start, end) == grid.get_shortest_path(start_road, end_road)
+
+
+def test_route_table_is_rebuilt_when_grid_changes(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    table = route_table.get_route_table(config_file)
+
+    route_table._tables.clear()
+    assert route_table.get_route_table(config_file).grid_hash == table.grid_hash
+
+    with open(config_file, 'a', encoding='utf-8') as file:
+        file.write('\n9 9 STORE 新店\n')
+
+    changed = route_table.get_route_table(config_file)
+    assert changed.grid_hash != table.grid_hash
+    assert '新店' in changed.stores
+    assert route_table.RouteTable.load(route_table.table_file(config_file)).grid_hash == changed.grid_hash
+
+
+def test_route_table_of_old_snapshot_is_not_saved_as_new_version(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    old_grid = registry.get_grid(config_file)
+    with open(config_file, 'a', encoding='utf-8') as file:
+        file.write('\n9 9 STORE 新店\n')
+
+    table = route_table.get_route_table(config_file, old_grid)
+    assert '新店' not in table.stores
+    assert table.grid_hash == registry.grid_hash(old_grid) != route_table.file_hash(config_file)
+
+    # A fresh process builds the routes of the file as it is now
+    route_table._tables.clear()
+    registry.clear()
+    assert '新店' in route_table.get_route_table(config_file).stores
+
+
+def test_route_table_is_only_reused_for_the_same_neighbour_order(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    compact = registry.get_grid(config_file, 'compact')
+    assert route_table.get_route_table(config_file, compact).order == route_table.neighbour_order(compact)
+
+    grid = registry.get_grid(config_file)
+    table = route_table.get_route_table(config_file, grid)
+    assert table.order == route_table.neighbour_order(grid)
+    for start in table.stores:
+        for end in table.stores:
+            start_road = grid.get_nearest_store(start, node_type='ROAD')
+            end_road = grid.get_nearest_store(end, node_type='ROAD')
+            assert table.get_path(start, end) == grid.get_shortest_path(start_road, end_road)
+
+
+def test_grid_file_and_compiled_map_keep_a_table_each(tmp_path, monkeypatch):
+    config_file = _copy_grid(tmp_path)
+    compiled_file = compiled.compile_map(config_file)
+    build = route_table.RouteTable.build
+    built = []
+
+    def counting_build(grid, grid_hash):
+        built.append(grid_hash)
+        return build(grid, grid_hash)
+
+    monkeypatch.setattr(route_table.RouteTable, 'build', counting_build)
+
+    for _ in range(3):
+        for path in (config_file, compiled_file):
+            route_table._tables.clear()
+            route_table.get_route_table(path)
+    assert len(built) == 2
+    assert route_table.table_file(config_file) != route_table.table_file(compiled_file)
+
+
+def test_unreadable_route_table_is_rebuilt(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    table = route_table.get_route_table(config_file)
+    with open(route_table.table_file(config_file), 'r+b') as file:
+        file.truncate(os.path.getsize(route_table.table_file(config_file)) // 2)
+
+    route_table._tables.clear()
+    assert route_table.get_route_table(config_file).stores == table.stores
+    assert route_table.RouteTable.load(route_table.table_file(config_file)).grid_hash == table.grid_hash
+
+
+def test_concurrent_saves_use_their_own_temporary_files(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    table = route_table.get_route_table(config_file)
+    errors = []
+
+    def save():
+        try:
+            table.save(route_table.table_file(config_file))
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == sorted(['HCH2.txt', os.path.basename(route_table.table_file(config_file))])
+    assert route_table.RouteTable.load(route_table.table_file(config_file)).stores == table.stores
+
+
+def _assert_table_matches_grid(table, grid):
+    fresh = route_table.RouteTable.build(grid, table.grid_hash)
+    assert table.stores == fresh.stores
+    assert (table.entrances == fresh.entrances).all()
+    assert (table.distances == fresh.distances).all()
+    for start in table.stores:
+        for end in table.stores:
+            path = table.get_path(start, end) if table.entrances[table.store_index[start]] >= 0 \
+                and table.entrances[table.store_index[end]] >= 0 else None
+            if path is not None:
+                assert all(grid.node_attributes[node][0] == 'ROAD' for node in path)
+                assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(path, path[1:]))
+
+
+def test_update_cells_updates_route_table(tmp_path, monkeypatch):
+    config_file = _copy_grid(tmp_path)
+    old_grid = registry.get_grid(config_file)
+    old_table = route_table.get_route_table(config_file)
+
+    searches = []
+    bidirectional = route_table.search.bidirectional
+    monkeypatch.setattr(route_table.search, 'bidirectional', lambda *args: searches.append(args) or bidirectional(*args))
+
+    # Close a corridor, rename a store and open the corridor again
+    for changes in ([(3, 7, 'EMPTY', '')], [(1, 1, 'STORE', '名创优品')], [(3, 7, 'ROAD', 'G4')]):
+        searches.clear()
+        grid = registry.update_cells(changes, config_file)
+        table = route_table.get_route_table(config_file)
+
+        assert registry.get_grid(config_file) is grid
+        assert table.grid_hash == route_table.file_hash(config_file)
+        assert 0 < len(searches) < len(table.stores) ** 2
+        _assert_table_matches_grid(table, grid)
+
+    assert '名创优品' in table.stores and 'MINISO' not in table.stores
+    assert route_table.RouteTable.load(route_table.table_file(config_file)).grid_hash == table.grid_hash
+
+    # The file holds the same map, and the previous snapshot is untouched
+    registry.clear()
+    assert dict(registry.get_grid(config_file).node_attributes) == dict(grid.node_attributes)
+    assert old_grid.node_attributes[(1, 1)] == ('STORE', 'MINISO')
+    assert route_table.get_route_table(config_file, old_grid) is old_table
+
+
+def test_update_cells_keeps_line_endings(tmp_path):
+    config_file = _copy_grid(tmp_path)
+    with open(config_file, 'rb') as file:
+        before = file.read().split(b'\r\n')
+
+    registry.update_cells([(3, 7, 'EMPTY', '')], config_file)
+    with open(config_file, 'rb') as file:
+        after = file.read().split(b'\r\n')
+    assert [line for line in before if not line.startswith(b'3 7 ')] == after
+
+
+def test_update_cells_adds_first_store(tmp_path):
+    config_file = str(tmp_path / 'map.txt')
+    with open(config_file, 'w', encoding='utf-8') as file:
+        file.write("3 3\n0 0 ROAD R1\n0 1 ROAD R2\n")
+    assert route_table.get_route_table(config_file).stores == []
+
+    grid = registry.update_cells([(1, 0, 'STORE', 'S')], config_file)
+    table = route_table.get_route_table(config_file)
+    assert table.stores == ['S']
+    _assert_table_matches_grid(table, grid)
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+openai = pytest.importorskip('openai')
+
+from src.CallingGPT.session.session import AsyncSession, Session
+
+
+def add(a: int, b: int) -> int:
+    """Add two numbers.
+
+    Args:
+        a: The first number.
+        b: The second number.
+    """
+    return a + b
+
+
+def _replies():
+    """A reply function answering every question with one call of add, then its result."""
+    def reply(messages, **kwargs):
+        if messages[-1]["role"] == "function":
+            message = {"role": "assistant", "content": "it is " + messages[-1]["content"]}
+        else:
+            arguments = json.dumps({"a": len(messages), "b": 2})
+            message = {"role": "assistant", "content": None,
+                       "function_call": {"name": "plugin-add", "arguments": arguments}}
+        return {"choices": [{"message": message}]}
+    return reply
+
+
+def test_async_session_matches_sync_session(monkeypatch, plugin_module):
+    reply = _replies()
+
+    async def acreate(**kwargs):
+        await asyncio.sleep(0)
+        return reply(**kwargs)
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(lambda **kwargs: reply(**kwargs)))
+    monkeypatch.setattr(openai.ChatCompletion, 'acreate', staticmethod(acreate))
+
+    session = Session([plugin_module(add)])
+    expected = [list(session.ask(question)) for question in ["first", "second"]]
+
+    async def converse():
+        session = AsyncSession([plugin_module(add)])
+        turns = []
+        for question in ["first", "second"]:
+            turns.append([reply_msg async for reply_msg in session.ask(question)])
+        return turns, session.messages
+
+    async def main():
+        # Many conversations at once give the same turns as one alone
+        return await asyncio.gather(*[converse() for _ in range(50)])
+
+    for turns, messages in asyncio.run(main()):
+        assert turns == expected
+        assert messages == session.messages
+
+
+def _chunks(message):
+    """Split a reply into the stream chunks the API sends for it."""
+    deltas = [{"role": "assistant"}]
+    if message.get("function_call"):
+        call = message["function_call"]
+        deltas.append({"content": None, "function_call": {"name": call["name"], "arguments": ""}})
+        deltas += [{"function_call": {"arguments": call["arguments"][i:i + 3]}}
+                   for i in range(0, len(call["arguments"]), 3)]
+    else:
+        deltas += [{"content": message["content"][i:i + 2]} for i in range(0, len(message["content"]), 2)]
+    deltas.append({})
+    return [{"choices": [{"delta": delta}]} for delta in deltas]
+
+
+def test_stream_reassembles_replies(monkeypatch, plugin_module):
+    reply = _replies()
+
+    def create(stream=False, **kwargs):
+        message = reply(**kwargs)["choices"][0]["message"]
+        return iter(_chunks(message)) if stream else reply(**kwargs)
+
+    async def acreate(stream=False, **kwargs):
+        chunks = _chunks(reply(**kwargs)["choices"][0]["message"])
+
+        async def generate():
+            for chunk in chunks:
+                await asyncio.sleep(0)
+                yield chunk
+        return generate()
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(create))
+    monkeypatch.setattr(openai.ChatCompletion, 'acreate', staticmethod(acreate))
+
+    session = Session([plugin_module(add)])
+    expected = list(session.ask("first"))
+
+    streamed = Session([plugin_module(add)])
+    replies = list(streamed.ask("first", stream=True))
+    assert [r for r in replies if 'delta' not in r] == expected
+    assert "".join(r['delta'] for r in replies if 'delta' in r) == expected[-1]['content']
+    assert streamed.messages == session.messages
+
+    async def converse():
+        session = AsyncSession([plugin_module(add)])
+        return [r async for r in session.ask("first", stream=True)]
+
+    assert asyncio.run(converse()) == replies
+
+
+def test_tool_calls_of_one_reply_run_at_the_same_time(monkeypatch, plugin_module):
+    def wait(seconds: float, tag: str) -> str:
+        """Wait, then return the tag.
+
+        Args:
+            seconds: How long to wait.
+            tag: What to return.
+        """
+        time.sleep(seconds)
+        return tag
+
+    module = plugin_module(wait)
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        if kwargs["messages"][-1]["role"] == "tool":
+            message = {"role": "assistant", "content": "done"}
+        else:
+            message = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": "call_{}".format(i), "type": "function",
+                 "function": {"name": "plugin-wait", "arguments": json.dumps({"seconds": seconds, "tag": str(i)})}}
+                for i, seconds in enumerate([0.3, 0.1, 0.2])
+            ]}
+        return {"choices": [{"message": message}]}
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(create))
+
+    session = Session([module], tools=True)
+    start = time.perf_counter()
+    replies = list(session.ask("go"))
+    assert time.perf_counter() - start < 0.5
+
+    assert len(replies) == 2 and len(requests) == 2
+    assert requests[0]["tools"][0] == {"type": "function", "function": session.namespace.functions_list[0]}
+    assert [(m["role"], m.get("tool_call_id"), m["content"]) for m in session.messages[1:]] == [
+        ("assistant", None, None),
+        ("tool", "call_0", "0"),
+        ("tool", "call_1", "1"),
+        ("tool", "call_2", "2"),
+        ("assistant", None, "done"),
+    ]
+
+    async def acreate(**kwargs):
+        return create(**kwargs)
+
+    monkeypatch.setattr(openai.ChatCompletion, 'acreate', staticmethod(acreate))
+
+    async def converse():
+        async_session = AsyncSession([module], tools=True)
+        return [r async for r in async_session.ask("go")], async_session.messages
+
+    start = time.perf_counter()
+    assert asyncio.run(converse()) == (replies, session.messages)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_stream_reassembles_tool_calls():
+    from src.CallingGPT.session.session import _merge_delta
+
+    message = {"role": "assistant", "content": None}
+    for delta in [
+        {"role": "assistant", "content": None,
+         "tool_calls": [{"index": 0, "id": "a", "type": "function", "function": {"name": "f", "arguments": ""}}]},
+        {"tool_calls": [{"index": 0, "function": {"arguments": '{"x":'}}]},
+        {"tool_calls": [{"index": 1, "id": "b", "type": "function", "function": {"name": "g", "arguments": "{}"}}]},
+        {"tool_calls": [{"index": 0, "function": {"arguments": ' 1}'}}]},
+    ]:
+        _merge_delta(message, delta)
+
+    assert message == {"role": "assistant", "content": None, "tool_calls": [
+        {"id": "a", "type": "function", "function": {"name": "f", "arguments": '{"x": 1}'}},
+        {"id": "b", "type": "function", "function": {"name": "g", "arguments": "{}"}},
+    ]}
+
+
+def test_history_keeps_requests_within_budget(monkeypatch, plugin_module):
+    from src.CallingGPT.session.history import History
+
+    reply = _replies()
+    sizes = []
+
+    def create(**kwargs):
+        sizes.append(len(kwargs["messages"]))
+        return reply(**kwargs)
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(create))
+
+    session = Session([plugin_module(add)], history=History(budget=60))
+    for i in range(30):
+        list(session.ask("question {}".format(i)))
+        assert session.stats["requests"] == 2
+        assert session.stats["tokens"] <= 60
+        assert session.stats["bytes"] > 0 and session.stats["seconds"] >= 0
+
+    assert max(sizes) < 12
+    # the stored conversation is kept whole
+    assert len(session.messages) == 90
+    assert session.messages[-1] == {"role": "assistant", "content": "it is " + session.messages[-2]["content"]}
+
+
+def test_sessions_keep_their_own_messages_and_resume_from_log(monkeypatch, tmp_path, plugin_module):
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(lambda **kwargs: _replies()(**kwargs)))
+    log_file = str(tmp_path / 'conversation.jsonl')
+
+    first = Session([plugin_module(add)], log_file=log_file)
+    second = Session([plugin_module(add)])
+    list(first.ask("first"))
+    assert len(first.messages) == 3 and second.messages == []
+    first.store.close()
+
+    resumed = Session([plugin_module(add)], log_file=log_file)
+    assert resumed.messages == first.messages
+    list(resumed.ask("second"))
+    resumed.store.close()
+    assert len(resumed.messages) == 6
+    assert Session([plugin_module(add)], log_file=log_file).messages == resumed.messages
+
+
+def test_failed_request_leaves_no_question_behind(monkeypatch, tmp_path, plugin_module):
+    log_file = str(tmp_path / 'conversation.jsonl')
+    reply = _replies()
+    failures = [ConnectionError("offline")]
+
+    def create(**kwargs):
+        if failures:
+            raise failures.pop()
+        return reply(**kwargs)
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', staticmethod(create))
+    session = Session([plugin_module(add)], log_file=log_file)
+    with pytest.raises(ConnectionError):
+        list(session.ask("first"))
+    assert session.messages == []
+
+    list(session.ask("first"))
+    session.store.close()
+    assert [m["content"] for m in session.messages if m["role"] == "user"] == ["first"]
+    assert Session([plugin_module(add)], log_file=log_file).messages == session.messages
+
+    async def acreate(**kwargs):
+        return create(**kwargs)
+
+    monkeypatch.setattr(openai.ChatCompletion, 'acreate', staticmethod(acreate))
+
+    async def converse():
+        async_session = AsyncSession([plugin_module(add)])
+        failures.append(ConnectionError("offline"))
+        with pytest.raises(ConnectionError):
+            [r async for r in async_session.ask("first")]
+        assert async_session.messages == []
+        [r async for r in async_session.ask("first")]
+        return async_session.messages
+
+    assert asyncio.run(converse()) == session.messages
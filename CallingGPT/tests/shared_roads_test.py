@@ -0,0 +1,15 @@
+import os
+
+from plugins.grids import registry, shared_roads
+
+
+def test_shared_road_table_matches_search():
+    for config_file in ('HCH1.txt', 'HCH2.txt'):
+        grid = registry.get_grid(os.path.join(registry.GRIDS_DIR, config_file))
+        table = shared_roads.get_shared_road_table(grid)
+
+        assert shared_roads.get_shared_road_table(grid) is table
+        assert (table.roads >= 0).any() and (table.roads < 0).any()
+        for start in table.stores:
+            for end in table.stores:
+                assert table.get_road(start, end) == shared_roads.find_shared_road(grid, start, end)
@@ -0,0 +1,15 @@
+from plugins.grids import registry
+from plugins.shortest_path_calculation import batch_shortest_path_calculation, shortest_path_calculation
+
+
+def test_batch_routes_match_single_routes():
+    stores = registry.get_grid().get_labels_by_type('STORE')
+    lines = batch_shortest_path_calculation(stores[:1], stores).split('\n')
+
+    assert lines == ["{}->{}: {}".format(stores[0], store, shortest_path_calculation(stores[0], store))
+                     for store in stores]
+    assert batch_shortest_path_calculation(['A1', stores[0]], ['不存在的店', 'C1']).split('\n') == [
+        "A1->不存在的店: Unknown position 不存在的店, did you mean: 奈雪的茶?",
+        "{}->C1: {}".format(stores[0], shortest_path_calculation(stores[0], 'C1')),
+    ]
+    assert batch_shortest_path_calculation(stores[:2], stores[:3]).startswith("Cu and De must have the same length")
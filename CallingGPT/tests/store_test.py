@@ -0,0 +1,78 @@
+from src.CallingGPT.session.history import History
+from src.CallingGPT.session.store import MessageStore
+
+
+def _turn(i):
+    return [
+        {"role": "user", "content": "question {}".format(i)},
+        {"role": "function", "name": "plugins-route", "content": "{麦当劳}" * 50},
+        {"role": "assistant", "content": "answer {}".format(i)},
+    ]
+
+
+def test_stores_are_separate():
+    first, second = MessageStore(), MessageStore()
+    first.append({"role": "user", "content": "hi"})
+    assert len(first) == 1 and len(second) == 0
+    assert list(first) == [first[0]] == [{"role": "user", "content": "hi"}]
+
+
+def test_log_resumes_the_conversation(tmp_path):
+    log_file = str(tmp_path / 'conversation.jsonl')
+    store = MessageStore(log_file)
+    for i in range(3):
+        for message in _turn(i):
+            store.append(message)
+    store.close()
+
+    resumed = MessageStore(log_file)
+    assert resumed.messages == store.messages
+    resumed.append({"role": "user", "content": "again"})
+    resumed.close()
+    assert MessageStore.load(log_file)[-1] == {"role": "user", "content": "again"}
+
+
+def test_cut_short_line_is_skipped(tmp_path):
+    log_file = tmp_path / 'conversation.jsonl'
+    log_file.write_text('{"role": "user", "content": "hi"}\n{"role": "assis', encoding='utf-8')
+    assert MessageStore.load(str(log_file)) == [{"role": "user", "content": "hi"}]
+
+
+def test_log_keeps_every_message_whole(tmp_path):
+    log_file = str(tmp_path / 'conversation.jsonl')
+    store = MessageStore(log_file)
+    history = History(budget=300, result_chars=20)
+    for i in range(30):
+        for message in _turn(i):
+            store.append(message)
+        # only what is sent is compacted
+        assert history.tokens(history.compact(store.messages)) <= 300
+    store.close()
+
+    assert len(store) == 90
+    assert MessageStore.load(log_file) == store.messages == [m for i in range(30) for m in _turn(i)]
+
+    snapshot_file = str(tmp_path / 'snapshot.jsonl')
+    store.snapshot(snapshot_file)
+    assert MessageStore(snapshot_file).messages == store.messages
+
+
+def test_resuming_after_a_cut_short_line_keeps_later_messages(tmp_path):
+    log_file = tmp_path / 'conversation.jsonl'
+    log_file.write_text('{"role": "user", "content": "hi"}\n{"role": "assis', encoding='utf-8')
+
+    store = MessageStore(str(log_file))
+    store.append({"role": "user", "content": "again"})
+    store.append({"role": "assistant", "content": "hello"})
+    store.close()
+
+    resumed = MessageStore(str(log_file))
+    assert len(resumed) == 3
+    resumed.append({"role": "user", "content": "bye"})
+    resumed.close()
+    assert MessageStore(str(log_file)).messages == [
+        {"role": "user", "content": "hi"},
+        {"role": "user", "content": "again"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "bye"},
+    ]
@@ -0,0 +1,59 @@
+import itertools
+import random
+
+from plugins import itinerary_planning
+from plugins.grids import registry, route_table, tour
+
+
+def _brute_force(distances):
+    return min(tour.route_length(distances, [0, *order])
+               for order in itertools.permutations(range(1, len(distances))))
+
+
+def _random_distances(count, seed):
+    rng = random.Random(seed)
+    points = [(rng.randrange(30), rng.randrange(30)) for _ in range(count)]
+    return [[abs(ax - bx) + abs(ay - by) for bx, by in points] for ax, ay in points]
+
+
+def test_held_karp_is_optimal():
+    for count in range(1, 8):
+        distances = _random_distances(count, count)
+        order = tour.held_karp(distances)
+        assert sorted(order) == list(range(count)) and order[0] == 0
+        if count > 1:
+            assert tour.route_length(distances, order) == _brute_force(distances)
+
+
+def test_heuristic_visits_every_node():
+    distances = _random_distances(40, 0)
+    order = tour.solve_order(distances)
+    assert order[0] == 0 and sorted(order) == list(range(40))
+    assert tour.route_length(distances, order) <= tour.route_length(distances, tour.nearest_neighbour(distances))
+
+
+def test_unreachable_legs_are_avoided():
+    distances = [[0, 1, None], [1, 0, 1], [None, 1, 0]]
+    assert tour.solve_order(distances) == [0, 1, 2]
+
+
+def test_itinerary_planning_visits_every_store():
+    table = route_table.get_route_table()
+    stores = [store for store in table.stores if table.entrances[table.store_index[store]] >= 0][:5]
+    result = itinerary_planning.itinerary_planning(stores[0], stores[1:] + stores[1:2])
+
+    order = result.split('\n')[0].split('->')
+    assert order[0] == stores[0]
+    assert sorted(order[1:]) == sorted(stores[1:])
+
+
+def test_itinerary_planning_leaves_out_unreachable_stores(tmp_path, monkeypatch):
+    config_file = tmp_path / 'map.txt'
+    config_file.write_text("5 5\n0 0 ROAD R1\n1 0 ROAD R2\n2 0 ROAD R3\n0 1 STORE A\n2 1 STORE B\n"
+                           "4 4 ROAD R4\n4 3 STORE C\n", encoding='utf-8')
+    monkeypatch.setattr(registry, 'DEFAULT_GRID', str(config_file))
+
+    result = itinerary_planning.itinerary_planning('A', ['C', 'B'])
+    assert result.split('\n')[0] == "A->B"
+    assert result.split('\n')[2] == "C can't be reached from A and was left out"
+    assert "C" not in result.split('\n')[1]
@@ -0,0 +1,67 @@
+import random
+import shutil
+
+import numpy as np
+
+from plugins.grids import registry, weighted
+from plugins.grids.CompactGridGraph import CompactGridGraph
+
+
+def _random_grid(width, height, density):
+    grid = CompactGridGraph(width, height)
+    for x in range(width):
+        for y in range(height):
+            if random.random() < density:
+                grid.set_node_attribute(x, y, 'ROAD', 'R{}-{}'.format(x, y))
+    grid.freeze()
+    return grid
+
+
+def test_router_finds_cheapest_routes():
+    random.seed(3)
+    for grid in [registry.get_grid(), _random_grid(20, 17, 0.6)]:
+        costs = np.array([random.choice([0.5, 1, 1, 1, 3, 8]) for _ in range(grid.width * grid.height)])
+        router = weighted.WeightedRouter(grid, costs, landmarks=4)
+        roads = np.flatnonzero(np.frombuffer(grid.road_mask, dtype=np.uint8)).tolist()
+
+        for source in roads[::3]:
+            expected = weighted.dijkstra(grid, costs, source)
+            for target in roads[::4]:
+                for heuristic in ['alt', 'manhattan', None]:
+                    route = router.route(source, target, heuristic)
+                    if not np.isfinite(expected[target]):
+                        assert route is None
+                        continue
+                    path, cost = route
+                    assert path[0] == source and path[-1] == target
+                    assert abs(cost - expected[target]) < 1e-9
+                    assert abs(costs[path[1:]].sum() - cost) < 1e-9
+
+
+def test_cost_file_steers_routes(tmp_path):
+    shutil.copy('plugins/grids/HCH2.txt', tmp_path / 'HCH2.txt')
+    grid_file = str(tmp_path / 'HCH2.txt')
+    grid = registry.get_grid(grid_file)
+
+    path = weighted.find_path('麦当劳', 'MINISO', grid_file)
+    assert len(path) == len(grid.get_shortest_path(*[grid.node_attributes[node][1] for node in (path[0], path[-1])]))
+
+    # Make the middle of the plain route expensive
+    x, y = path[len(path) // 2]
+    with open(weighted.costs_file(grid_file), 'w', encoding='utf-8') as file:
+        file.write("# x y cost\n{} {} 50 stairs\n".format(x, y))
+    detour = weighted.find_path('麦当劳', 'MINISO', grid_file)
+    assert detour[0] == path[0] and detour[-1] == path[-1]
+    assert (x, y) not in detour and len(detour) > len(path)
+
+
+def test_load_costs_rejects_bad_lines(tmp_path):
+    grid = registry.get_grid()
+    cost_file = tmp_path / 'HCH2.costs'
+    for line in ["1 2", "1 2 cheap", "100 2 3", "1 2 -1"]:
+        cost_file.write_text(line + "\n", encoding='utf-8')
+        try:
+            weighted.load_costs(grid, str(cost_file))
+        except ValueError:
+            continue
+        raise AssertionError(line)